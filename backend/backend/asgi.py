@@ -16,8 +16,21 @@ from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
 
 django_asgi_app = get_asgi_application()
+import logging
 from state.AuthMiddleware import TokenAuthMiddleware
-from state.routing import websocket_urlpatterns
+from db.routing import websocket_urlpatterns as db_websocket_urlpatterns
+
+logger = logging.getLogger(__name__)
+
+# 导入任务进度推送不依赖设备数据的 consumers，设备路由无法导入时仍可使用
+try:
+    from state.routing import websocket_urlpatterns as state_websocket_urlpatterns
+except ImportError as e:
+    logger.error(f"无法加载设备数据 WebSocket 路由: {str(e)}")
+    state_websocket_urlpatterns = []
+
+websocket_urlpatterns = state_websocket_urlpatterns + db_websocket_urlpatterns
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(TokenAuthMiddleware(URLRouter(websocket_urlpatterns))),
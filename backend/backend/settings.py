@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
@@ -21,6 +22,9 @@ pymysql.install_as_MySQLdb()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# 是否正在运行 manage.py test
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 
 
 
@@ -332,6 +336,56 @@ SESSION_COOKIE_AGE = 3600  # 会话cookie存活时间（秒）= 1小时
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True  # 浏览器关闭时结束会话
 SESSION_SAVE_EVERY_REQUEST = True  # 每次请求更新会话过期时间
 
+# 用户活动缓冲区设置 - 活动记录先进入进程内缓冲区，再批量写入数据库
+ACTIVITY_BUFFER_SIZE = config('ACTIVITY_BUFFER_SIZE', default=5000, cast=int)  # 缓冲区最大条数，写满后丢弃最旧记录
+ACTIVITY_BUFFER_FLUSH_THRESHOLD = config('ACTIVITY_BUFFER_FLUSH_THRESHOLD', default=200, cast=int)  # 达到该条数立即刷新
+ACTIVITY_BUFFER_FLUSH_INTERVAL = config('ACTIVITY_BUFFER_FLUSH_INTERVAL', default=5, cast=float)  # 定时刷新间隔（秒）
+# 是否使用后台线程定时刷新；关闭时每次请求立即写入（运行测试时默认关闭，避免在测试事务之外写库）
+ACTIVITY_BUFFER_BACKGROUND_FLUSH = config('ACTIVITY_BUFFER_BACKGROUND_FLUSH', default=not TESTING, cast=bool)
+VISIT_COUNTER_SHARDS = config('VISIT_COUNTER_SHARDS', default=8, cast=int)  # 访问计数分片数，各工作进程写入不同分片
+
+# 仪表板汇总统计缓存时间（秒）
+STATS_SUMMARY_CACHE_TIMEOUT = config('STATS_SUMMARY_CACHE_TIMEOUT', default=30, cast=int)
+
+# 维修统计缓存时间（秒），维修记录变化时立即失效
+MAINTENANCE_STATS_CACHE_TIMEOUT = config('MAINTENANCE_STATS_CACHE_TIMEOUT', default=300, cast=int)
+
+# 设备 OEE 曲线中已结束小时的缓存时间（秒），已结束的小时结果不再变化
+OEE_HOUR_CACHE_TIMEOUT = config('OEE_HOUR_CACHE_TIMEOUT', default=90000, cast=int)
+
+# 设备群组推送的最小间隔（秒），间隔内的多次更新合并为一次快照
+WS_SNAPSHOT_MIN_INTERVAL = config('WS_SNAPSHOT_MIN_INTERVAL', default=1.0, cast=float)
+
+# WebSocket 握手时 token -> 用户资料缓存（条数上限、有效期秒数）
+WS_TOKEN_CACHE_SIZE = config('WS_TOKEN_CACHE_SIZE', default=1000, cast=int)
+WS_TOKEN_CACHE_TIMEOUT = config('WS_TOKEN_CACHE_TIMEOUT', default=300, cast=int)
+
+# Excel 导出时每批从数据库读取的行数
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Excel 批量导入时每批 bulk_create 的行数
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=500, cast=int)
+
+# 后台导入任务：上传接口默认是否提交为后台任务（请求参数 background 可覆盖）、
+# 每个分块的行数、run_import_worker 的进程数和空闲时轮询间隔（秒）
+IMPORT_BACKGROUND_JOBS = config('IMPORT_BACKGROUND_JOBS', default=False, cast=bool)
+IMPORT_JOB_CHUNK_SIZE = config('IMPORT_JOB_CHUNK_SIZE', default=1000, cast=int)
+IMPORT_WORKER_PROCESSES = config('IMPORT_WORKER_PROCESSES', default=2, cast=int)
+IMPORT_WORKER_POLL_INTERVAL = config('IMPORT_WORKER_POLL_INTERVAL', default=2.0, cast=float)
+
+# 上传后预览 Excel 工作表时读取的行数（只读模式，不解析整个工作簿）
+EXCEL_PREVIEW_ROWS = config('EXCEL_PREVIEW_ROWS', default=100, cast=int)
+
+# 配置表（期数、产线、工序、班次）进程内缓存检查数据库版本号的间隔（秒），
+# 本进程内的配置修改立即生效，其他进程最多延迟该时间
+CONFIG_REGISTRY_CHECK_INTERVAL = config('CONFIG_REGISTRY_CHECK_INTERVAL', default=5, cast=float)
+
+# 用户列表分页时默认每页的用户数（请求带 page 或 page_size 参数时分页）
+USER_LIST_PAGE_SIZE = config('USER_LIST_PAGE_SIZE', default=50, cast=int)
+
+# 搜索关键词中最少见的二元组出现在超过该数量的对象中时不使用搜索索引，直接顺序扫描
+SEARCH_INDEX_MAX_CANDIDATES = config('SEARCH_INDEX_MAX_CANDIDATES', default=5000, cast=int)
+
 
 # 日志配置
 LOGGING = {
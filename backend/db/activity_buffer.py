@@ -0,0 +1,206 @@
+import atexit
+import threading
+import time
+import logging
+from collections import deque, Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import visit_counter
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """
+    用户活动缓冲区 - 在进程内收集活动记录，按数量或时间阈值批量写入数据库
+
+    - 缓冲区为定长环形队列，写满后丢弃最旧的记录并计入 dropped
+    - 缓冲条数达到 flush_threshold 时在当前线程立即刷新
+    - 后台线程每 flush_interval 秒刷新一次
+    - 进程退出时通过 atexit 排空缓冲区
+    - background 为 False 时不使用缓冲区和后台线程，每条记录在当前事务提交后立即写入
+      （默认取 ACTIVITY_BUFFER_BACKGROUND_FLUSH，运行测试时关闭：测试事务回滚，不会在事务之外写库）
+    """
+
+    def __init__(self, max_size=None, flush_threshold=None, flush_interval=None, background=None):
+        self.max_size = max_size or getattr(settings, 'ACTIVITY_BUFFER_SIZE', 5000)
+        self.flush_threshold = flush_threshold or getattr(settings, 'ACTIVITY_BUFFER_FLUSH_THRESHOLD', 200)
+        self.flush_interval = flush_interval or getattr(settings, 'ACTIVITY_BUFFER_FLUSH_INTERVAL', 5)
+        self._background = background
+
+        self._activities = deque(maxlen=self.max_size)
+        self._visits = Counter()  # 日期 -> 待累加的访问次数
+        self._sketches = {}  # 日期 -> 当日访客的 HyperLogLog 草图
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self.is_running = False
+        self.thread = None
+
+        # 统计计数
+        self.flushed_count = 0
+        self.dropped_count = 0
+        self.flush_runs = 0
+        self.last_flush_at = None
+
+    @property
+    def background(self):
+        if self._background is None:
+            return getattr(settings, 'ACTIVITY_BUFFER_BACKGROUND_FLUSH', True)
+        return self._background
+
+    def add_activity(self, activity):
+        """加入一条待写入的 UserActivity 实例"""
+        if not self.background:
+            self.write_after_commit([activity], timezone.now().date(), f"user:{activity.user_id}")
+            return
+        self.start()
+        with self._lock:
+            if len(self._activities) == self._activities.maxlen:
+                # 环形队列已满，最旧的一条将被覆盖
+                self.dropped_count += 1
+            self._activities.append(activity)
+            self._record_visit(timezone.now().date(), f"user:{activity.user_id}")
+            should_flush = len(self._activities) >= self.flush_threshold
+
+        if should_flush:
+            self.flush()
+
+    def add_visit(self, visitor=None, day=None):
+        """仅累加访问次数（未认证用户的访问），visitor 为访客标识"""
+        if not self.background:
+            self.write_after_commit([], day or timezone.now().date(), visitor)
+            return
+        self.start()
+        with self._lock:
+            self._record_visit(day or timezone.now().date(), visitor)
+
+    def _record_visit(self, day, visitor):
+        # 调用方需持有 self._lock
+        self._visits[day] += 1
+        if visitor:
+            if day not in self._sketches:
+                self._sketches[day] = visit_counter.HyperLogLog()
+            self._sketches[day].add(visitor)
+
+    def write_after_commit(self, activities, day, visitor):
+        """不使用后台线程时：当前事务提交后直接写入这一次访问，事务回滚时丢弃"""
+        sketches = {}
+        if visitor:
+            sketches[day] = visit_counter.HyperLogLog()
+            sketches[day].add(visitor)
+        transaction.on_commit(lambda: self.write(activities, Counter({day: 1}), sketches))
+
+    def flush(self):
+        """把缓冲区中的记录批量写入数据库"""
+        with self._flush_lock:
+            with self._lock:
+                activities = list(self._activities)
+                self._activities.clear()
+                visits = self._visits
+                sketches = self._sketches
+                self._visits = Counter()
+                self._sketches = {}
+
+            return self.write(activities, visits, sketches)
+
+    def write(self, activities, visits, sketches):
+        """写入活动记录并累加访问次数，返回写入的活动条数"""
+        from .models_activity import UserActivity
+
+        if not activities and not visits:
+            return 0
+
+        written = 0
+        if activities:
+            try:
+                UserActivity.objects.bulk_create(activities, batch_size=self.flush_threshold)
+                written = len(activities)
+            except Exception as e:
+                # 如果表不存在或其他错误，记录到日志但不影响正常流程
+                logger.warning(f"批量写入用户活动失败，丢弃 {len(activities)} 条记录: {str(e)}")
+                with self._lock:
+                    self.dropped_count += len(activities)
+
+        for day, count in visits.items():
+            try:
+                visit_counter.increment(day, count, sketches.get(day))
+            except Exception as e:
+                logger.warning(f"无法更新访问趋势数据: {str(e)}")
+
+        with self._lock:
+            self.flushed_count += written
+            self.flush_runs += 1
+            self.last_flush_at = timezone.now()
+
+        return written
+
+    def stats(self):
+        """返回缓冲区的运行统计"""
+        with self._lock:
+            return {
+                'buffered': len(self._activities),
+                'pending_visit_days': len(self._visits),
+                'flushed': self.flushed_count,
+                'dropped': self.dropped_count,
+                'flush_runs': self.flush_runs,
+                'last_flush_at': self.last_flush_at.isoformat() if self.last_flush_at else None,
+                'max_size': self.max_size,
+                'flush_threshold': self.flush_threshold,
+                'flush_interval': self.flush_interval,
+            }
+
+    def start(self):
+        """启动后台定时刷新线程（首次写入时惰性启动）"""
+        if self.is_running:
+            return
+
+        with self._lock:
+            if self.is_running:
+                return
+            self.is_running = True
+
+        def run_flush():
+            while self.is_running:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"活动缓冲区刷新错误: {str(e)}")
+                finally:
+                    # 后台线程持有独立的数据库连接，每轮结束后释放过期连接
+                    close_old_connections()
+
+        self.thread = threading.Thread(target=run_flush, daemon=True)
+        self.thread.start()
+        logger.info("用户活动缓冲区已启动")
+
+    def drain(self):
+        """停止后台线程并写入剩余记录（进程退出时调用）"""
+        self.is_running = False
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"排空活动缓冲区失败: {str(e)}")
+
+
+# 全局缓冲区实例
+activity_buffer = ActivityBuffer()
+atexit.register(activity_buffer.drain)
+
+
+def buffer_activity(activity):
+    """
+    将活动记录加入缓冲区
+    """
+    activity_buffer.add_activity(activity)
+
+
+def buffer_visit(visitor=None):
+    """
+    累加一次访问（不记录活动明细）
+    """
+    activity_buffer.add_visit(visitor)
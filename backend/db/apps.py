@@ -11,6 +11,16 @@ class DbConfig(AppConfig):
     def ready(self):
         # 导入模型以确保信号处理器被注册
         from . import models
+        # 注册维修记录日汇总的增量维护信号
+        from . import maintenance_rollup
+        # 后台导入任务模型
+        from . import models_import_job
+        # 配置表进程内缓存，配置修改时递增版本号
+        from . import config_registry
+        # Excel 模板缓存（随配置版本重新渲染）
+        from . import template_cache
+        # 维修记录/故障案例搜索索引的增量维护信号
+        from . import search_index
         
         # 启动token清理调度器
         try:
@@ -1,4 +1,3 @@
-from django.http import HttpResponse
 from django.core.exceptions import ValidationError
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -6,16 +5,19 @@ from rest_framework.response import Response
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
-import pandas as pd
-from io import BytesIO
 from .models import Asset
+from .asset_import import upsert_assets
+from .excel_reader import iter_excel_chunks
+from .template_cache import template_response, workbook_bytes
+from .import_jobs import wants_background, create_import_job, accepted_payload
+from .excel_export import (
+    Column, ExportSpec, EXPORT_FORMATS, date_text, export_response, get_export_format
+)
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def download_asset_template(request):
+def build_asset_template():
     """
-    下载资产数据模板
+    渲染资产数据模板，返回 xlsx 字节内容
     """
     wb = Workbook()
     ws = wb.active
@@ -55,18 +57,38 @@ def download_asset_template(request):
         for col_num, cell_value in enumerate(row_data, 1):
             ws.cell(row=row_num, column=col_num, value=cell_value)
     
-    # 保存工作簿到内存
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    # 返回Excel文件
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=资产数据模板.xlsx'
-    return response
+    return workbook_bytes(wb)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_asset_template(request):
+    """
+    下载资产数据模板（按配置版本缓存，支持 ETag/Last-Modified 条件请求）
+    """
+    return template_response(request, 'asset', '资产数据模板.xlsx', build_asset_template)
+
+
+# 资产导出规格（表头与模板一致）
+ASSET_EXPORT_SPEC = ExportSpec(
+    sheet_title='资产数据',
+    filename='资产数据',
+    columns=[
+        Column('设备名称', 'name'),
+        Column('设备编号', 'ref'),
+        Column('期别', 'phase__name'),
+        Column('工序', 'process__name'),
+        Column('产线', 'production_line__name'),
+        Column('设备类型', 'asset_type'),
+        Column('位置', 'location'),
+        Column('购买日期', 'purchase_date', date_text('%Y-%m-%d')),
+        Column('保修到期日', 'warranty_expiration_date', date_text('%Y-%m-%d')),
+        Column('成本', 'cost', dtype='float'),
+        Column('当前价值', 'current_value', dtype='float'),
+        Column('状态', 'status'),
+        Column('状态详情', 'state'),
+    ],
+)
 
 
 @api_view(['POST'])
@@ -81,71 +103,24 @@ def download_filtered_assets(request):
     # 构建查询条件
     filters = {}
     if phase_filter:
-        filters['phase'] = phase_filter
+        filters['phase__name'] = phase_filter
     
     # 查询符合条件的资产数据
     assets = Asset.objects.filter(**filters).order_by('phase', 'production_line', 'process', 'name')
-    
-    # 创建Excel工作簿
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "资产数据"
-    
-    # 定义表头（与模板一致）
-    headers = [
-        '设备名称', '设备编号', '期别', '工序', '产线', '设备类型', '位置', 
-        '购买日期', '保修到期日', '成本', '当前价值', '状态', '状态详情'
-    ]
-    
-    # 设置表头
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-    
-    # 调整列宽
-    for col_num, header in enumerate(headers, 1):
-        ws.column_dimensions[get_column_letter(col_num)].width = 15
-    
-    # 填充数据
-    for row_num, asset in enumerate(assets, 2):
-        row_data = [
-            asset.name or '',
-            asset.ref or '',
-            asset.phase or '',
-            asset.process or '',
-            asset.production_line or '',
-            asset.asset_type or '',
-            asset.location or '',
-            asset.purchase_date.strftime('%Y-%m-%d') if asset.purchase_date else '',
-            asset.warranty_expiration_date.strftime('%Y-%m-%d') if asset.warranty_expiration_date else '',
-            float(asset.cost) if asset.cost else 0.0,
-            float(asset.current_value) if asset.current_value else 0.0,
-            asset.status or '',
-            asset.state or ''
-        ]
-        
-        for col_num, cell_value in enumerate(row_data, 1):
-            ws.cell(row=row_num, column=col_num, value=cell_value)
-    
-    # 保存工作簿到内存
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    # 返回Excel文件
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=资产数据.xlsx'
-    return response
+
+    export_format = get_export_format(request)
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': f'不支持的导出格式: {export_format}'}, status=400)
+    return export_response(ASSET_EXPORT_SPEC, assets, export_format)
+
+
+def import_asset_records(df):
+    """
+    从 DataFrame 导入资产记录（按设备编号新增或更新）
+    返回 (成功导入数量, 错误列表)，未变化的行也计入成功
+    """
+    result = upsert_assets(df)
+    return result['created'] + result['updated'] + result['unchanged'], result['errors']
 
 
 @api_view(['POST'])
@@ -164,126 +139,22 @@ def upload_asset_records(request):
         if not uploaded_file.name.endswith(('.xlsx', '.xls')):
             return Response({'error': '只支持Excel文件(.xlsx, .xls)'}, status=400)
         
-        # 使用pandas读取Excel文件
-        df = pd.read_excel(BytesIO(uploaded_file.read()))
-        
-        imported_count = 0
-        errors = []
+        # 大文件提交为后台导入任务，立即返回任务ID
+        if wants_background(request):
+            job = create_import_job('assets', uploaded_file, user=request.user)
+            return Response(accepted_payload(job), status=202)
         
-        for index, row in df.iterrows():
-            try:
-                # 处理期数字段
-                phase_text = row.get('期别', '')
-                if pd.notna(phase_text):
-                    if isinstance(phase_text, str):
-                        if '一' in phase_text or '1' in str(phase_text):
-                            phase = '一期'
-                        elif '二' in phase_text or '2' in str(phase_text):
-                            phase = '二期'
-                        else:
-                            phase = str(phase_text)
-                    else:
-                        phase = str(phase_text)
-                else:
-                    phase = None
-                
-                # 处理工序字段
-                process = row.get('工序', '')
-                if pd.notna(process):
-                    process = str(process)
-                else:
-                    process = None
-                
-                # 处理产线字段
-                production_line = row.get('产线', '')
-                if pd.notna(production_line):
-                    production_line = str(production_line)
-                else:
-                    production_line = None
-                
-                # 处理购买日期
-                purchase_date = row.get('购买日期', '')
-                if pd.notna(purchase_date):
-                    try:
-                        from datetime import datetime
-                        if isinstance(purchase_date, str):
-                            purchase_date = datetime.strptime(purchase_date, '%Y-%m-%d')
-                        else:
-                            purchase_date = pd.to_datetime(purchase_date)
-                    except ValueError:
-                        purchase_date = None
-                else:
-                    purchase_date = None
-                
-                # 处理保修到期日
-                warranty_expiration_date = row.get('保修到期日', '')
-                if pd.notna(warranty_expiration_date):
-                    try:
-                        from datetime import datetime
-                        if isinstance(warranty_expiration_date, str):
-                            warranty_expiration_date = datetime.strptime(warranty_expiration_date, '%Y-%m-%d')
-                        else:
-                            warranty_expiration_date = pd.to_datetime(warranty_expiration_date)
-                    except ValueError:
-                        warranty_expiration_date = None
-                else:
-                    warranty_expiration_date = None
-                
-                # 处理成本
-                cost = row.get('成本', 0)
-                if pd.isna(cost) or cost == '':
-                    cost = 0
-                else:
-                    try:
-                        cost = float(cost)
-                    except (ValueError, TypeError):
-                        cost = 0
-                
-                # 处理当前价值
-                current_value = row.get('当前价值', 0)
-                if pd.isna(current_value) or current_value == '':
-                    current_value = 0
-                else:
-                    try:
-                        current_value = float(current_value)
-                    except (ValueError, TypeError):
-                        current_value = 0
-                
-                # 处理其他字段
-                name = row.get('设备名称', '')
-                ref = row.get('设备编号', '')
-                asset_type = row.get('设备类型', 'Equipment')
-                location = row.get('位置', '')
-                status = row.get('状态', 'Active')
-                state = row.get('状态详情', '')
-                
-                # 创建或更新资产记录
-                asset, created = Asset.objects.update_or_create(
-                    ref=ref,
-                    defaults={
-                        'name': str(name) if pd.notna(name) else '',
-                        'phase': phase,
-                        'process': str(process) if pd.notna(process) else None,
-                        'production_line': str(production_line) if pd.notna(production_line) else None,
-                        'asset_type': str(asset_type) if pd.notna(asset_type) else 'Equipment',
-                        'location': str(location) if pd.notna(location) else '',
-                        'purchase_date': purchase_date,
-                        'warranty_expiration_date': warranty_expiration_date,
-                        'cost': cost,
-                        'current_value': current_value,
-                        'status': str(status) if pd.notna(status) else 'Active',
-                        'state': str(state) if pd.notna(state) else ''
-                    }
-                )
-                
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"第{index + 2}行处理失败: {str(e)}")
+        # 流式读取，按块新增或更新
+        result = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': [], 'changes': []}
+        for df in iter_excel_chunks(uploaded_file):
+            chunk_result = upsert_assets(df)
+            for key in result:
+                result[key] += chunk_result[key]
+        imported_count = result['created'] + result['updated'] + result['unchanged']
         
         return Response({
             'message': f'成功导入 {imported_count} 条记录',
-            'errors': errors
+            **result,
         })
     
     except Exception as e:
@@ -0,0 +1,236 @@
+"""
+资产 Excel 批量导入（按设备编号新增或更新）
+
+1. 文件中涉及的已有资产（设备编号 -> 字段值）一次查询读入
+2. 期别/工序/产线名称（或代码）通过字典解析为外键 id，每个不同的值只解析一次
+3. 按列转换后与数据库中的值逐行比较，分为新增、修改、未变化三组
+4. 新增和修改分别 bulk_create / bulk_update 分批写入，未变化的行不写入
+每个新增或修改的行返回变更明细：{'row', 'ref', 'action', 'changes': {列名: [旧值, 新值]}}
+"""
+import logging
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from .maintenance_import import column, get_batch_size, to_python
+from .models import Asset, PlantPhase, Process, ProductionLine
+
+logger = logging.getLogger(__name__)
+
+# 模型字段 -> Excel 列名（与导出模板一致）
+FIELD_HEADERS = {
+    'name': '设备名称',
+    'phase_id': '期别',
+    'process_id': '工序',
+    'production_line_id': '产线',
+    'asset_type': '设备类型',
+    'location': '位置',
+    'purchase_date': '购买日期',
+    'warranty_expiration_date': '保修到期日',
+    'cost': '成本',
+    'current_value': '当前价值',
+    'status': '状态',
+    'state': '状态详情',
+}
+ASSET_FIELDS = list(FIELD_HEADERS)
+
+# 文本列的空值默认值
+TEXT_DEFAULTS = {
+    'name': '',
+    'asset_type': 'Equipment',
+    'location': '',
+    'status': 'Active',
+    'state': '',
+}
+
+
+def text_values(df, header, default):
+    values = column(df, header)
+    return values.map(lambda value: default if not isinstance(value, str) and pd.isna(value) else str(value))
+
+
+def date_values(df, header):
+    """无法解析的日期视为空"""
+    return pd.to_datetime(column(df, header), errors='coerce').map(to_python)
+
+
+def money_values(df, header):
+    """无法解析的金额视为 0，保留两位小数与 DecimalField 一致"""
+    values = pd.to_numeric(column(df, header), errors='coerce').fillna(0)
+    return values.map(lambda value: Decimal(f'{value:.2f}'))
+
+
+class ConfigLookup:
+    """
+    配置表名称/代码 -> id 字典
+    rows 为 (id, code, name, scope)，scope 不为空时（如产线所属期数）优先在同一 scope 内查找
+    未命中时按 normalize 规则再查一次
+    """
+
+    def __init__(self, rows, normalize=None):
+        self.ids = {}
+        self.scoped_ids = {}
+        self.names = {}
+        for pk, code, name, scope in rows:
+            for key in (name, code):
+                self.ids.setdefault(key, pk)
+                self.scoped_ids.setdefault((scope, key), pk)
+            self.names[pk] = name
+        self.normalize = normalize
+
+    def resolve(self, text, scope=None):
+        text = str(text).strip()
+        if self.normalize and text not in self.ids:
+            text = self.normalize(text)
+        return self.scoped_ids.get((scope, text), self.ids.get(text))
+
+
+def normalize_phase(text):
+    """沿用原导入规则：含“一”或“1”视为一期，含“二”或“2”视为二期"""
+    if '一' in text or '1' in text:
+        return '一期'
+    if '二' in text or '2' in text:
+        return '二期'
+    return text
+
+
+def resolve_column(df, header, lookup, row_numbers, errors, scopes=None):
+    """
+    把名称列解析为 id 列，每个不同的 (scope, 名称) 只解析一次
+    非空但不存在的值记录错误
+    """
+    texts = column(df, header)
+    present = texts.notna() & (texts.astype(str).str.strip() != '')
+    scopes = scopes if scopes is not None else pd.Series(None, index=df.index, dtype=object)
+    resolved = {}
+    ids = []
+    for index in df.index:
+        key = (scopes[index], texts[index])
+        if present[index] and key not in resolved:
+            resolved[key] = lookup.resolve(texts[index], scopes[index])
+        ids.append(resolved[key] if present[index] else None)
+    ids = pd.Series(ids, index=df.index, dtype=object)
+    for index in df.index[present & ids.isna()]:
+        errors.setdefault(row_numbers[index], f"第{row_numbers[index]}行{header}不存在: {texts[index]}")
+    return ids
+
+
+def display_value(field, value, lookups):
+    """变更明细中的显示值：外键显示名称，日期和金额转为文本"""
+    if value is None:
+        return None
+    if field in lookups:
+        return lookups[field].names.get(value, value)
+    if isinstance(value, (Decimal, datetime)):
+        return str(value)
+    return value
+
+
+def upsert_assets(df):
+    """
+    从 DataFrame 新增或更新资产
+    返回 {'created', 'updated', 'unchanged', 'errors', 'changes'}
+    """
+    row_numbers = pd.Series(df.index + 2, index=df.index)
+    errors = {}
+
+    refs = text_values(df, '设备编号', '').str.strip()
+    for index in df.index[refs == '']:
+        errors[row_numbers[index]] = f"第{row_numbers[index]}行缺少设备编号"
+
+    # 同一设备编号出现多次时以最后一行为准
+    duplicated = (refs != '') & refs.duplicated(keep='last')
+    last_rows = {ref: row_numbers[index] for index, ref in refs[refs != ''].items()}
+    for index in df.index[duplicated]:
+        errors.setdefault(
+            row_numbers[index],
+            f"第{row_numbers[index]}行设备编号重复，已被第{last_rows[refs[index]]}行覆盖"
+        )
+
+    # 1. 配置表一次性读入
+    lookups = {
+        'phase_id': ConfigLookup(
+            [(pk, code, name, None) for pk, code, name in PlantPhase.objects.values_list('id', 'code', 'name')],
+            normalize_phase
+        ),
+        'process_id': ConfigLookup(
+            [(pk, code, name, None) for pk, code, name in Process.objects.values_list('id', 'code', 'name')]
+        ),
+        # 不同期数可能有同名产线，按该行的期数优先匹配
+        'production_line_id': ConfigLookup(
+            ProductionLine.objects.values_list('id', 'code', 'name', 'phase_id')
+        ),
+    }
+
+    # 2. 按列转换
+    values = {field: text_values(df, FIELD_HEADERS[field], default) for field, default in TEXT_DEFAULTS.items()}
+    values['phase_id'] = resolve_column(df, '期别', lookups['phase_id'], row_numbers, errors)
+    values['process_id'] = resolve_column(df, '工序', lookups['process_id'], row_numbers, errors)
+    values['production_line_id'] = resolve_column(
+        df, '产线', lookups['production_line_id'], row_numbers, errors, scopes=values['phase_id']
+    )
+    for field in ('purchase_date', 'warranty_expiration_date'):
+        values[field] = date_values(df, FIELD_HEADERS[field])
+    for field in ('cost', 'current_value'):
+        values[field] = money_values(df, FIELD_HEADERS[field])
+
+    valid = ~row_numbers.isin(list(errors))
+
+    # 3. 文件中涉及的已有资产一次读入，设备编号在库中不唯一时无法确定更新哪一条
+    existing = {}
+    ambiguous = set()
+    for row in Asset.objects.filter(ref__in=list(refs[valid].unique())).values('uuid', 'ref', *ASSET_FIELDS):
+        if row['ref'] in existing:
+            ambiguous.add(row['ref'])
+        existing[row['ref']] = row
+    for index in df.index[valid & refs.isin(ambiguous)]:
+        errors[row_numbers[index]] = f"第{row_numbers[index]}行设备编号在系统中不唯一: {refs[index]}"
+    valid &= ~refs.isin(ambiguous)
+
+    to_create = []
+    to_update = []
+    changes = []
+    unchanged = 0
+    now = timezone.now()
+    for index in df.index[valid]:
+        ref = refs[index]
+        new_values = {field: values[field][index] for field in ASSET_FIELDS}
+        current = existing.get(ref)
+        if current is None:
+            to_create.append(Asset(ref=ref, **new_values))
+            changes.append({'row': int(row_numbers[index]), 'ref': ref, 'action': 'created', 'changes': {}})
+            continue
+        diff = {
+            FIELD_HEADERS[field]: [
+                display_value(field, current[field], lookups),
+                display_value(field, new_values[field], lookups),
+            ]
+            for field in ASSET_FIELDS if current[field] != new_values[field]
+        }
+        if not diff:
+            unchanged += 1
+            continue
+        # bulk_update 不触发 auto_now，显式设置更新时间
+        to_update.append(Asset(uuid=current['uuid'], ref=ref, last_updated_at=now, **new_values))
+        changes.append({'row': int(row_numbers[index]), 'ref': ref, 'action': 'updated', 'changes': diff})
+
+    # 4. 分批写入
+    with transaction.atomic():
+        Asset.objects.bulk_create(to_create, batch_size=get_batch_size())
+        Asset.objects.bulk_update(to_update, ASSET_FIELDS + ['last_updated_at'], batch_size=get_batch_size())
+
+    error_list = [errors[row_number] for row_number in sorted(errors)]
+    logger.info(
+        f"批量导入资产：新增 {len(to_create)} 条，修改 {len(to_update)} 条，"
+        f"未变化 {unchanged} 条，失败 {len(error_list)} 行"
+    )
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'unchanged': unchanged,
+        'errors': error_list,
+        'changes': changes,
+    }
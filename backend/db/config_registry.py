@@ -0,0 +1,230 @@
+"""
+配置表进程内缓存
+
+期数、产线、工序、班次很少修改，却几乎每个请求都要查询。
+1. 每个进程保存一份配置快照：代码 -> 对象、id -> 名称，以及各配置接口预先序列化好的 JSON
+2. 配置写入（保存/删除信号，或批量写入后调用 bump）时递增数据库中的 ConfigVersion，并丢弃本进程快照
+3. 其他进程每隔 CONFIG_REGISTRY_CHECK_INTERVAL 秒读取一次版本号，版本变化时重建快照，
+   两次检查之间的查找不访问数据库
+配置接口以版本号作为 ETag，浏览器带 If-None-Match 再次请求时返回 304
+快照中的对象由多个线程共享，只能读取，不要修改后保存
+"""
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import ConfigVersion, PlantPhase, ProductionLine, Process, ShiftType
+
+logger = logging.getLogger(__name__)
+
+CONFIG_MODELS = (PlantPhase, ProductionLine, Process, ShiftType)
+
+
+def get_check_interval():
+    return getattr(settings, 'CONFIG_REGISTRY_CHECK_INTERVAL', 5)
+
+
+def read_version():
+    """返回数据库中的 (版本号, 更新时间)，版本行不存在时为 (0, None)"""
+    row = ConfigVersion.objects.filter(pk=1).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+# ---------------------------------------------------------------------------
+# 配置接口的返回内容，由快照中的行生成（行按 id 排序）
+# ---------------------------------------------------------------------------
+
+def pick(row, *fields):
+    return {field: row[field] for field in fields}
+
+
+def config_data_payload(snapshot):
+    """maintenance.config_views.get_config_data：只包含启用的配置"""
+    phase_codes = {row['id']: row['code'] for row in snapshot.rows[PlantPhase]}
+
+    def active(model):
+        return [row for row in snapshot.rows[model] if row['is_active']]
+
+    return {
+        'phases': [pick(row, 'id', 'code', 'name', 'description') for row in active(PlantPhase)],
+        'productionLines': [
+            {**pick(row, 'id', 'code', 'name'), 'phase_code': phase_codes.get(row['phase_id']),
+             'description': row['description']}
+            for row in active(ProductionLine)
+        ],
+        'processes': [pick(row, 'id', 'code', 'name', 'description') for row in active(Process)],
+        'shiftTypes': [pick(row, 'id', 'code', 'name', 'description') for row in active(ShiftType)],
+    }
+
+
+def all_configurations_payload(snapshot):
+    """db.views_advanced_management.get_all_configurations"""
+    phase_names = snapshot.names[PlantPhase]
+    return {
+        'phases': [pick(row, 'id', 'code', 'name') for row in snapshot.rows[PlantPhase]],
+        'processes': [pick(row, 'id', 'code', 'name') for row in snapshot.rows[Process]],
+        'production_lines': [
+            {**pick(row, 'id', 'code', 'name', 'phase_id'), 'phase__name': phase_names.get(row['phase_id'])}
+            for row in snapshot.rows[ProductionLine]
+        ],
+    }
+
+
+PAYLOADS = {
+    'config_data': config_data_payload,
+    'all_configurations': all_configurations_payload,
+    'phases': lambda snapshot: [pick(row, 'id', 'name', 'code') for row in snapshot.rows[PlantPhase]],
+    'processes': lambda snapshot: [pick(row, 'id', 'name', 'code') for row in snapshot.rows[Process]],
+    'production_lines': lambda snapshot: [
+        {**pick(row, 'id', 'name', 'code'), 'phase': row['phase_id']} for row in snapshot.rows[ProductionLine]
+    ],
+}
+
+
+class ConfigSnapshot:
+    """
+    某个版本的全部配置
+    rows: 模型 -> 行字典列表；objects: 模型 -> {id: 对象}；by_code: 模型 -> {代码: 对象}；names: 模型 -> {id: 名称}
+    """
+
+    def __init__(self, version, last_modified):
+        self.version = version
+        self.last_modified = last_modified or timezone.now()
+        self.rows = {}
+        self.objects = {}
+        self.by_code = {}
+        self.names = {}
+        for model in CONFIG_MODELS:
+            fields = [field.attname for field in model._meta.concrete_fields]
+            rows = list(model.objects.order_by('id').values(*fields))
+            self.rows[model] = rows
+            self.objects[model] = {row['id']: self.make_object(model, row) for row in rows}
+            by_code = {}
+            for row in rows:
+                # 产线代码只在同一期数内唯一，按代码查找时取第一条
+                by_code.setdefault(row['code'], self.objects[model][row['id']])
+            self.by_code[model] = by_code
+            self.names[model] = {row['id']: row['name'] for row in rows}
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_object(model, row):
+        obj = model(**row)
+        obj._state.adding = False
+        obj._state.db = 'default'
+        return obj
+
+    def payload(self, name):
+        """返回 (JSON 字节内容, ETag)，每个版本只序列化一次"""
+        with self._lock:
+            if name not in self._payloads:
+                content = json.dumps(
+                    PAYLOADS[name](self), cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')
+                ).encode('utf-8')
+                self._payloads[name] = (content, quote_etag(f'config-{name}-{self.version}'))
+            return self._payloads[name]
+
+
+class ConfigRegistry:
+    """进程内配置快照，按数据库版本号判断是否过期"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < get_check_interval():
+            return snapshot
+        with self._lock:
+            version, last_modified = read_version()
+            if self._snapshot is None or self._snapshot.version != version:
+                # 先读版本号再读配置：并发写入时最多多重建一次，不会把旧配置记为新版本
+                self._snapshot = ConfigSnapshot(version, last_modified)
+            self._checked_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        """丢弃本进程的快照，下次访问时重新读取"""
+        self._snapshot = None
+
+    def bump(self):
+        """配置写入后调用：递增数据库版本号，使所有进程的快照过期"""
+        updated = ConfigVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            ConfigVersion.objects.get_or_create(pk=1, defaults={'version': 2})
+        self.invalidate()
+        # 事务提交前其他线程可能已用旧数据重建快照，提交后再丢弃一次
+        transaction.on_commit(self.invalidate)
+
+    # 查找（不访问数据库）
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    @property
+    def last_modified(self):
+        return self.snapshot().last_modified
+
+    def get_by_code(self, model, code):
+        return self.snapshot().by_code[model].get(code)
+
+    def get_by_id(self, model, pk):
+        return self.snapshot().objects[model].get(pk)
+
+    def name(self, model, pk):
+        return self.snapshot().names[model].get(pk)
+
+    def values(self, model, *fields, active_only=False):
+        """相当于 model.objects.values(*fields)，按 id 排序"""
+        return [
+            pick(row, *fields) for row in self.snapshot().rows[model]
+            if row['is_active'] or not active_only
+        ]
+
+
+# 全局配置缓存实例
+config_registry = ConfigRegistry()
+
+
+def config_response(request, name):
+    """返回预先序列化的配置接口内容，If-None-Match 命中时返回 304"""
+    snapshot = config_registry.snapshot()
+    content, etag = snapshot.payload(name)
+    last_modified = int(snapshot.last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # 允许浏览器缓存，但每次使用前都需要验证
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@receiver(post_save, sender=PlantPhase)
+@receiver(post_save, sender=ProductionLine)
+@receiver(post_save, sender=Process)
+@receiver(post_save, sender=ShiftType)
+@receiver(post_delete, sender=PlantPhase)
+@receiver(post_delete, sender=ProductionLine)
+@receiver(post_delete, sender=Process)
+@receiver(post_delete, sender=ShiftType)
+def bump_config_version(sender, **kwargs):
+    config_registry.bump()
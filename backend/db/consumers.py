@@ -0,0 +1,43 @@
+import json
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from .import_jobs import job_group_name
+from .models_import_job import ImportJob
+
+
+@database_sync_to_async
+def load_job(job_id, user_id, is_staff):
+    jobs = ImportJob.objects.filter(pk=job_id)
+    if not is_staff:
+        jobs = jobs.filter(created_by_id=user_id)
+    job = jobs.first()
+    return job.to_dict() if job else None
+
+
+class ImportJobConsumer(AsyncWebsocketConsumer):
+    """
+    导入任务进度推送
+    连接后先发送任务当前状态，之后每个分块完成时由工作进程通过 import_job_<任务ID> 组推送
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user:
+            await self.close()
+            return
+        self.job_id = self.scope['url_route']['kwargs']['job_id']
+        job = await load_job(self.job_id, user['user']['id'], user['user'].get('is_staff', False))
+        if job is None:
+            await self.close()
+            return
+        self.group_name = job_group_name(self.job_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send(text_data=json.dumps(job))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def import_progress(self, event):
+        await self.send(text_data=json.dumps(event['job']))
@@ -0,0 +1,141 @@
+"""
+流式读取 Excel
+
+openpyxl read_only 模式按行解析工作表 XML，不把整个工作簿载入内存。
+iter_excel_chunks 每读满 chunk_size 行产出一个 DataFrame，导入流程逐块处理，
+内存占用取决于分块大小而不是文件大小。
+DataFrame 的列名与行索引与 pd.read_excel 一致：空表头为 'Unnamed: N'，重名表头加 '.1' 后缀，
+行索引从 0 开始连续编号（行号 = 索引 + 表头行号 + 1），末尾的空行不产出。
+"""
+from contextlib import contextmanager
+from itertools import islice
+
+import pandas as pd
+from django.conf import settings
+from openpyxl import load_workbook
+
+
+def get_chunk_size():
+    return getattr(settings, 'IMPORT_JOB_CHUNK_SIZE', 1000)
+
+
+def get_preview_rows():
+    return getattr(settings, 'EXCEL_PREVIEW_ROWS', 100)
+
+
+def excel_source(file):
+    """上传文件落在临时文件上时直接按路径读取，避免再复制到内存"""
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return file
+
+
+@contextmanager
+def open_workbook(file):
+    workbook = load_workbook(excel_source(file), read_only=True, data_only=True)
+    try:
+        yield workbook
+    finally:
+        workbook.close()
+
+
+def make_headers(values):
+    """与 pandas 一致的列名：空表头为 'Unnamed: N'，重复的列名依次加 .1、.2"""
+    headers = []
+    seen = {}
+    for position, value in enumerate(values):
+        header = f'Unnamed: {position}' if value is None or value == '' else value
+        if header in seen:
+            seen[header] += 1
+            header = f'{header}.{seen[header]}'
+        else:
+            seen[header] = 0
+        headers.append(header)
+    return headers
+
+
+def get_sheet(workbook, sheet_name=None):
+    """sheet_name 为 None 时取第一个工作表，也可以是工作表名称或序号"""
+    if sheet_name is None:
+        return workbook.worksheets[0]
+    if isinstance(sheet_name, int):
+        return workbook.worksheets[sheet_name]
+    return workbook[sheet_name]
+
+
+class SheetReader:
+    """
+    一个工作表的流式读取器
+    headers: 列名；estimated_rows: 按工作表尺寸估计的数据行数（可能包含末尾空行）
+    """
+
+    def __init__(self, worksheet, header=0):
+        self.worksheet = worksheet
+        self.header = header
+        self.rows = worksheet.iter_rows(values_only=True)
+        header_values = next(islice(self.rows, header, None), ())
+        self.headers = make_headers(header_values)
+        max_row = worksheet.max_row or 0
+        self.estimated_rows = max(max_row - header - 1, 0)
+
+    def iter_rows(self):
+        """逐行产出与表头等长的值元组，末尾的空行不产出"""
+        width = len(self.headers)
+        blank = 0
+        for values in self.rows:
+            values = tuple(values[:width]) + (None,) * (width - len(values))
+            if all(value is None for value in values):
+                blank += 1
+                continue
+            for _ in range(blank):
+                yield (None,) * width
+            blank = 0
+            yield values
+
+    def iter_chunks(self, chunk_size=None):
+        """每 chunk_size 行产出一个 DataFrame，索引在整个工作表内连续"""
+        chunk_size = chunk_size or get_chunk_size()
+        rows = self.iter_rows()
+        start = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            frame = pd.DataFrame.from_records(chunk, columns=self.headers, coerce_float=True)
+            frame.index = pd.RangeIndex(start, start + len(chunk))
+            # 与 read_excel 一致：按列推断类型（整数列、日期列等）
+            yield frame.infer_objects()
+            start += len(chunk)
+
+
+def iter_excel_chunks(file, chunk_size=None, sheet_name=None, header=0):
+    """
+    打开上传文件或路径，逐块产出 DataFrame
+    header 为表头所在的行（从 0 开始，与 pd.read_excel 的 header 参数相同）
+    """
+    with open_workbook(file) as workbook:
+        reader = SheetReader(get_sheet(workbook, sheet_name), header)
+        yield from reader.iter_chunks(chunk_size)
+
+
+def preview_sheet(file, sheet_name=None, rows=None):
+    """
+    只读取工作表的前 rows 行
+    返回 {'columns', 'data', 'shape'}，shape 的行数按工作表尺寸估计
+    """
+    rows = rows or get_preview_rows()
+    with open_workbook(file) as workbook:
+        reader = SheetReader(get_sheet(workbook, sheet_name))
+        frame = next(reader.iter_chunks(rows), pd.DataFrame(columns=reader.headers))
+        return {
+            'columns': reader.headers,
+            'data': frame.astype(object).where(frame.notna(), None).to_dict(orient='records'),
+            'shape': (max(reader.estimated_rows, len(frame)), len(reader.headers)),
+        }
+
+
+def sheet_names(file):
+    with open_workbook(file) as workbook:
+        return workbook.sheetnames
@@ -0,0 +1,37 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .models_import_job import ImportJob
+
+
+def visible_jobs(user):
+    """管理员可查看全部导入任务，其他用户只能查看自己提交的任务"""
+    jobs = ImportJob.objects.all()
+    if not user.is_staff:
+        jobs = jobs.filter(created_by=user)
+    return jobs
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_import_job(request, job_id):
+    """
+    查询导入任务状态和进度
+    """
+    job = visible_jobs(request.user).filter(pk=job_id).first()
+    if job is None:
+        return Response({'error': '导入任务不存在'}, status=404)
+    return Response(job.to_dict())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_import_jobs(request):
+    """
+    最近的导入任务列表，可按 status 过滤
+    """
+    jobs = visible_jobs(request.user).order_by('-created_at')
+    status = request.GET.get('status')
+    if status:
+        jobs = jobs.filter(status=status)
+    return Response([job.to_dict() for job in jobs[:50]])
@@ -0,0 +1,298 @@
+"""
+Excel 后台导入任务
+
+1. 上传接口调用 create_import_job 保存文件并创建 ImportJob，立即返回任务ID
+2. run_import_worker 命令循环认领等待中的任务（数据库行锁，不依赖 Redis/Celery）
+3. 文件按 IMPORT_JOB_CHUNK_SIZE 行流式读取为 DataFrame 分块，由进程池并行导入
+   （分块之间有依赖的导入类型按文件顺序逐个导入）
+4. 每个分块完成后累加任务进度，并通过 Channels 推送到 import_job_<任务ID> 组
+客户端可轮询 /api/db/import-jobs/<任务ID>/，或连接 ws/import-jobs/<任务ID>/ 接收进度
+"""
+import logging
+import multiprocessing
+import os
+import socket
+from collections import deque
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.db import connections
+from django.db.models import F
+from django.db.models.fields.files import FieldFile
+
+from .excel_reader import SheetReader, get_sheet, open_workbook
+from .models_import_job import ImportJob
+
+logger = logging.getLogger(__name__)
+
+
+def get_chunk_size():
+    return getattr(settings, 'IMPORT_JOB_CHUNK_SIZE', 1000)
+
+
+def job_group_name(job_id):
+    return f"import_job_{job_id}"
+
+
+# ---------------------------------------------------------------------------
+# 导入类型：分块导入函数返回 (成功导入数量, 错误列表)，DataFrame 保留原始行索引（行号 = 索引 + 2）
+# ---------------------------------------------------------------------------
+
+def import_maintenance_record_chunk(df, params):
+    from .maintenance_import import import_maintenance_records
+    return import_maintenance_records(df, params.get('phase_code', ''), params.get('shift_type_code', ''))
+
+
+def import_asset_chunk(df, params):
+    from .asset_excel_views import import_asset_records
+    return import_asset_records(df)
+
+
+def import_task_plan_chunk(df, params):
+    from .task_plan_excel_handler import import_task_plan_frame
+    results = import_task_plan_frame(df)
+    return results['success_count'], results['errors']
+
+
+def validate_task_plan_columns(headers):
+    from .task_plan_excel_handler import missing_task_plan_columns
+    return [f'缺少必需列: {col}' for col in missing_task_plan_columns(headers)]
+
+
+def import_excel_upload_chunk(df, params):
+    from excelhandler.models import ExcelUpload
+    from excelhandler.views import import_maintenance_records_from_dataframe
+    excel_record = ExcelUpload.objects.get(pk=params['excel_record_id'])
+    user = User.objects.filter(pk=params.get('user_id')).first()
+    return import_maintenance_records_from_dataframe(df, excel_record, user), []
+
+
+def import_maintenance_excel_file(path, params):
+    from maintenance.utils import import_maintenance_records_from_excel
+    result = import_maintenance_records_from_excel(path, params['shift_type'], params['plant_phase'])
+    if not result['success']:
+        raise ValueError(result['errors'][0])
+    return result['imported_count'], result['errors']
+
+
+class ImportKind:
+    """
+    一种导入任务
+    import_chunk(df, params): 分块导入
+    validate(headers): 导入前检查表头，返回错误列表，非空时任务失败
+    import_file(path, params): 设置后不分块，整个文件在一个工作进程中处理
+    sequential: 分块按文件顺序逐个导入，不并行。资产按设备编号新增或更新，
+                同一新编号出现在两个并行分块中时会重复新增，且无法保证以最后一行为准
+    """
+
+    def __init__(self, import_chunk=None, validate=None, import_file=None, sequential=False):
+        self.import_chunk = import_chunk
+        self.validate = validate
+        self.import_file = import_file
+        self.sequential = sequential
+
+
+IMPORT_KINDS = {
+    'maintenance_records': ImportKind(import_chunk=import_maintenance_record_chunk),
+    'assets': ImportKind(import_chunk=import_asset_chunk, sequential=True),
+    'task_plans': ImportKind(import_chunk=import_task_plan_chunk, validate=validate_task_plan_columns),
+    'excel_upload': ImportKind(import_chunk=import_excel_upload_chunk),
+    'maintenance_excel': ImportKind(import_file=import_maintenance_excel_file),
+}
+
+
+def get_import_kind(kind):
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f'不支持的导入类型: {kind}')
+    return IMPORT_KINDS[kind]
+
+
+# ---------------------------------------------------------------------------
+# 创建任务
+# ---------------------------------------------------------------------------
+
+def wants_background(request):
+    """请求参数 background 优先，未指定时按 IMPORT_BACKGROUND_JOBS 设置决定是否后台导入"""
+    data = getattr(request, 'data', None) or {}
+    value = data.get('background', request.GET.get('background'))
+    if value is None:
+        return getattr(settings, 'IMPORT_BACKGROUND_JOBS', False)
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def create_import_job(kind, uploaded_file, params=None, user=None, filename=None):
+    """
+    保存上传文件（或本地文件对象）并创建等待中的导入任务
+    uploaded_file 为已保存到媒体存储的文件字段（FieldFile）时直接引用该文件，不再复制一份
+    """
+    get_import_kind(kind)
+    filename = filename or os.path.basename(uploaded_file.name)
+    job = ImportJob(
+        kind=kind,
+        filename=filename,
+        params=params or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    if isinstance(uploaded_file, FieldFile):
+        job.file.name = uploaded_file.name
+    else:
+        job.file.save(filename, uploaded_file, save=False)
+    job.save()
+    logger.info(f"创建导入任务 {job.uuid}: {kind} {filename}")
+    return job
+
+
+def create_import_job_from_path(kind, path, params=None, user=None):
+    with open(path, 'rb') as f:
+        return create_import_job(kind, File(f, name=os.path.basename(path)), params, user)
+
+
+def accepted_payload(job):
+    return {
+        'message': '导入任务已提交，正在后台处理',
+        'job_id': str(job.uuid),
+        'status': job.status,
+        'status_url': f'/api/db/import-jobs/{job.uuid}/',
+    }
+
+
+# ---------------------------------------------------------------------------
+# 执行任务
+# ---------------------------------------------------------------------------
+
+def publish_progress(job_id):
+    """把任务当前状态推送给订阅该任务的 WebSocket 客户端，推送失败不影响导入"""
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        job = ImportJob.objects.get(pk=job_id)
+        async_to_sync(channel_layer.group_send)(
+            job_group_name(job_id),
+            {'type': 'import_progress', 'job': job.to_dict()}
+        )
+    except Exception as e:
+        logger.warning(f"无法推送导入进度: {str(e)}")
+
+
+def run_chunk(job_id, kind, chunk, params):
+    """在工作进程中导入一个分块并累加进度"""
+    try:
+        imported, errors = get_import_kind(kind).import_chunk(chunk, params)
+    except Exception as e:
+        logger.error(f"导入任务 {job_id} 分块处理失败: {str(e)}")
+        imported = 0
+        errors = [f"第{chunk.index[0] + 2}-{chunk.index[-1] + 2}行处理失败: {str(e)}"]
+    ImportJob.add_progress(job_id, len(chunk), imported, errors)
+    publish_progress(job_id)
+    return imported
+
+
+def run_file(job_id, kind, path, params):
+    """在工作进程中一次处理整个文件"""
+    imported, errors = get_import_kind(kind).import_file(path, params)
+    rows = imported + len(errors)
+    ImportJob.objects.filter(pk=job_id).update(total_rows=rows)
+    ImportJob.add_progress(job_id, rows, imported, errors)
+    publish_progress(job_id)
+    return imported
+
+
+def init_worker_process():
+    """spawn 方式启动的子进程需要重新初始化 Django（fork 方式已继承）"""
+    from django.apps import apps
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+class ImportWorker:
+    """
+    导入任务执行器
+    processes > 0 时使用进程池并行处理分块，processes == 0 时在当前进程内顺序处理（便于调试）
+    """
+
+    def __init__(self, processes=None, chunk_size=None):
+        self.processes = getattr(settings, 'IMPORT_WORKER_PROCESSES', 2) if processes is None else processes
+        self.chunk_size = chunk_size or get_chunk_size()
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.pool = None
+
+    def __enter__(self):
+        if self.processes > 0:
+            # 子进程不能共用父进程的数据库连接，创建进程池前先关闭
+            connections.close_all()
+            self.pool = multiprocessing.Pool(self.processes, initializer=init_worker_process)
+        return self
+
+    def __exit__(self, *exc):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def run_tasks(self, func, tasks, sequential=False):
+        """
+        逐个提交任务，处理中的任务不超过进程数的两倍
+        读取文件和导入分块同时进行，内存中只保留少量分块
+        sequential 为 True 时每个任务完成后才提交下一个，按顺序执行
+        """
+        if self.pool is None:
+            for task in tasks:
+                func(*task)
+            return
+        if sequential:
+            for task in tasks:
+                self.pool.apply(func, task)
+            return
+        pending = deque()
+        for task in tasks:
+            pending.append(self.pool.apply_async(func, task))
+            while len(pending) >= self.processes * 2:
+                pending.popleft().get()
+        while pending:
+            pending.popleft().get()
+
+    def run_job(self, job):
+        """处理一个已认领的任务，返回刷新后的任务"""
+        try:
+            kind = get_import_kind(job.kind)
+            path = job.file.path
+            if kind.import_file:
+                self.run_tasks(run_file, [(job.pk, job.kind, path, job.params)])
+            else:
+                with open_workbook(path) as workbook:
+                    reader = SheetReader(get_sheet(workbook))
+                    errors = kind.validate(reader.headers) if kind.validate else []
+                    if errors:
+                        ImportJob.add_progress(job.pk, 0, 0, errors)
+                        job.finish(ImportJob.STATUS_FAILED, errors[0])
+                        publish_progress(job.pk)
+                        return job
+                    # 先按工作表尺寸估计总行数，读完后改为实际行数
+                    ImportJob.objects.filter(pk=job.pk).update(total_rows=reader.estimated_rows)
+                    self.run_tasks(run_chunk, (
+                        (job.pk, job.kind, chunk, job.params)
+                        for chunk in reader.iter_chunks(self.chunk_size)
+                    ), sequential=kind.sequential)
+                ImportJob.objects.filter(pk=job.pk).update(total_rows=F('processed_rows'))
+            job.refresh_from_db()
+            job.finish(ImportJob.STATUS_COMPLETED, f'成功导入 {job.imported_count} 条记录')
+        except Exception as e:
+            logger.error(f"导入任务 {job.pk} 处理失败: {str(e)}")
+            job.refresh_from_db()
+            job.finish(ImportJob.STATUS_FAILED, str(e))
+        publish_progress(job.pk)
+        return job
+
+    def run_next(self):
+        """认领并处理下一个等待中的任务，没有任务时返回 None"""
+        job = ImportJob.claim_next(self.name)
+        if job is None:
+            return None
+        logger.info(f"开始处理导入任务 {job.pk}: {job.kind} {job.filename}")
+        publish_progress(job.pk)
+        return self.run_job(job)
@@ -0,0 +1,219 @@
+"""
+维修记录 Excel 批量导入
+
+1. 期数/班次查找表一次性读入字典
+2. 用 pandas 按列解析和校验（期数、班次、日期时间、耗用时长、文本长度）
+3. 按 (期数, 班次) 前缀一次预留连续的序号
+4. 在一个事务内分批 bulk_create，并同步维护维修日汇总；数据库拒绝整批时逐行重试，只跳过出错的行
+错误报告与逐行导入时的格式一致：["第N行...", ...]
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+
+from maintenance.statistics import invalidate_statistics
+
+from . import maintenance_rollup, search_index
+from .models import PlantPhase, ShiftType
+from .models_maintenance_new import ShiftMaintenanceRecord
+
+logger = logging.getLogger(__name__)
+
+# Excel 列名 -> 模型字段（文本列）
+TEXT_COLUMNS = {
+    '设备名称': 'equipment_name',
+    '设备编号': 'equipment_number',
+    '生产线': 'production_line',
+    '工序': 'process',
+    '变更原因': 'change_reason',
+    '变更前': 'before_change',
+    '变更后': 'after_change',
+    '实施人': 'implementer',
+    '确认人': 'confirm_person',
+    '验收人': 'acceptor',
+    '备注': 'remarks',
+}
+
+# 变更原因的中文显示值转回选项代码（导出文件可直接导回）
+CHANGE_REASON_CODES = {label: code for code, label in ShiftMaintenanceRecord.CHANGE_REASON_CHOICES}
+
+
+def get_batch_size():
+    return getattr(settings, 'IMPORT_BATCH_SIZE', 500)
+
+
+def column(df, name):
+    """取列，不存在时返回全空列"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series([np.nan] * len(df), index=df.index, dtype=object)
+
+
+def parse_codes(texts, default, rules):
+    """
+    把 Excel 中的期数/班次文本解析为代码
+    非空文本按 rules [(关键字元组, 代码), ...] 依次匹配，都不匹配为 ''；空值使用 default
+    """
+    stripped = texts.str.strip() if texts.dtype == object else pd.Series(np.nan, index=texts.index)
+    has_text = stripped.notna() & (stripped != '')
+    text = texts.where(has_text, '').astype(str)
+    conditions = [
+        np.logical_or.reduce([text.str.contains(keyword, regex=False) for keyword in keywords])
+        for keywords, _ in rules
+    ]
+    parsed = np.select(conditions, [code for _, code in rules], default='')
+    return pd.Series(np.where(has_text, parsed, default or ''), index=texts.index)
+
+
+def parse_datetimes(values, row_numbers, errors):
+    """解析日期时间列，无法解析的行记录错误，返回 (datetime 列, 失败行掩码)"""
+    parsed = pd.to_datetime(values, errors='coerce')
+    failed = values.notna() & parsed.isna()
+    for row_number, value in zip(row_numbers[failed], values[failed]):
+        errors.setdefault(row_number, f"第{row_number}行处理失败: 无法解析日期时间 '{value}'")
+    return parsed, failed
+
+
+def check_lengths(values, row_numbers, errors):
+    """检查文本列是否超过模型字段的 max_length，超长的行记录错误，返回失败行掩码"""
+    failed = pd.Series(False, index=row_numbers.index)
+    for name, field in TEXT_COLUMNS.items():
+        max_length = ShiftMaintenanceRecord._meta.get_field(field).max_length
+        if max_length is None:
+            continue
+        series = values[field]
+        lengths = series[series.notna()].astype(str).str.len()
+        too_long = lengths.index[lengths > max_length]
+        for index in too_long:
+            errors.setdefault(
+                row_numbers[index],
+                f"第{row_numbers[index]}行处理失败: {name}超过最大长度{max_length}（{lengths[index]}个字符）"
+            )
+        failed[too_long] = True
+    return failed
+
+
+def bulk_create_rows(rows, errors):
+    """
+    写入一批 [(行号, 记录), ...]，返回写入成功的记录
+    数据库拒绝整批时（超长、约束冲突等）逐行重试，失败的行记录错误，不影响同批其他行
+    """
+    records = [record for _, record in rows]
+    try:
+        with transaction.atomic():
+            ShiftMaintenanceRecord.objects.bulk_create(records)
+        return records
+    except (DataError, IntegrityError) as e:
+        logger.warning(f"批量写入维修记录失败，改为逐行写入: {str(e)}")
+
+    saved = []
+    for row_number, record in rows:
+        try:
+            with transaction.atomic():
+                ShiftMaintenanceRecord.objects.bulk_create([record])
+            saved.append(record)
+        except (DataError, IntegrityError) as e:
+            errors[row_number] = f"第{row_number}行处理失败: {str(e)}"
+    return saved
+
+
+def to_python(value):
+    """pandas 标量转为可写入数据库的 Python 值"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def import_maintenance_records(df, default_phase_code='', default_shift_type_code=''):
+    """
+    从 DataFrame 导入维修记录
+    返回 (成功导入数量, 错误列表)
+    """
+    row_numbers = pd.Series(df.index + 2, index=df.index)
+    errors = {}
+
+    # 1. 查找表一次性读入
+    phases = dict(PlantPhase.objects.values_list('code', 'id'))
+    shift_types = dict(ShiftType.objects.values_list('code', 'id'))
+
+    # 2. 按列解析期数和班次（Excel 中有值时优先，否则使用页面上下文的默认值）
+    phase_codes = parse_codes(column(df, '期数'), default_phase_code, [(('一', '1'), 'phase_1'), (('二', '2'), 'phase_2')])
+    shift_codes = parse_codes(column(df, '班次类型'), default_shift_type_code, [(('长白班', '白班'), 'long_day_shift'), (('倒班',), 'rotating_shift')])
+
+    missing = (phase_codes == '') | (shift_codes == '')
+    for index in df.index[missing]:
+        errors[row_numbers[index]] = (
+            f"第{row_numbers[index]}行缺少期数或班次类型信息: "
+            f"phase='{phase_codes[index]}', shift_type='{shift_codes[index]}'"
+        )
+    unknown_phase = ~missing & ~phase_codes.isin(list(phases))
+    for index in df.index[unknown_phase]:
+        errors[row_numbers[index]] = f"第{row_numbers[index]}行期数代码不存在: {phase_codes[index]}"
+    unknown_shift = ~missing & ~unknown_phase & ~shift_codes.isin(list(shift_types))
+    for index in df.index[unknown_shift]:
+        errors[row_numbers[index]] = f"第{row_numbers[index]}行班次类型代码不存在: {shift_codes[index]}"
+
+    start_datetimes, start_failed = parse_datetimes(column(df, '开始日期及时间'), row_numbers, errors)
+    end_datetimes, end_failed = parse_datetimes(column(df, '结束日期及时间'), row_numbers, errors)
+
+    # 与模型 save() 一致：开始和结束时间都存在时由两者计算耗用时长，否则取表格中的数值
+    durations = pd.to_numeric(column(df, '耗用时长'), errors='coerce')
+    computed = (end_datetimes - start_datetimes).dt.total_seconds() / 3600
+    durations = computed.where(computed.notna(), durations)
+
+    values = {field: column(df, name) for name, field in TEXT_COLUMNS.items()}
+    values['change_reason'] = values['change_reason'].map(
+        lambda value: CHANGE_REASON_CODES.get(value, value)
+    )
+
+    too_long = check_lengths(values, row_numbers, errors)
+
+    valid = ~(missing | unknown_phase | unknown_shift | start_failed | end_failed | too_long)
+    month = str(timezone.now().month)
+
+    # 3. 按前缀预留序号（文件中的顺序即序号顺序）
+    prefixes = pd.Series([
+        ShiftMaintenanceRecord.serial_prefix(phase, shift)
+        for phase, shift in zip(phase_codes, shift_codes)
+    ], index=df.index)
+
+    rows = []
+    records = []
+    with transaction.atomic():
+        serials = pd.Series(index=df.index, dtype=object)
+        for prefix, indexes in prefixes[valid].groupby(prefixes[valid]).groups.items():
+            serials[indexes] = ShiftMaintenanceRecord.reserve_serial_numbers(prefix, len(indexes))
+
+        for index in df.index[valid]:
+            record = ShiftMaintenanceRecord(
+                phase_id=phases[phase_codes[index]],
+                shift_type_id=shift_types[shift_codes[index]],
+                serial_number=serials[index],
+                month=month,
+                start_datetime=to_python(start_datetimes[index]),
+                end_datetime=to_python(end_datetimes[index]),
+                duration=to_python(durations[index]),
+                **{field: to_python(series[index]) for field, series in values.items()}
+            )
+            rows.append((row_numbers[index], record))
+
+        # 4. 分批写入，bulk_create 不触发信号，日汇总需单独维护
+        batch_size = get_batch_size()
+        for start in range(0, len(rows), batch_size):
+            records += bulk_create_rows(rows[start:start + batch_size], errors)
+        maintenance_rollup.add_records(records)
+        search_index.index_objects(records)
+        # 事务提交后使维修统计缓存失效
+        invalidate_statistics()
+
+    error_list = [errors[row_number] for row_number in sorted(errors)]
+    logger.info(f"批量导入维修记录 {len(records)} 条，失败 {len(error_list)} 行")
+    return len(records), error_list
@@ -0,0 +1,167 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models_maintenance_new import ShiftMaintenanceRecord
+from .models_rollup import ShiftMaintenanceDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# 汇总维度对应的维修记录字段
+ROLLUP_FIELDS = ['created_at', 'phase_id', 'shift_type_id', 'production_line', 'process', 'change_reason', 'duration']
+
+
+def rollup_key(values):
+    """由维修记录字段值得到汇总键 (date, phase_id, shift_type_id, production_line, process, change_reason)"""
+    created_at = values['created_at']
+    return (
+        created_at.date() if isinstance(created_at, datetime) else created_at,
+        values['phase_id'],
+        values['shift_type_id'],
+        values['production_line'] or '',
+        values['process'] or '',
+        values['change_reason'] or '',
+    )
+
+
+def record_values(record):
+    """取出维修记录实例上与汇总相关的字段"""
+    return {field: getattr(record, field) for field in ROLLUP_FIELDS}
+
+
+def apply_delta(key, count, duration):
+    """
+    原子地把增量累加到汇总行，汇总行不存在时创建，记录数减到0时删除
+    """
+    day, phase_id, shift_type_id, production_line, process, change_reason = key
+    lookup = {
+        'date': day,
+        'phase_id': phase_id,
+        'shift_type_id': shift_type_id,
+        'production_line': production_line,
+        'process': process,
+        'change_reason': change_reason,
+    }
+    rows = ShiftMaintenanceDailyRollup.objects.filter(**lookup)
+    with transaction.atomic():
+        updated = rows.update(
+            record_count=F('record_count') + count,
+            total_duration=F('total_duration') + duration
+        )
+        if not updated and count > 0:
+            try:
+                with transaction.atomic():
+                    ShiftMaintenanceDailyRollup.objects.create(
+                        record_count=count, total_duration=duration, **lookup
+                    )
+            except IntegrityError:
+                rows.update(
+                    record_count=F('record_count') + count,
+                    total_duration=F('total_duration') + duration
+                )
+        if count < 0:
+            rows.filter(record_count__lte=0).delete()
+
+
+def add_records(records, sign=1):
+    """
+    批量维护汇总：供 bulk_create 等不触发信号的批量写入路径调用
+    先在内存中按汇总键合并，每个键只更新一次
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+    for record in records:
+        values = record if isinstance(record, dict) else record_values(record)
+        delta = deltas[rollup_key(values)]
+        delta[0] += sign
+        delta[1] += sign * (values['duration'] or 0)
+    for key, (count, duration) in deltas.items():
+        apply_delta(key, count, duration)
+
+
+def rebuild(start_date=None, end_date=None):
+    """
+    从维修记录重建汇总表（可限定日期范围），返回写入的汇总行数
+    """
+    records = ShiftMaintenanceRecord.objects.all()
+    rollups = ShiftMaintenanceDailyRollup.objects.all()
+    if start_date:
+        records = records.filter(created_at__gte=datetime.combine(start_date, time.min))
+        rollups = rollups.filter(date__gte=start_date)
+    if end_date:
+        records = records.filter(created_at__lt=datetime.combine(end_date + timedelta(days=1), time.min))
+        rollups = rollups.filter(date__lte=end_date)
+
+    rows = records.order_by().annotate(
+        day=TruncDate('created_at')
+    ).values(
+        'day', 'phase_id', 'shift_type_id', 'production_line', 'process', 'change_reason'
+    ).annotate(
+        record_count=Count('pk'),
+        total_duration=Coalesce(Sum('duration'), 0.0)
+    )
+
+    # 空值与空字符串归并到同一汇总行
+    merged = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        key = rollup_key({**row, 'created_at': row['day']})
+        merged[key][0] += row['record_count']
+        merged[key][1] += row['total_duration']
+
+    with transaction.atomic():
+        rollups.delete()
+        ShiftMaintenanceDailyRollup.objects.bulk_create([
+            ShiftMaintenanceDailyRollup(
+                date=key[0],
+                phase_id=key[1],
+                shift_type_id=key[2],
+                production_line=key[3],
+                process=key[4],
+                change_reason=key[5],
+                record_count=count,
+                total_duration=duration,
+            )
+            for key, (count, duration) in merged.items()
+        ], batch_size=1000)
+    return len(merged)
+
+
+@receiver(pre_save, sender=ShiftMaintenanceRecord)
+def remember_rollup_values(sender, instance, **kwargs):
+    """保存前记下数据库中的旧值，用于从旧汇总行中扣除"""
+    instance._rollup_previous = None
+    if not instance._state.adding:
+        instance._rollup_previous = sender.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=ShiftMaintenanceRecord)
+def update_rollup_on_save(sender, instance, created, **kwargs):
+    """维修记录保存后增量更新日汇总"""
+    try:
+        current = record_values(instance)
+        previous = getattr(instance, '_rollup_previous', None)
+        if previous:
+            if rollup_key(previous) == rollup_key(current):
+                duration_delta = (current['duration'] or 0) - (previous['duration'] or 0)
+                if duration_delta:
+                    apply_delta(rollup_key(current), 0, duration_delta)
+                return
+            apply_delta(rollup_key(previous), -1, -(previous['duration'] or 0))
+        apply_delta(rollup_key(current), 1, current['duration'] or 0)
+    except Exception as e:
+        # 汇总失败不影响维修记录本身，可通过 rebuild_maintenance_rollup 命令修复
+        logger.warning(f"无法更新维修日汇总: {str(e)}")
+
+
+@receiver(post_delete, sender=ShiftMaintenanceRecord)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """维修记录删除后从日汇总中扣除"""
+    try:
+        apply_delta(rollup_key(record_values(instance)), -1, -(instance.duration or 0))
+    except Exception as e:
+        logger.warning(f"无法更新维修日汇总: {str(e)}")
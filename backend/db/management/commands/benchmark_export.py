@@ -0,0 +1,106 @@
+import random
+import time
+from io import BytesIO
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook
+from openpyxl.styles import Border, Side
+
+from db.excel_export import EXPORT_FORMATS
+from db.excel_views import CHANGE_REASON_DISPLAY, RECORD_EXPORT_SPEC
+
+
+class Command(BaseCommand):
+    help = '在模拟维修记录上对比导出框架各格式与逐单元格 openpyxl 写法的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=str, default='10000,100000,1000000',
+            help='逗号分隔的行数列表 (默认: 10000,100000,1000000)'
+        )
+        parser.add_argument(
+            '--legacy-max', type=int, default=100000,
+            help='逐单元格写法只在不超过该行数时运行 (默认: 100000)'
+        )
+
+    def synthetic_rows(self, count):
+        """按 RECORD_EXPORT_SPEC.fields 的顺序生成原始行"""
+        rng = random.Random(count)
+        base = datetime(2024, 1, 1)
+        values = {
+            'phase__code': lambda: rng.choice(['phase_1', 'phase_2']),
+            'shift_type__code': lambda: rng.choice(['long_day_shift', 'rotating_shift']),
+            'month': lambda: f'{rng.randint(1, 12)}月',
+            'change_reason': lambda: rng.choice(['maintenance', 'repair', 'technical_modification', None]),
+        }
+        for i in range(count):
+            start = base + timedelta(minutes=rng.randrange(525600))
+            end = start + timedelta(minutes=rng.randrange(3000)) if i % 10 else None
+            row = []
+            for field in RECORD_EXPORT_SPEC.fields:
+                if field == 'start_datetime':
+                    row.append(start)
+                elif field == 'end_datetime':
+                    row.append(end)
+                elif field == 'serial_number':
+                    row.append(f'1CB-{i + 1:03d}')
+                elif field in values:
+                    row.append(values[field]())
+                else:
+                    row.append(f'{field}-{rng.randrange(1000)}' if i % 7 else None)
+            yield tuple(row)
+
+    def legacy_xlsx(self, count):
+        """原先的写法：内存工作簿，逐行 Python 格式化，每个单元格单独设置边框"""
+        wb = Workbook()
+        ws = wb.active
+        border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                        top=Side(style='thin'), bottom=Side(style='thin'))
+        fields = RECORD_EXPORT_SPEC.fields
+        for row_num, raw in enumerate(self.synthetic_rows(count), 2):
+            record = dict(zip(fields, raw))
+            start, end = record['start_datetime'], record['end_datetime']
+            values = []
+            for field in fields:
+                value = record[field]
+                if field == 'phase__code':
+                    value = '一期' if value == 'phase_1' else '二期'
+                elif field == 'shift_type__code':
+                    value = '长白班' if value == 'long_day_shift' else '倒班'
+                elif field == 'change_reason':
+                    value = CHANGE_REASON_DISPLAY.get(value, value)
+                elif field in ('start_datetime', 'end_datetime'):
+                    value = value.strftime('%Y-%m-%d %H:%M') if value else ''
+                values.append('' if value is None else value)
+            if start and end:
+                delta = end - start
+                hours, remainder = divmod(delta.seconds, 3600)
+                values.append(f"{delta.days}天{hours}小时{remainder // 60}分钟")
+            else:
+                values.append('')
+            for col_num, value in enumerate(values, 1):
+                cell = ws.cell(row=row_num, column=col_num, value=value)
+                cell.border = border
+        wb.save(BytesIO())
+
+    def timed(self, func):
+        started = time.perf_counter()
+        result = func()
+        return time.perf_counter() - started, result
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['rows'].split(',') if size.strip()]
+        for count in sizes:
+            self.stdout.write(f'--- {count} 行 ---')
+            for export_format, (writer, _) in EXPORT_FORMATS.items():
+                elapsed, output = self.timed(
+                    lambda: writer(RECORD_EXPORT_SPEC, RECORD_EXPORT_SPEC.frames_from_rows(self.synthetic_rows(count)))
+                )
+                output.seek(0, 2)
+                size = output.tell()
+                output.close()
+                self.stdout.write(f'{export_format:8s} {elapsed:8.2f} s  {size / 1024 / 1024:8.1f} MB')
+            if count <= options['legacy_max']:
+                elapsed, _ = self.timed(lambda: self.legacy_xlsx(count))
+                self.stdout.write(f'{"legacy":8s} {elapsed:8.2f} s  (openpyxl 逐单元格)')
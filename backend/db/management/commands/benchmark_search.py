@@ -0,0 +1,106 @@
+import operator
+import random
+import statistics
+import time
+from functools import reduce
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from db.models import PlantPhase, ShiftType
+from db.models_maintenance_new import ShiftMaintenanceRecord
+from db.search_index import SEARCH_INDEXES
+
+EQUIPMENT = ['注塑机', '卷绕机', '分切机', '涂布机', '包装机', '真空泵', '输送带', '冷却塔', '空压机', '叠片机']
+PARTS = ['主轴', '轴承', '电机', '气缸', '传感器', '皮带', '加热圈', '刀片', '导轨', '控制器']
+ACTIONS = ['更换', '维修', '调整', '清洁', '紧固', '校准', '润滑', '检查']
+STATES = ['异响', '漏油', '卡顿', '温度过高', '报警停机', '磨损严重', '松动', '精度偏差']
+
+
+class Command(BaseCommand):
+    help = '对比维修记录搜索的二元组索引与原 icontains 全表扫描的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--records', type=int, default=20000,
+            help='在回滚的事务中生成的模拟维修记录数，0 表示直接使用现有数据 (默认: 20000)'
+        )
+        parser.add_argument(
+            '--queries', type=str, default='主轴,轴承 异响,温度过高,EQ-01234,真空泵 漏油,卷绕机导轨报警停机',
+            help='逗号分隔的搜索内容，同一搜索内的多个关键词用空格分隔'
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='每个搜索重复次数，取中位数 (默认: 5)')
+
+    def seed(self, count):
+        """批量生成模拟维修记录并建立索引"""
+        rng = random.Random(count)
+        phase, _ = PlantPhase.objects.get_or_create(code='phase_1', defaults={'name': '一期'})
+        shift, _ = ShiftType.objects.get_or_create(code='rotating_shift', defaults={'name': '倒班'})
+        index = SEARCH_INDEXES['shift_maintenance_record']
+        for start in range(0, count, 1000):
+            records = [
+                ShiftMaintenanceRecord(
+                    phase=phase, shift_type=shift,
+                    equipment_name=rng.choice(EQUIPMENT),
+                    equipment_number=f'EQ-{rng.randrange(100000):05d}',
+                    before_change=self.description(rng, '需要'),
+                    after_change=self.description(rng, '已') + '，设备运行正常',
+                )
+                for _ in range(min(1000, count - start))
+            ]
+            ShiftMaintenanceRecord.objects.bulk_create(records)
+            index.index_objects(records)
+
+    def description(self, rng, verb):
+        """由 2~6 个短句组成的描述文本"""
+        return '，'.join(
+            f'{rng.choice(EQUIPMENT)}{rng.choice(PARTS)}{rng.choice(STATES)}，{verb}{rng.choice(ACTIONS)}{rng.choice(PARTS)}'
+            for _ in range(rng.randint(2, 6))
+        )
+
+    def search_condition(self, fields, terms):
+        """与 SearchFilter 相同的条件：每个关键词在任一字段中 icontains"""
+        return reduce(operator.and_, (
+            reduce(operator.or_, (Q(**{f'{field}__icontains': term}) for field in fields))
+            for term in terms
+        ))
+
+    def timed(self, build, repeat):
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            pks = set(build().values_list('pk', flat=True))
+            durations.append(time.perf_counter() - started)
+        return statistics.median(durations) * 1000, pks
+
+    def handle(self, *args, **options):
+        index = SEARCH_INDEXES['shift_maintenance_record']
+        fields = list(index.fields)
+        with transaction.atomic():
+            if options['records']:
+                self.stdout.write(f'生成 {options["records"]} 条模拟维修记录...')
+                self.seed(options['records'])
+            total = ShiftMaintenanceRecord.objects.count()
+            self.stdout.write(f'--- {total} 条维修记录，每个搜索重复 {options["repeat"]} 次 ---')
+            self.stdout.write(f'{"搜索":16s} {"icontains":>12s} {"bigram":>12s} {"结果数":>8s}')
+            for query in options['queries'].split(','):
+                terms = query.split()
+                if not terms:
+                    continue
+                condition = self.search_condition(fields, terms)
+                scan = ShiftMaintenanceRecord.objects.filter(condition)
+
+                def indexed():
+                    # 与 BigramSearchFilter 相同：每个关键词先用索引缩小候选集（含统计二元组频率的查询）
+                    queryset = ShiftMaintenanceRecord.objects.all()
+                    for term in terms:
+                        queryset = index.narrow(queryset, term)
+                    return queryset.filter(condition)
+
+                scan_ms, scan_pks = self.timed(lambda: scan, options['repeat'])
+                indexed_ms, indexed_pks = self.timed(indexed, options['repeat'])
+                note = '' if scan_pks == indexed_pks else '  结果不一致!'
+                self.stdout.write(f'{query:16s} {scan_ms:10.1f}ms {indexed_ms:10.1f}ms {len(scan_pks):8d}{note}')
+            # 模拟数据不保留
+            transaction.set_rollback(True)
@@ -0,0 +1,31 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from db import maintenance_rollup
+
+
+class Command(BaseCommand):
+    help = '从班次维修记录重建维修日汇总表'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='只重建最近多少天的汇总 (默认: 全部重建)'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        start_date = None
+        if days:
+            start_date = timezone.now().date() - timedelta(days=days - 1)
+            self.stdout.write(f'重建 {start_date} 起的维修日汇总...')
+        else:
+            self.stdout.write('重建全部维修日汇总...')
+
+        row_count = maintenance_rollup.rebuild(start_date=start_date)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'成功写入 {row_count} 条维修日汇总')
+        )
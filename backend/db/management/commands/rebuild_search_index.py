@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from db.search_index import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = '重建维修记录/故障案例的二元组搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            choices=list(SEARCH_INDEXES),
+            default=None,
+            help='只重建指定类型的索引 (默认: 全部重建)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批写入的索引词数量 (默认: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size 必须大于 0')
+        kinds = [options['kind']] if options['kind'] else list(SEARCH_INDEXES)
+        for kind in kinds:
+            self.stdout.write(f'重建 {kind} 搜索索引...')
+            count = SEARCH_INDEXES[kind].rebuild(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{kind}: 成功写入 {count} 条索引词'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from db.models import PlantPhase, ShiftType
+from db.models_maintenance_new import ShiftMaintenanceRecord, SerialNumberSequence
+
+
+class Command(BaseCommand):
+    help = '按已有维修记录重新设置各前缀的序号表'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            action='append',
+            default=None,
+            help='只重新设置指定前缀，如 1CB- (可重复，默认: 全部前缀)'
+        )
+
+    def handle(self, *args, **options):
+        prefixes = options['prefix']
+        if not prefixes:
+            # 所有期数与班次组合的前缀，加上序号表中已有的前缀
+            prefixes = {
+                ShiftMaintenanceRecord.serial_prefix(phase_code, shift_code)
+                for phase_code in PlantPhase.objects.values_list('code', flat=True)
+                for shift_code in ShiftType.objects.values_list('code', flat=True)
+            }
+            prefixes.update(SerialNumberSequence.objects.values_list('prefix', flat=True))
+
+        for prefix in sorted(prefixes):
+            last_number = SerialNumberSequence.reseed(prefix)
+            self.stdout.write(f'{prefix} -> {last_number:06d}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'成功重新设置 {len(prefixes)} 个序号前缀')
+        )
@@ -0,0 +1,60 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from db.import_jobs import ImportWorker
+from db.models_import_job import ImportJob
+
+
+class Command(BaseCommand):
+    help = '启动后台导入进程池，循环处理等待中的 Excel 导入任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=None,
+            help='并行处理分块的进程数，0 表示在当前进程内顺序处理 (默认: IMPORT_WORKER_PROCESSES)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='每个分块的行数 (默认: IMPORT_JOB_CHUNK_SIZE)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='处理完当前所有等待中的任务后退出'
+        )
+        parser.add_argument(
+            '--fail-running',
+            action='store_true',
+            help='启动时把处理中的任务标记为失败（上次 worker 异常退出，已导入的分块不会回滚，需重新上传剩余数据）'
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = getattr(settings, 'IMPORT_WORKER_POLL_INTERVAL', 2.0)
+
+        if options['fail_running']:
+            count = ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING).update(
+                status=ImportJob.STATUS_FAILED, message='处理进程异常退出', finished_at=timezone.now()
+            )
+            self.stdout.write(f'标记 {count} 个中断的任务为失败')
+
+        with ImportWorker(options['processes'], options['chunk_size']) as worker:
+            self.stdout.write(f'导入 worker {worker.name} 已启动，进程数: {worker.processes}')
+            try:
+                while True:
+                    job = worker.run_next()
+                    if job is not None:
+                        self.stdout.write(
+                            f'任务 {job.uuid} {job.get_status_display()}: '
+                            f'成功 {job.imported_count} 条，错误 {job.error_count} 条'
+                        )
+                        continue
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+            except KeyboardInterrupt:
+                self.stdout.write('导入 worker 已停止')
@@ -2,6 +2,7 @@ from django.utils import timezone
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
 from django.dispatch import receiver
 from .models_activity import UserActivity
+from .activity_buffer import buffer_activity, buffer_visit
 from django.contrib.sessions.models import Session
 import json
 
@@ -30,52 +31,25 @@ class ActivityTrackingMiddleware:
                     # 生成更有意义的描述
                     description = self.generate_activity_description(activity_type, request)
                     
-                    # 尝试记录活动，但如果表不存在则忽略错误
-                    UserActivity.objects.create(
-                        user=request.user,
+                    # 放入缓冲区，由后台线程批量写入（同时累加今天的访问趋势）
+                    buffer_activity(UserActivity(
+                        user_id=request.user.pk,
                         activity_type=activity_type,
                         description=description,
                         ip_address=ip_address,
                         user_agent=user_agent
-                    )
-                    
-                    # 同时更新今天的访问趋势数据
-                    from django.utils import timezone
-                    from .models_activity import WeeklyVisitTrend
-                    today = timezone.now().date()
-                    
-                    # 获取或创建今天的访问趋势记录
-                    trend_record, created = WeeklyVisitTrend.objects.get_or_create(
-                        date=today,
-                        defaults={'visit_count': 0, 'unique_visitors': 0}
-                    )
-                    
-                    # 增加访问计数
-                    trend_record.visit_count += 1
-                    trend_record.save(update_fields=['visit_count'])
+                    ))
                     
                 except Exception as e:
-                    # 如果表不存在或其他错误，记录到日志但不影响正常流程
+                    # 记录到日志但不影响正常流程
                     import logging
                     logger = logging.getLogger(__name__)
                     logger.warning(f"无法记录用户活动: {str(e)}")
         
         # 对于未认证用户，也记录访问趋势
         else:
-            from django.utils import timezone
-            from .models_activity import WeeklyVisitTrend
-            today = timezone.now().date()
-            
-            # 获取或创建今天的访问趋势记录
             try:
-                trend_record, created = WeeklyVisitTrend.objects.get_or_create(
-                    date=today,
-                    defaults={'visit_count': 0, 'unique_visitors': 0}
-                )
-                
-                # 增加访问计数
-                trend_record.visit_count += 1
-                trend_record.save(update_fields=['visit_count'])
+                buffer_visit(f"ip:{self.get_client_ip(request)}")
             except Exception as e:
                 import logging
                 logger = logging.getLogger(__name__)
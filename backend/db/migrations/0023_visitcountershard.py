@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0022_maintenancemanual_phase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='分片编号')),
+                ('visit_count', models.BigIntegerField(default=0, verbose_name='访问次数')),
+                ('sketch', models.BinaryField(blank=True, null=True, verbose_name='访客草图')),
+            ],
+            options={
+                'verbose_name': '访问计数分片',
+                'verbose_name_plural': '访问计数分片',
+                'unique_together': {('date', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    """用现有维修记录填充日汇总表"""
+    ShiftMaintenanceRecord = apps.get_model('db', 'ShiftMaintenanceRecord')
+    ShiftMaintenanceDailyRollup = apps.get_model('db', 'ShiftMaintenanceDailyRollup')
+
+    rows = ShiftMaintenanceRecord.objects.order_by().annotate(
+        day=TruncDate('created_at')
+    ).values(
+        'day', 'phase_id', 'shift_type_id', 'production_line', 'process', 'change_reason'
+    ).annotate(
+        record_count=Count('pk'),
+        total_duration=Coalesce(Sum('duration'), 0.0)
+    )
+
+    merged = {}
+    for row in rows:
+        key = (row['day'], row['phase_id'], row['shift_type_id'],
+               row['production_line'] or '', row['process'] or '', row['change_reason'] or '')
+        count, duration = merged.get(key, (0, 0.0))
+        merged[key] = (count + row['record_count'], duration + row['total_duration'])
+
+    ShiftMaintenanceDailyRollup.objects.bulk_create([
+        ShiftMaintenanceDailyRollup(
+            date=key[0], phase_id=key[1], shift_type_id=key[2],
+            production_line=key[3], process=key[4], change_reason=key[5],
+            record_count=count, total_duration=duration,
+        )
+        for key, (count, duration) in merged.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0023_visitcountershard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftMaintenanceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('production_line', models.CharField(blank=True, default='', max_length=50, verbose_name='产线')),
+                ('process', models.CharField(blank=True, default='', max_length=50, verbose_name='工序')),
+                ('change_reason', models.CharField(blank=True, default='', max_length=50, verbose_name='变更原因')),
+                ('record_count', models.IntegerField(default=0, verbose_name='维修记录数')),
+                ('total_duration', models.FloatField(default=0, verbose_name='总耗时(小时)')),
+                ('phase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='db.plantphase', verbose_name='工厂分期')),
+                ('shift_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='db.shifttype', verbose_name='班次类型')),
+            ],
+            options={
+                'verbose_name': '班次维修日汇总',
+                'verbose_name_plural': '班次维修日汇总',
+                'ordering': ['date'],
+                'unique_together': {('date', 'phase', 'shift_type', 'production_line', 'process', 'change_reason')},
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
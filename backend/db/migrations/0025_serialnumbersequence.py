@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0024_shiftmaintenancedailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerialNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, unique=True, verbose_name='序号前缀')),
+                ('last_number', models.BigIntegerField(default=0, verbose_name='已分配的最大序号')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': '维修记录序号',
+                'verbose_name_plural': '维修记录序号',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:28
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0025_serialnumbersequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(max_length=50, verbose_name='导入类型')),
+                ('status', models.CharField(choices=[('pending', '等待处理'), ('running', '处理中'), ('completed', '已完成'), ('failed', '失败')], db_index=True, default='pending', max_length=20, verbose_name='状态')),
+                ('file', models.FileField(upload_to='import_jobs/', verbose_name='导入文件')),
+                ('filename', models.CharField(blank=True, default='', max_length=255, verbose_name='原始文件名')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='导入参数')),
+                ('total_rows', models.IntegerField(default=0, verbose_name='总行数')),
+                ('processed_rows', models.IntegerField(default=0, verbose_name='已处理行数')),
+                ('imported_count', models.IntegerField(default=0, verbose_name='成功导入数')),
+                ('error_count', models.IntegerField(default=0, verbose_name='错误数')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='错误信息')),
+                ('message', models.TextField(blank=True, default='', verbose_name='结果说明')),
+                ('worker', models.CharField(blank=True, default='', max_length=100, verbose_name='处理进程')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='创建人')),
+            ],
+            options={
+                'verbose_name': '导入任务',
+                'verbose_name_plural': '导入任务',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0026_importjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shiftmaintenancerecord',
+            index=models.Index(fields=['phase', 'shift_type', 'created_at'], name='smr_phase_shift_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftmaintenancerecord',
+            index=models.Index(fields=['created_at'], name='smr_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftmaintenancerecord',
+            index=models.Index(fields=['start_datetime'], name='smr_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftmaintenancerecord',
+            index=models.Index(fields=['end_datetime'], name='smr_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftmaintenancerecord',
+            index=models.Index(fields=['production_line', 'created_at'], name='smr_line_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftmaintenancerecord',
+            index=models.Index(fields=['process', 'created_at'], name='smr_process_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskplan',
+            index=models.Index(fields=['date', 'status'], name='taskplan_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskplan',
+            index=models.Index(fields=['status', 'date'], name='taskplan_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['timestamp', 'user'], name='activity_timestamp_user_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:41
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+
+# 与 db.search_index 中的索引定义一致
+INDEXED_FIELDS = {
+    ('shift_maintenance_record', 'ShiftMaintenanceRecord'): ['equipment_name', 'equipment_number', 'before_change', 'after_change'],
+    ('maintenance_case', 'MaintenanceCase'): ['equipment_name', 'fault_reason', 'fault_phenomenon', 'fault_handling_method'],
+}
+
+
+def bigrams(text):
+    grams = Counter()
+    if not text:
+        return grams
+    for run in re.split(r'\s+', str(text).lower()):
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def backfill_search_terms(apps, schema_editor):
+    """为现有维修记录和故障案例建立二元组索引"""
+    SearchTerm = apps.get_model('db', 'SearchTerm')
+    for (kind, model_name), fields in INDEXED_FIELDS.items():
+        model = apps.get_model('db', model_name)
+        batch = []
+        for row in model.objects.order_by().values('pk', *fields).iterator(chunk_size=1000):
+            for field in fields:
+                batch.extend(
+                    SearchTerm(kind=kind, object_id=row['pk'], field=field, term=term, count=count)
+                    for term, count in bigrams(row[field]).items()
+                )
+            if len(batch) >= 1000:
+                SearchTerm.objects.bulk_create(batch, batch_size=1000)
+                batch = []
+        SearchTerm.objects.bulk_create(batch, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0027_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30, verbose_name='索引类型')),
+                ('object_id', models.UUIDField(verbose_name='对象ID')),
+                ('field', models.CharField(max_length=50, verbose_name='字段')),
+                ('term', models.CharField(max_length=2, verbose_name='二元组')),
+                ('count', models.IntegerField(default=1, verbose_name='出现次数')),
+            ],
+            options={
+                'verbose_name': '搜索索引',
+                'verbose_name_plural': '搜索索引',
+                'db_table': 'search_term',
+                'indexes': [models.Index(fields=['kind', 'term', 'object_id'], name='search_term_lookup_idx'), models.Index(fields=['kind', 'object_id'], name='search_term_object_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
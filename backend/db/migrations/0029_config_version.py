@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    ConfigVersion = apps.get_model('db', 'ConfigVersion')
+    ConfigVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0028_search_term'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=1, verbose_name='版本号')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '配置版本',
+                'verbose_name_plural': '配置版本',
+                'db_table': 'config_version',
+            },
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -9,7 +9,7 @@ import uuid
 from rest_framework.authtoken.models import Token
 
 # 导入活动模型
-from .models_activity import UserActivity, WeeklyVisitTrend
+from .models_activity import UserActivity, WeeklyVisitTrend, VisitCounterShard
 from django.template.loader import render_to_string
 import os
 from dotenv import load_dotenv
@@ -115,6 +115,40 @@ class ShiftType(models.Model):
     def __str__(self):
         return self.name
 
+
+class ConfigVersion(models.Model):
+    """
+    配置表（期数、产线、工序、班次）的版本号，只有一行
+    任何配置写入后递增，各进程据此判断本地缓存的配置是否过期
+    """
+    version = models.BigIntegerField(default=1, verbose_name="版本号")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "配置版本"
+        verbose_name_plural = "配置版本"
+        db_table = 'config_version'
+
+    def __str__(self):
+        return f"v{self.version} ({self.updated_at})"
+
+
+class StatisticsVersion(models.Model):
+    """
+    维修统计缓存的版本号，只有一行
+    维修记录写入的事务提交后递增，所有进程的统计缓存键随之变化
+    """
+    version = models.BigIntegerField(default=1, verbose_name="版本号")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "统计版本"
+        verbose_name_plural = "统计版本"
+        db_table = 'statistics_version'
+
+    def __str__(self):
+        return f"v{self.version} ({self.updated_at})"
+
 class BasicInfo(models.Model):
     uuid = models.UUIDField(primary_key = True,default = uuid.uuid4,editable = False)
     created_at = models.DateTimeField(default = timezone.now)
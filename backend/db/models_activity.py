@@ -34,6 +34,10 @@ class UserActivity(models.Model):
         verbose_name = '用户活动'
         verbose_name_plural = '用户活动'
         ordering = ['-timestamp']
+        # 活跃用户/今日访问量按时间范围统计，包含 user 列后统计去重用户时不需要回表
+        indexes = [
+            models.Index(fields=['timestamp', 'user'], name='activity_timestamp_user_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_activity_type_display()} - {self.timestamp}"
@@ -56,4 +60,23 @@ class WeeklyVisitTrend(models.Model):
         unique_together = [['date']]
     
     def __str__(self):
-        return f"{self.date} - {self.visit_count} 访问"
\ No newline at end of file
+        return f"{self.date} - {self.visit_count} 访问"
+
+class VisitCounterShard(models.Model):
+    """
+    访问计数分片模型
+    每个工作进程写入自己的分片行，读取时按日期合并，避免所有请求争用同一行
+    sketch 字段保存当日访客的 HyperLogLog 草图，用于估算独立访客数
+    """
+    date = models.DateField(verbose_name='日期')
+    shard = models.PositiveSmallIntegerField(verbose_name='分片编号')
+    visit_count = models.BigIntegerField(default=0, verbose_name='访问次数')
+    sketch = models.BinaryField(blank=True, null=True, verbose_name='访客草图')
+    
+    class Meta:
+        verbose_name = '访问计数分片'
+        verbose_name_plural = '访问计数分片'
+        unique_together = [['date', 'shard']]
+    
+    def __str__(self):
+        return f"{self.date} #{self.shard} - {self.visit_count} 访问"
@@ -0,0 +1,118 @@
+from django.db import models, transaction
+from django.db.models import F
+from django.contrib.auth.models import User
+from django.utils import timezone
+from db.models import BasicInfo
+
+
+class ImportJob(BasicInfo):
+    """
+    Excel 后台导入任务
+    上传接口只保存文件并创建任务，由 run_import_worker 命令启动的进程池认领并分块处理
+    进度（已处理行数、成功数、错误）在每个分块完成后原子地累加
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '等待处理'),
+        (STATUS_RUNNING, '处理中'),
+        (STATUS_COMPLETED, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+
+    # 保存的错误条数上限，超出部分只计数
+    MAX_STORED_ERRORS = 1000
+
+    kind = models.CharField(max_length=50, verbose_name="导入类型")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True, verbose_name="状态")
+    file = models.FileField(upload_to='import_jobs/', verbose_name="导入文件")
+    filename = models.CharField(max_length=255, blank=True, default='', verbose_name="原始文件名")
+    params = models.JSONField(default=dict, blank=True, verbose_name="导入参数")
+    total_rows = models.IntegerField(default=0, verbose_name="总行数")
+    processed_rows = models.IntegerField(default=0, verbose_name="已处理行数")
+    imported_count = models.IntegerField(default=0, verbose_name="成功导入数")
+    error_count = models.IntegerField(default=0, verbose_name="错误数")
+    errors = models.JSONField(default=list, blank=True, verbose_name="错误信息")
+    message = models.TextField(blank=True, default='', verbose_name="结果说明")
+    worker = models.CharField(max_length=100, blank=True, default='', verbose_name="处理进程")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="创建人")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
+
+    class Meta:
+        verbose_name = "导入任务"
+        verbose_name_plural = "导入任务"
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.kind} {self.filename} - {self.get_status_display()}"
+
+    @property
+    def progress(self):
+        """完成百分比"""
+        if self.status == self.STATUS_COMPLETED:
+            return 100.0
+        if not self.total_rows:
+            return 0.0
+        return round(min(self.processed_rows, self.total_rows) * 100.0 / self.total_rows, 1)
+
+    def to_dict(self):
+        return {
+            'job_id': str(self.uuid),
+            'kind': self.kind,
+            'status': self.status,
+            'filename': self.filename,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'imported_count': self.imported_count,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'progress': self.progress,
+            'message': self.message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    @classmethod
+    def claim_next(cls, worker=''):
+        """
+        认领最早的等待任务并标记为处理中，没有任务时返回 None
+        skip_locked 保证多个 worker 同时认领时不会拿到同一个任务
+        """
+        with transaction.atomic():
+            job = cls.objects.select_for_update(skip_locked=True).filter(
+                status=cls.STATUS_PENDING
+            ).order_by('created_at').first()
+            if job is None:
+                return None
+            job.status = cls.STATUS_RUNNING
+            job.worker = worker
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'worker', 'started_at', 'updated_at'])
+        return job
+
+    @classmethod
+    def add_progress(cls, job_id, rows, imported, errors):
+        """分块完成后累加进度，错误列表在行锁内追加"""
+        with transaction.atomic():
+            cls.objects.filter(pk=job_id).update(
+                processed_rows=F('processed_rows') + rows,
+                imported_count=F('imported_count') + imported,
+                error_count=F('error_count') + len(errors),
+                updated_at=timezone.now(),
+            )
+            if errors:
+                job = cls.objects.select_for_update().only('errors').get(pk=job_id)
+                room = cls.MAX_STORED_ERRORS - len(job.errors)
+                if room > 0:
+                    job.errors = job.errors + list(errors[:room])
+                    job.save(update_fields=['errors'])
+
+    def finish(self, status, message=''):
+        self.status = status
+        self.message = message
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'message', 'finished_at', 'updated_at'])
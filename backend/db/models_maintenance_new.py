@@ -1,5 +1,5 @@
 import re
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from db.models import BasicInfo, Asset, PlantPhase, ShiftType
 from django.dispatch import receiver
@@ -58,6 +58,15 @@ class ShiftMaintenanceRecord(BasicInfo):
         verbose_name = "班次维修记录"
         verbose_name_plural = "班次维修记录"
         ordering = ['-created_at']
+        # 列表与导出的常用筛选：期数+班次按创建时间排序、创建时间范围、月份（开始/结束时间范围）、产线、工序
+        indexes = [
+            models.Index(fields=['phase', 'shift_type', 'created_at'], name='smr_phase_shift_created_idx'),
+            models.Index(fields=['created_at'], name='smr_created_idx'),
+            models.Index(fields=['start_datetime'], name='smr_start_idx'),
+            models.Index(fields=['end_datetime'], name='smr_end_idx'),
+            models.Index(fields=['production_line', 'created_at'], name='smr_line_created_idx'),
+            models.Index(fields=['process', 'created_at'], name='smr_process_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # 如果序号为空，则自动生成唯一序号
@@ -76,48 +85,92 @@ class ShiftMaintenanceRecord(BasicInfo):
         
         super().save(*args, **kwargs)
 
+    # 班次代码在序号中的简写
+    SHIFT_SERIAL_CODES = {
+        'long_day_shift': 'CB',  # 长白班
+        'rotating_shift': 'DB',  # 倒班
+    }
+
+    @classmethod
+    def serial_prefix(cls, phase_code, shift_type_code):
+        """序号前缀，格式为：1CB-"""
+        return f"{phase_code.replace('phase_', '')}{cls.SHIFT_SERIAL_CODES.get(shift_type_code, 'XX')}-"
+
+    @classmethod
+    def last_serial_number(cls, prefix):
+        """当前前缀下最大的序号数字，没有记录时为0"""
+        last_record = cls.objects.filter(
+            serial_number__startswith=prefix
+        ).order_by('-serial_number').values_list('serial_number', flat=True).first()
+        if last_record:
+            last_number = re.search(r'-([0-9]+)$', last_record)
+            if last_number:
+                return int(last_number.group(1))
+        return 0
+
+    @classmethod
+    def reserve_serial_numbers(cls, prefix, count):
+        """
+        为批量导入一次预留同一前缀下的 count 个序号（通常连续）
+        跳过已被手工录入的记录占用的序号，占用了几个就再预留几个，直到凑足
+        """
+        serial_numbers = []
+        while len(serial_numbers) < count:
+            needed = count - len(serial_numbers)
+            start = SerialNumberSequence.reserve(prefix, needed)
+            reserved = [f"{prefix}{number:06d}" for number in range(start, start + needed)]
+            taken = set(cls.objects.filter(serial_number__in=reserved).values_list('serial_number', flat=True))
+            serial_numbers.extend(number for number in reserved if number not in taken)
+        return serial_numbers
+
     def generate_unique_serial_number(self):
         """生成唯一的序号，格式如：1CB-000001、1DB-000001"""
-        # 获取代码前缀用于简写
-        phase_code = self.phase.code.replace('phase_', '')  # 得到 '1' 或 '2'
-        shift_code = ''
-        if self.shift_type.code == 'long_day_shift':
-            shift_code = 'CB'  # 长白班
-        elif self.shift_type.code == 'rotating_shift':
-            shift_code = 'DB'  # 倒班
-        else:
-            shift_code = 'XX'  # 默认
-        
         # 构建序号前缀，格式为：1CB-
-        prefix = f"{phase_code}{shift_code}-"
-        
-        # 查找当前前缀下最大的序号
-        existing_records = ShiftMaintenanceRecord.objects.filter(
-            serial_number__startswith=prefix
-        ).order_by('-serial_number')
-        
-        if existing_records.exists():
-            # 找到最大序号并递增
-            last_record = existing_records.first()
-            last_number = re.search(r'-([0-9]+)$', last_record.serial_number)
-            if last_number:
-                new_number = int(last_number.group(1)) + 1
-            else:
-                new_number = 1
-        else:
-            new_number = 1
+        prefix = self.serial_prefix(self.phase.code, self.shift_type.code)
         
-        # 格式化序号，保持6位数字
-        serial_number = f"{prefix}{new_number:06d}"
-        
-        # 确保序号唯一性（以防并发情况）
-        counter = 0
-        original_serial = serial_number
-        while ShiftMaintenanceRecord.objects.filter(serial_number=serial_number).exists():
-            counter += 1
-            serial_number = f"{original_serial[:-6]}{(new_number + counter):06d}"
-        
-        return serial_number
+        # 从序号表原子地取下一个号码（跳过手工录入占用的序号）
+        return self.reserve_serial_numbers(prefix, 1)[0]
 
     def __str__(self):
-        return f"{self.phase} {self.shift_type} - {self.equipment_name}"
\ No newline at end of file
+        return f"{self.phase} {self.shift_type} - {self.equipment_name}"
+
+class SerialNumberSequence(models.Model):
+    """
+    维修记录序号表，每个前缀（1CB-、2DB- 等）一行
+    分配序号时锁定该行并累加，替代按序号排序查找最大值的方式，并发保存时不会重复
+    """
+    prefix = models.CharField(max_length=10, unique=True, verbose_name="序号前缀")
+    last_number = models.BigIntegerField(default=0, verbose_name="已分配的最大序号")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "维修记录序号"
+        verbose_name_plural = "维修记录序号"
+
+    def __str__(self):
+        return f"{self.prefix}{self.last_number:06d}"
+
+    @classmethod
+    def reserve(cls, prefix, count=1):
+        """
+        原子地预留 count 个连续序号，返回第一个序号数字
+        前缀第一次使用时按已有维修记录的最大序号初始化
+        """
+        with transaction.atomic():
+            sequence = cls.objects.select_for_update().filter(prefix=prefix).first()
+            if sequence is None:
+                sequence, _ = cls.objects.select_for_update().get_or_create(
+                    prefix=prefix,
+                    defaults={'last_number': ShiftMaintenanceRecord.last_serial_number(prefix)}
+                )
+            start = sequence.last_number + 1
+            sequence.last_number += count
+            sequence.save(update_fields=['last_number', 'updated_at'])
+        return start
+
+    @classmethod
+    def reseed(cls, prefix):
+        """按已有维修记录重新设置前缀的序号，返回新的最大序号"""
+        last_number = ShiftMaintenanceRecord.last_serial_number(prefix)
+        cls.objects.update_or_create(prefix=prefix, defaults={'last_number': last_number})
+        return last_number
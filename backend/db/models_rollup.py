@@ -0,0 +1,28 @@
+from django.db import models
+from db.models import PlantPhase, ShiftType
+
+
+class ShiftMaintenanceDailyRollup(models.Model):
+    """
+    班次维修记录日汇总模型
+    按 (日期, 期别, 班次, 产线, 工序, 变更原因) 汇总维修记录数量和总耗时
+    由 ShiftMaintenanceRecord 的保存/删除信号增量维护，可用 rebuild_maintenance_rollup 命令重建
+    产线、工序和变更原因为空时保存为空字符串，保证唯一约束生效
+    """
+    date = models.DateField(verbose_name="日期")
+    phase = models.ForeignKey(PlantPhase, on_delete=models.CASCADE, verbose_name="工厂分期")
+    shift_type = models.ForeignKey(ShiftType, on_delete=models.CASCADE, verbose_name="班次类型")
+    production_line = models.CharField(max_length=50, blank=True, default='', verbose_name="产线")
+    process = models.CharField(max_length=50, blank=True, default='', verbose_name="工序")
+    change_reason = models.CharField(max_length=50, blank=True, default='', verbose_name="变更原因")
+    record_count = models.IntegerField(default=0, verbose_name="维修记录数")
+    total_duration = models.FloatField(default=0, verbose_name="总耗时(小时)")
+
+    class Meta:
+        verbose_name = "班次维修日汇总"
+        verbose_name_plural = "班次维修日汇总"
+        unique_together = [['date', 'phase', 'shift_type', 'production_line', 'process', 'change_reason']]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} {self.production_line} {self.process} - {self.record_count}"
@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class SearchTerm(models.Model):
+    """
+    维修记录/故障案例的字符二元组（bigram）倒排索引
+    每行表示某个对象的某个字段中出现了某个二元组 count 次，中文按相邻两个字符切分，不依赖分词
+    由保存/删除信号增量维护，可用 rebuild_search_index 命令重建
+    """
+    kind = models.CharField(max_length=30, verbose_name="索引类型")
+    object_id = models.UUIDField(verbose_name="对象ID")
+    field = models.CharField(max_length=50, verbose_name="字段")
+    term = models.CharField(max_length=2, verbose_name="二元组")
+    count = models.IntegerField(default=1, verbose_name="出现次数")
+
+    class Meta:
+        verbose_name = "搜索索引"
+        verbose_name_plural = "搜索索引"
+        db_table = 'search_term'
+        indexes = [
+            # 按二元组查找候选对象
+            models.Index(fields=['kind', 'term', 'object_id'], name='search_term_lookup_idx'),
+            # 按对象重建/删除索引、计算排序得分
+            models.Index(fields=['kind', 'object_id'], name='search_term_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} {self.field}: {self.term} x{self.count}"
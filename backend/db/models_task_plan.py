@@ -32,10 +32,16 @@ class TaskPlan(BasicInfo):
         verbose_name = "任务计划"
         verbose_name_plural = "任务计划"
         ordering = ['-created_at']
+        # 今日任务按日期（+状态）统计，逾期任务按状态+日期范围统计
+        indexes = [
+            models.Index(fields=['date', 'status'], name='taskplan_date_status_idx'),
+            models.Index(fields=['status', 'date'], name='taskplan_status_date_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        # 更新计划人数为分配用户的数量
-        self.planned_people_count = self.assigned_users.count()
+        # 更新计划人数为分配用户的数量（新建时还没有分配用户，不需要查询）
+        if not self._state.adding:
+            self.planned_people_count = self.assigned_users.count()
         super().save(*args, **kwargs)
 
     def __str__(self):
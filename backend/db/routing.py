@@ -0,0 +1,7 @@
+from django.urls import re_path
+
+from .consumers import ImportJobConsumer
+
+websocket_urlpatterns = [
+    re_path(r"ws/import-jobs/(?P<job_id>[0-9a-f-]+)/$", ImportJobConsumer.as_asgi()),
+]
@@ -0,0 +1,224 @@
+"""
+维修记录与故障案例的二元组（bigram）全文索引
+
+1. 文本转小写后按空白切分，每段取相邻两个字符作为索引词（中文无需分词）
+2. SearchTerm 表保存 (类型, 对象, 字段, 二元组, 次数)，保存/删除信号增量维护，批量写入路径调用 index_objects
+3. 搜索时按每个关键词中最少见的三个二元组从索引得到候选对象，
+   再在候选集上执行原来的 icontains 条件，结果与原搜索一致，但不需要扫描全表；
+   最少见的二元组也超过 SEARCH_INDEX_MAX_CANDIDATES 个对象时不使用索引
+4. 得分为命中二元组的次数按字段权重加权求和，未指定 ordering 参数时按得分排序
+不足两个字符的关键词无法使用索引，退回原 icontains 搜索
+"""
+import logging
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .models_maintenance import MaintenanceCase
+from .models_maintenance_new import ShiftMaintenanceRecord
+from .models_search import SearchTerm
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r'\s+')
+
+
+# 每个关键词最多统计多少个二元组的频率
+MAX_PROBED_GRAMS = 8
+
+
+def get_max_candidates():
+    return getattr(settings, 'SEARCH_INDEX_MAX_CANDIDATES', 5000)
+
+
+def bigrams(text):
+    """返回文本的二元组计数"""
+    grams = Counter()
+    if not text:
+        return grams
+    for run in WHITESPACE.split(str(text).lower()):
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+class SearchIndex:
+    """
+    一个模型的索引定义
+    fields: 字段 -> 排序权重
+    """
+
+    def __init__(self, kind, model, fields):
+        self.kind = kind
+        self.model = model
+        self.fields = fields
+
+    def terms(self, pk, values):
+        """values 为 字段 -> 文本，返回该对象的 SearchTerm 列表"""
+        return [
+            SearchTerm(kind=self.kind, object_id=pk, field=field, term=term, count=count)
+            for field in self.fields
+            for term, count in bigrams(values.get(field)).items()
+        ]
+
+    def index_objects(self, objects, batch_size=1000):
+        """重建一批对象的索引：先删除旧索引词，再批量写入"""
+        objects = list(objects)
+        if not objects:
+            return 0
+        rows = []
+        for obj in objects:
+            rows.extend(self.terms(obj.pk, {field: getattr(obj, field) for field in self.fields}))
+        with transaction.atomic():
+            SearchTerm.objects.filter(kind=self.kind, object_id__in=[obj.pk for obj in objects]).delete()
+            SearchTerm.objects.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
+
+    def remove(self, pk):
+        SearchTerm.objects.filter(kind=self.kind, object_id=pk).delete()
+
+    def rebuild(self, batch_size=1000):
+        """从模型数据重建全部索引，返回写入的索引词数量"""
+        total = 0
+        with transaction.atomic():
+            SearchTerm.objects.filter(kind=self.kind).delete()
+            batch = []
+            for row in self.model.objects.order_by().values('pk', *self.fields).iterator(chunk_size=batch_size):
+                batch.extend(self.terms(row['pk'], row))
+                if len(batch) >= batch_size:
+                    SearchTerm.objects.bulk_create(batch, batch_size=batch_size)
+                    total += len(batch)
+                    batch = []
+            SearchTerm.objects.bulk_create(batch, batch_size=batch_size)
+            total += len(batch)
+        return total
+
+    def object_ids(self, gram):
+        return SearchTerm.objects.filter(kind=self.kind, term=gram).order_by().values_list('object_id', flat=True)
+
+    def narrow(self, queryset, term):
+        """
+        用索引缩小候选集：取出现次数最少的三个二元组，候选对象必须同时包含它们
+        候选 id 在 Python 中求交集后按主键查询，避免数据库对维修记录表逐行判断 IN 子查询
+        任一二元组不存在时没有结果；最少的二元组也超过上限时不使用索引（顺序扫描更快）
+        """
+        grams = list(bigrams(term))
+        if not grams:
+            return queryset
+        # 关键词很长时只抽取部分二元组估计频率
+        grams = grams[::max(len(grams) // MAX_PROBED_GRAMS, 1)][:MAX_PROBED_GRAMS]
+        limit = get_max_candidates()
+        # 只计数到上限，常见二元组不会读完整个索引范围
+        frequencies = {gram: self.object_ids(gram)[:limit + 1].count() for gram in grams}
+        selective = sorted(grams, key=frequencies.get)[:3]
+        if frequencies[selective[0]] > limit:
+            return queryset
+        ids = set(self.object_ids(selective[0]))
+        for gram in selective[1:]:
+            if not ids or frequencies[gram] > limit:
+                break
+            ids &= set(self.object_ids(gram))
+        return queryset.filter(pk__in=list(ids))
+
+    def rank(self, grams):
+        """得分表达式：命中二元组的次数按字段权重加权求和"""
+        weight = Case(
+            *[When(field=field, then=Value(weight)) for field, weight in self.fields.items()],
+            default=Value(1), output_field=IntegerField()
+        )
+        scores = SearchTerm.objects.filter(
+            kind=self.kind, object_id=OuterRef('pk'), term__in=grams
+        ).order_by().values('object_id').annotate(score=Sum(F('count') * weight)).values('score')
+        return Coalesce(Subquery(scores, output_field=IntegerField()), 0)
+
+
+# 已建立索引的模型，字段与各视图的 search_fields 一致
+SEARCH_INDEXES = {
+    'shift_maintenance_record': SearchIndex('shift_maintenance_record', ShiftMaintenanceRecord, {
+        'equipment_name': 3,
+        'equipment_number': 3,
+        'before_change': 1,
+        'after_change': 1,
+    }),
+    'maintenance_case': SearchIndex('maintenance_case', MaintenanceCase, {
+        'equipment_name': 3,
+        'fault_reason': 2,
+        'fault_phenomenon': 2,
+        'fault_handling_method': 1,
+    }),
+}
+
+
+def get_search_index(model):
+    for index in SEARCH_INDEXES.values():
+        if index.model is model:
+            return index
+    return None
+
+
+def index_objects(objects):
+    """供 bulk_create 等不触发信号的批量写入路径调用"""
+    objects = list(objects)
+    if objects:
+        index = get_search_index(type(objects[0]))
+        if index is not None:
+            index.index_objects(objects)
+
+
+class BigramSearchFilter(filters.SearchFilter):
+    """
+    使用二元组索引的 SearchFilter
+    search_fields 都已建立索引时先用索引缩小候选集，再执行原 icontains 条件；
+    请求中没有 ordering 参数时按得分排序（应放在 OrderingFilter 之后）
+    """
+
+    def get_index(self, view, request, queryset):
+        index = get_search_index(queryset.model)
+        search_fields = self.get_search_fields(view, request) or []
+        if index is None or any(field not in index.fields for field in search_fields):
+            return None
+        return index
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        index = self.get_index(view, request, queryset) if search_terms else None
+        if index is None:
+            return super().filter_queryset(request, queryset, view)
+
+        all_grams = set()
+        for term in search_terms:
+            queryset = index.narrow(queryset, term)
+            all_grams.update(bigrams(term))
+        queryset = super().filter_queryset(request, queryset, view)
+
+        if all_grams and api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.annotate(search_rank=index.rank(list(all_grams))).order_by(
+                '-search_rank', *(queryset.query.order_by or queryset.model._meta.ordering)
+            )
+        return queryset
+
+
+def update_index_on_save(sender, instance, **kwargs):
+    try:
+        get_search_index(sender).index_objects([instance])
+    except Exception as e:
+        # 索引失败不影响记录本身，可通过 rebuild_search_index 命令修复
+        logger.warning(f"无法更新搜索索引: {str(e)}")
+
+
+def remove_index_on_delete(sender, instance, **kwargs):
+    try:
+        get_search_index(sender).remove(instance.pk)
+    except Exception as e:
+        logger.warning(f"无法删除搜索索引: {str(e)}")
+
+
+for _index in SEARCH_INDEXES.values():
+    post_save.connect(update_index_on_save, sender=_index.model, dispatch_uid=f'search_index_save_{_index.kind}')
+    post_delete.connect(remove_index_on_delete, sender=_index.model, dispatch_uid=f'search_index_delete_{_index.kind}')
@@ -0,0 +1,59 @@
+from datetime import datetime, time, timedelta
+
+from django.db import models
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+
+# 允许查询的最大天数
+MAX_SERIES_DAYS = 366
+
+
+def parse_days(request, default=7):
+    """
+    解析请求中的 ?days= 参数，限制在 1 到 MAX_SERIES_DAYS 之间
+    参数缺失时返回 None
+    """
+    value = request.GET.get('days')
+    if value in (None, ''):
+        return None
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        days = default
+    return max(1, min(days, MAX_SERIES_DAYS))
+
+
+def date_range(start_date, days):
+    """返回从 start_date 开始的连续 days 天"""
+    return [start_date + timedelta(days=i) for i in range(days)]
+
+
+def daily_counts(queryset, field, start_date, end_date, aggregate=None):
+    """
+    按天分组聚合，整个日期区间只执行一条 GROUP BY 查询
+    DateTimeField 使用 TruncDate 分桶，并用区间条件过滤以便走索引
+    返回 {date: value}，没有数据的日期不在结果中
+    """
+    model_field = queryset.model._meta.get_field(field)
+    if isinstance(model_field, models.DateTimeField):
+        queryset = queryset.filter(**{
+            f'{field}__gte': datetime.combine(start_date, time.min),
+            f'{field}__lt': datetime.combine(end_date + timedelta(days=1), time.min),
+        }).annotate(bucket=TruncDate(field))
+    else:
+        queryset = queryset.filter(**{
+            f'{field}__range': (start_date, end_date),
+        }).annotate(bucket=F(field))
+
+    rows = queryset.order_by().values('bucket').annotate(value=aggregate or Count('pk'))
+    return {row['bucket']: row['value'] for row in rows}
+
+
+def daily_series(queryset, field, start_date, days, aggregate=None):
+    """
+    N 天分桶序列：返回 [(date, value), ...]，缺失的日期补 0
+    无论 days 为多少，都只执行一条查询
+    """
+    dates = date_range(start_date, days)
+    counts = daily_counts(queryset, field, dates[0], dates[-1], aggregate)
+    return [(day, counts.get(day, 0)) for day in dates]
@@ -2,10 +2,14 @@ from django.http import JsonResponse
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.sessions.models import Session
-from django.db.models import Count
+from django.db.models import Count, Q
+from django.core.cache import cache
+from django.conf import settings
 from datetime import datetime, date, timedelta
 from .models_task_plan import TaskPlan
-from .models_activity import UserActivity, WeeklyVisitTrend
+from .models_activity import UserActivity
+from . import visit_counter
+from . import stats_series
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,12 +32,18 @@ def active_users_count(request):
         except:
             # 如果UserActivity表不存在，使用备用方法
             active_users_count = 0
+        activity_based_count = active_users_count
+        
+        # 会话数和最近登录用户数只查询一次，回退逻辑和调试信息共用
+        session_based_count = Session.objects.filter(
+            expire_date__gte=timezone.now()
+        ).count()
+        recently_logged_in_users = User.objects.filter(
+            last_login__gte=fifteen_minutes_ago
+        ).count()
         
         # 如果活动记录为空或表不存在，回退到原来的逻辑
         if active_users_count == 0:
-            # 计算15分钟前的时间
-            fifteen_minutes_ago = timezone.now() - timedelta(minutes=15)
-            
             # 方法1: 通过Session判断活跃用户
             active_sessions = Session.objects.filter(expire_date__gte=timezone.now())
             active_user_count = 0
@@ -51,27 +61,17 @@ def active_users_count(request):
             
             # 方法2: 也可以考虑基于TaskPlan最近操作时间来判断活跃用户
             # 这里我们使用会话方式为主，结合最近登录时间
-            recently_active_users = User.objects.filter(
-                last_login__gte=fifteen_minutes_ago
-            ).count()
-            
             # 返回两者中的较大值，以更准确反映活跃用户数
-            active_users_count = max(active_user_count, recently_active_users)
+            active_users_count = max(active_user_count, recently_logged_in_users)
         
         return JsonResponse({
             'count': active_users_count,
             'timestamp': timezone.now().isoformat(),
             'method': 'activity_based_count',
             'debug_info': {
-                'activity_based_count': UserActivity.objects.filter(
-                    timestamp__gte=fifteen_minutes_ago
-                ).values('user').distinct().count() if active_users_count > 0 else 0,
-                'session_based_count': Session.objects.filter(
-                    expire_date__gte=timezone.now()
-                ).count(),
-                'recently_logged_in_users': User.objects.filter(
-                    last_login__gte=fifteen_minutes_ago
-                ).count()
+                'activity_based_count': activity_based_count,
+                'session_based_count': session_based_count,
+                'recently_logged_in_users': recently_logged_in_users
             }
         })
     except Exception as e:
@@ -99,19 +99,19 @@ def today_visits_count(request):
             # 如果UserActivity表不存在，使用备用方法
             today_activities_count = 0
         
+        # 统计今日创建的会话数量（代表访问次数），回退逻辑和调试信息共用
+        today_sessions_count = Session.objects.filter(
+            expire_date__gte=today_start
+        ).count()
+        
+        # 另一种方式：统计今日创建的任务数量（作为活动指标）
+        today_tasks_count = TaskPlan.objects.filter(
+            created_at__gte=today_start,
+            created_at__lt=today_end
+        ).count()
+        
         # 如果没有活动记录或表不存在，回退到原始的会话统计方法
         if today_activities_count == 0:
-            # 统计今日创建的会话数量（代表访问次数）
-            today_sessions_count = Session.objects.filter(
-                expire_date__gte=today_start
-            ).count()
-            
-            # 另一种方式：统计今日创建的任务数量（作为活动指标）
-            today_tasks_count = TaskPlan.objects.filter(
-                created_at__gte=today_start,
-                created_at__lt=today_end
-            ).count()
-            
             # 为了更准确，我们综合考虑多种因素
             # 会话数表示访问次数，但每次会话可能包含多次页面访问
             # 我们暂时返回会话数，但可以按需调整算法
@@ -125,11 +125,8 @@ def today_visits_count(request):
             'method': 'activity_based_count',
             'debug_info': {
                 'today_activities_count': today_activities_count,
-                'today_sessions_count': Session.objects.filter(expire_date__gte=today_start).count(),
-                'today_tasks_count': TaskPlan.objects.filter(
-                    created_at__gte=today_start,
-                    created_at__lt=today_end
-                ).count(),
+                'today_sessions_count': today_sessions_count,
+                'today_tasks_count': today_tasks_count,
                 'start_time': today_start.isoformat(),
                 'end_time': today_end.isoformat()
             }
@@ -222,84 +219,61 @@ def recent_activities(request):
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
 
+def get_series_range(request):
+    """
+    统计区间：默认本周（周一到周日），传入 ?days=N 时为截至今天的最近 N 天
+    返回 (start_date, days)
+    """
+    today = timezone.now().date()
+    days = stats_series.parse_days(request)
+    if days is None:
+        return today - timedelta(days=today.weekday()), 7  # 本周一
+    return today - timedelta(days=days - 1), days
+
+
 def weekly_visit_trends(request):
     """
     获取本周访问趋势
+    支持 ?days=30 等任意天数，查询次数与天数无关，GET请求不写数据库
     """
     try:
-        # 获取本周的7天数据
-        today = timezone.now().date()
-        week_start = today - timedelta(days=today.weekday())  # 本周一
+        week_start, days = get_series_range(request)
+        week_end = week_start + timedelta(days=days - 1)
+        
+        # 合并各分片的访问计数
+        try:
+            daily_counts = visit_counter.get_daily_counts(week_start, week_end)
+        except Exception as e:
+            logger.warning(f"无法读取访问计数: {str(e)}")
+            daily_counts = {}
+        
+        # 计数器中没有数据的日期，回退到 UserActivity 按天分组统计
+        try:
+            activity_counts = stats_series.daily_counts(
+                UserActivity.objects.all(), 'timestamp', week_start, week_end
+            )
+        except Exception as e:
+            logger.warning(f"无法读取用户活动统计: {str(e)}")
+            activity_counts = {}
         
         trends = []
-        for i in range(7):
-            day = week_start + timedelta(days=i)
-            
-            # 优先从 WeeklyVisitTrend 表获取当日访问量
-            try:
-                # 从 WeeklyVisitTrend 获取访问计数
-                daily_trend, created = WeeklyVisitTrend.objects.get_or_create(
-                    date=day,
-                    defaults={'visit_count': 0, 'unique_visitors': 0}
-                )
-                
-                # 使用数据库中已存储的值
-                daily_count = daily_trend.visit_count
-                
-                # 如果是今天，我们可能需要更新访问计数
-                # 但为了避免重复计算，只在有活动数据但趋势数据为0时才更新
-                if day == today and daily_count == 0:
-                    # 从 UserActivity 获取实时数据并更新 WeeklyVisitTrend
-                    activity_count = UserActivity.objects.filter(
-                        timestamp__date=day
-                    ).count()
-                    
-                    if activity_count > 0:
-                        # 更新数据库中的访问计数
-                        daily_trend.visit_count = activity_count
-                        daily_trend.save(update_fields=['visit_count'])
-                        daily_count = activity_count
-                        
-            except Exception as e:
-                # 如果 WeeklyVisitTrend 表有问题，回退到原始方法
-                try:
-                    daily_count = UserActivity.objects.filter(
-                        timestamp__date=day
-                    ).count()
-                except:
-                    # 如果 UserActivity 表也不存在，从会话中获取
-                    daily_count = 0
-                
-                # 如果仍然没有数据，尝试从会话中获取
-                if daily_count == 0:
-                    from django.contrib.sessions.models import Session
-                    daily_count = Session.objects.filter(
-                        expire_date__date=day
-                    ).count()
-                
-                # 创建或更新 WeeklyVisitTrend 记录
-                try:
-                    daily_trend, created = WeeklyVisitTrend.objects.get_or_create(
-                        date=day,
-                        defaults={'visit_count': daily_count, 'unique_visitors': 0}
-                    )
-                    if not created and daily_trend.visit_count != daily_count:
-                        daily_trend.visit_count = daily_count
-                        daily_trend.save(update_fields=['visit_count'])
-                except:
-                    pass  # 如果无法创建 WeeklyVisitTrend 记录，继续使用 daily_count
+        for day in stats_series.date_range(week_start, days):
+            counts = daily_counts.get(day, {})
+            daily_count = counts.get('visit_count', 0) or activity_counts.get(day, 0)
             
             trends.append({
                 'date': day.isoformat(),
                 'day_of_week': day.strftime('%a'),  # 星期几的缩写
                 'visit_count': daily_count,
+                'unique_visitors': counts.get('unique_visitors', 0),
                 'formatted_date': day.strftime('%m/%d')
             })
         
         return JsonResponse({
             'trends': trends,
             'week_start': week_start.isoformat(),
-            'week_end': (week_start + timedelta(days=6)).isoformat(),
+            'week_end': week_end.isoformat(),
+            'days': days,
             'timestamp': timezone.now().isoformat()
         })
     except Exception as e:
@@ -346,14 +320,12 @@ def maintenance_record_count_phase1(request):
     try:
         from .models_maintenance_new import ShiftMaintenanceRecord  # 导入维修记录模型
         from .models import PlantPhase  # 导入Phase模型（使用models.py中的模型）
+        from .config_registry import config_registry
         
-        # 获取一期的Phase对象
-        try:
-            phase_1 = PlantPhase.objects.get(code='phase_1')
-            count = ShiftMaintenanceRecord.objects.filter(phase=phase_1).count()
-        except PlantPhase.DoesNotExist:
-            # 如果Phase配置不存在，返回0
-            count = 0
+        # 从配置缓存获取一期的Phase对象
+        phase_1 = config_registry.get_by_code(PlantPhase, 'phase_1')
+        # 如果Phase配置不存在，返回0
+        count = ShiftMaintenanceRecord.objects.filter(phase=phase_1).count() if phase_1 else 0
         
         return JsonResponse({
             'count': count,
@@ -372,14 +344,12 @@ def maintenance_record_count_phase2(request):
     try:
         from .models_maintenance_new import ShiftMaintenanceRecord  # 导入维修记录模型
         from .models import PlantPhase  # 导入Phase模型（使用models.py中的模型）
+        from .config_registry import config_registry
         
-        # 获取二期的Phase对象
-        try:
-            phase_2 = PlantPhase.objects.get(code='phase_2')
-            count = ShiftMaintenanceRecord.objects.filter(phase=phase_2).count()
-        except PlantPhase.DoesNotExist:
-            # 如果Phase配置不存在，返回0
-            count = 0
+        # 从配置缓存获取二期的Phase对象
+        phase_2 = config_registry.get_by_code(PlantPhase, 'phase_2')
+        # 如果Phase配置不存在，返回0
+        count = ShiftMaintenanceRecord.objects.filter(phase=phase_2).count() if phase_2 else 0
         
         return JsonResponse({
             'count': count,
@@ -411,43 +381,34 @@ def weekly_activity_stats(request):
     """
     获取本周活动统计
     返回每周各天的维修记录、手册更新和未完成任务数量
+    每类数据一条按天分组的查询，支持 ?days=30 等任意天数
     """
     try:
         from .models_maintenance_new import ShiftMaintenanceRecord
         from .models_maintenance import MaintenanceManual
-        from .models_task_plan import TaskPlan
-        from django.db.models import Count
         
-        # 获取本周的7天数据
-        today = timezone.now().date()
-        week_start = today - timedelta(days=today.weekday())  # 本周一
+        week_start, days = get_series_range(request)
+        
+        # 每天的维修记录数、手册更新数和未完成任务数（状态为pending的任务）
+        records_series = stats_series.daily_series(
+            ShiftMaintenanceRecord.objects.all(), 'created_at', week_start, days
+        )
+        manuals_series = stats_series.daily_series(
+            MaintenanceManual.objects.all(), 'created_at', week_start, days
+        )
+        pending_tasks_series = stats_series.daily_series(
+            TaskPlan.objects.filter(status='pending'), 'date', week_start, days
+        )
         
         activity_stats = []
-        for i in range(7):
-            day = week_start + timedelta(days=i)
-            
-            # 获取当日的维修记录数
-            daily_records_count = ShiftMaintenanceRecord.objects.filter(
-                created_at__date=day
-            ).count()
-            
-            # 获取当日的手册更新数
-            daily_manuals_count = MaintenanceManual.objects.filter(
-                created_at__date=day
-            ).count()
-            
-            # 获取当日的未完成任务数（状态为pending的任务）
-            daily_pending_tasks_count = TaskPlan.objects.filter(
-                date=day,
-                status='pending'
-            ).count()
-            
+        for (day, records_count), (_, manuals_count), (_, pending_tasks_count) in zip(
+                records_series, manuals_series, pending_tasks_series):
             activity_stats.append({
                 'date': day.isoformat(),
                 'day_name': day.strftime('%a'),  # 星期几的缩写
-                'records_count': daily_records_count,
-                'manuals_count': daily_manuals_count,
-                'pending_tasks_count': daily_pending_tasks_count,
+                'records_count': records_count,
+                'manuals_count': manuals_count,
+                'pending_tasks_count': pending_tasks_count,
                 'formatted_date': day.strftime('%m/%d'),
                 'day_chinese': ['周一', '周二', '周三', '周四', '周五', '周六', '周日'][day.weekday()]
             })
@@ -455,9 +416,96 @@ def weekly_activity_stats(request):
         return JsonResponse({
             'activity_stats': activity_stats,
             'week_start': week_start.isoformat(),
-            'week_end': (week_start + timedelta(days=6)).isoformat(),
+            'week_end': (week_start + timedelta(days=days - 1)).isoformat(),
+            'days': days,
             'timestamp': timezone.now().isoformat()
         })
     except Exception as e:
         logger.error(f"Error getting weekly activity stats: {str(e)}")
-        return JsonResponse({'error': 'Internal server error'}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+# 仪表板汇总字段 -> (数据表分组, 条件聚合表达式)
+# 同一分组的字段在一条 SQL 中用条件聚合一次算出
+SUMMARY_FIELDS = {
+    'asset_count': ('asset', lambda today: Count('uuid')),
+    'maintenance_record_count': ('maintenance_record', lambda today: Count('uuid')),
+    'maintenance_record_count_phase1': ('maintenance_record', lambda today: Count('uuid', filter=Q(phase__code='phase_1'))),
+    'maintenance_record_count_phase2': ('maintenance_record', lambda today: Count('uuid', filter=Q(phase__code='phase_2'))),
+    'maintenance_manual_count': ('maintenance_manual', lambda today: Count('uuid')),
+    'today_tasks_count': ('task_plan', lambda today: Count('uuid', filter=Q(date=today))),
+    'incomplete_tasks_count': ('task_plan', lambda today: Count('uuid', filter=Q(status__in=['pending', 'in_progress']))),
+    'in_progress_tasks_count': ('task_plan', lambda today: Count('uuid', filter=Q(status='in_progress'))),
+}
+
+
+def get_summary_querysets():
+    """汇总分组对应的查询集"""
+    from .models import Asset
+    from .models_maintenance_new import ShiftMaintenanceRecord
+    from .models_maintenance import MaintenanceManual
+
+    return {
+        'asset': Asset.objects.all(),
+        'maintenance_record': ShiftMaintenanceRecord.objects.all(),
+        'maintenance_manual': MaintenanceManual.objects.all(),
+        'task_plan': TaskPlan.objects.all(),
+    }
+
+
+def compute_dashboard_summary(fields, today=None):
+    """
+    计算仪表板汇总数据
+    每个数据表只执行一次条件聚合查询，未请求的数据表不查询
+    """
+    today = today or timezone.now().date()
+    querysets = get_summary_querysets()
+
+    groups = {}
+    for field in fields:
+        group, expression = SUMMARY_FIELDS[field]
+        groups.setdefault(group, {})[field] = expression(today)
+
+    summary = {}
+    for group, aggregates in groups.items():
+        summary.update(querysets[group].order_by().aggregate(**aggregates))
+    return summary
+
+
+def dashboard_summary(request):
+    """
+    仪表板汇总统计
+    一次请求返回资产、维修记录、维修手册和任务计划的各项计数
+    支持 ?fields=asset_count,today_tasks_count 只返回需要的字段
+    结果短时间缓存，缓存时间由 STATS_SUMMARY_CACHE_TIMEOUT 设置
+    """
+    try:
+        requested = request.GET.get('fields')
+        if requested:
+            fields = [f.strip() for f in requested.split(',') if f.strip()]
+            unknown = [f for f in fields if f not in SUMMARY_FIELDS]
+            if unknown:
+                return JsonResponse({
+                    'error': f"未知字段: {', '.join(unknown)}",
+                    'available_fields': list(SUMMARY_FIELDS.keys())
+                }, status=400)
+        else:
+            fields = list(SUMMARY_FIELDS.keys())
+
+        today = timezone.now().date()
+        cache_key = f"stats_summary:{today.isoformat()}:{','.join(sorted(fields))}"
+        summary = cache.get(cache_key)
+        cached = summary is not None
+        if not cached:
+            summary = compute_dashboard_summary(fields, today)
+            cache.set(cache_key, summary, getattr(settings, 'STATS_SUMMARY_CACHE_TIMEOUT', 30))
+
+        return JsonResponse({
+            'summary': summary,
+            'cached': cached,
+            'date': str(today),
+            'timestamp': timezone.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error getting dashboard summary: {str(e)}")
+        return JsonResponse({'error': 'Internal server error'}, status=500)
@@ -3,16 +3,23 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from rest_framework.decorators import api_view
+from rest_framework.response import Response
 from .models_task_plan import TaskPlan
-from .models import PlantPhase, Process, ProductionLine
-from django.contrib.auth.models import User
+from .task_plan_import import import_task_plans
+from .import_jobs import wants_background, create_import_job, accepted_payload
+from .excel_reader import SheetReader, get_chunk_size, get_sheet, open_workbook
+from .template_cache import template_response, workbook_bytes
 from django.utils import timezone
 import json
+from itertools import islice
+from .excel_export import (
+    Column, ExportSpec, EXPORT_FORMATS, choice_text, date_text, export_response, get_export_format
+)
 
 
-def download_task_plan_template(request):
+def build_task_plan_template():
     """
-    下载任务计划Excel模板
+    渲染任务计划Excel模板，返回 xlsx 字节内容
     """
     wb = Workbook()
     ws = wb.active
@@ -56,12 +63,49 @@ def download_task_plan_template(request):
         cell = ws.cell(row=2, column=col_num, value=value)
         cell.alignment = Alignment(horizontal='left', vertical='center')
 
-    # 创建HTTP响应
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=任务计划模板.xlsx'
-    
-    wb.save(response)
-    return response
+    return workbook_bytes(wb)
+
+
+def download_task_plan_template(request):
+    """
+    下载任务计划Excel模板（按配置版本缓存，支持 ETag/Last-Modified 条件请求）
+    """
+    return template_response(request, 'task_plan', '任务计划模板.xlsx', build_task_plan_template)
+
+
+def assigned_usernames(raw):
+    """任务实施人：每批只查询一次多对多关联表"""
+    through = TaskPlan.assigned_users.through
+    rows = through.objects.filter(taskplan_id__in=list(raw['uuid'])).order_by('id').values_list(
+        'taskplan_id', 'user__username'
+    )
+    names = {}
+    for task_plan_id, username in rows:
+        names.setdefault(task_plan_id, []).append(username)
+    return raw['uuid'].map(lambda task_plan_id: ','.join(names.get(task_plan_id, [])))
+
+
+# 任务计划导出规格，所有单元格按文本写入
+TASK_PLAN_EXPORT_SPEC = ExportSpec(
+    sheet_title='任务计划数据',
+    filename='任务计划数据',
+    key_fields=['uuid'],
+    columns=[
+        Column('ID', 'uuid', width=10),
+        Column('日期', 'date', date_text('%Y-%m-%d')),
+        Column('任务计划', 'task_description', width=30),
+        Column('任务实施人', assigned_usernames, width=20),
+        Column('计划人数', 'planned_people_count', lambda s: s.fillna(0), width=10),
+        Column('状态', 'status', choice_text(dict(TaskPlan.STATUS_CHOICES), empty='unknown'), width=12),
+        Column('完成进度(%)', 'progress', lambda s: s.fillna(0.0)),
+        Column('期别', 'phase__name', width=10),
+        Column('工序', 'process__name', width=10),
+        Column('产线', 'production_line__name', width=10),
+        Column('创建时间', 'created_at', date_text('%Y-%m-%d %H:%M:%S'), width=20),
+        Column('更新时间', 'updated_at', date_text('%Y-%m-%d %H:%M:%S'), width=20),
+    ],
+    cell_format={'align': 'left', 'valign': 'vcenter', 'border': 1},
+)
 
 
 @api_view(['POST'])
@@ -76,35 +120,8 @@ def download_filtered_task_plans(request):
     filters = request.data if hasattr(request, 'data') else {}
     month_filter = filters.get('month', '')  # 月份筛选参数，格式为 'YYYY-MM' 或 'all'
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "任务计划数据"
-
-    # 定义标题
-    headers = [
-        'ID', '日期', '任务计划', '任务实施人', '计划人数', '状态', '完成进度(%)', 
-        '期别', '工序', '产线', '创建时间', '更新时间'
-    ]
-    
-    # 设置标题行样式
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-    # 设置列宽
-    column_widths = [10, 15, 30, 20, 10, 12, 15, 10, 10, 10, 20, 20]
-    for col_num, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col_num)].width = width
-
     # 获取任务计划数据
-    task_plans = TaskPlan.objects.all().select_related('phase', 'process', 'production_line').prefetch_related('assigned_users')
+    task_plans = TaskPlan.objects.all()
 
     # 根据月份进行筛选
     if month_filter and month_filter != 'all':
@@ -124,186 +141,90 @@ def download_filtered_task_plans(request):
             response_content = json.dumps({'error': f'月份格式不正确，请使用 YYYY-MM 格式'}, ensure_ascii=False)
             return HttpResponse(response_content, content_type='application/json', status=400)
 
-    # 填充数据
-    for row_num, task_plan in enumerate(task_plans, 2):
-        try:
-            # 获取任务实施人用户名
-            assigned_users_str = ','.join([user.username for user in task_plan.assigned_users.all()])
-            
-            # 获取关联对象名称，添加更安全的空值检查
-            phase_name = task_plan.phase.name if task_plan.phase and hasattr(task_plan.phase, 'name') else ''
-            process_name = task_plan.process.name if task_plan.process and hasattr(task_plan.process, 'name') else ''
-            production_line_name = task_plan.production_line.name if task_plan.production_line and hasattr(task_plan.production_line, 'name') else ''
-
-            row_data = [
-                str(task_plan.uuid) if task_plan.uuid else '',  # ID
-                task_plan.date.strftime('%Y-%m-%d') if task_plan.date else '',  # 日期
-                task_plan.task_description or '',  # 任务计划
-                assigned_users_str,  # 任务实施人
-                task_plan.planned_people_count or 0,  # 计划人数
-                dict(TaskPlan.STATUS_CHOICES).get(task_plan.status, task_plan.status) if task_plan.status else 'unknown',  # 状态
-                task_plan.progress or 0.0,  # 完成进度
-                phase_name,  # 期别
-                process_name,  # 工序
-                production_line_name,  # 产线
-                task_plan.created_at.strftime('%Y-%m-%d %H:%M:%S') if task_plan.created_at else '',  # 创建时间
-                task_plan.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task_plan.updated_at else '',  # 更新时间
-            ]
-
-            for col_num, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_num, column=col_num, value=str(value) if value is not None else '')
-                cell.alignment = Alignment(horizontal='left', vertical='center')
-                cell.border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-        except AttributeError as e:
-            # 如果出现属性错误，跳过这条记录并记录错误
-            print(f"导出任务计划时出现错误，ID: {getattr(task_plan, 'uuid', 'Unknown')}, 错误: {str(e)}")
-            continue
-        except Exception as e:
-            # 记录其他错误
-            print(f"导出任务计划时出现未知错误，ID: {getattr(task_plan, 'uuid', 'Unknown')}, 错误: {str(e)}")
-            continue
-
-    # 创建HTTP响应
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=任务计划数据.xlsx'
-    
-    wb.save(response)
-    return response
+    export_format = get_export_format(request)
+    if export_format not in EXPORT_FORMATS:
+        response_content = json.dumps({'error': f'不支持的导出格式: {export_format}'}, ensure_ascii=False)
+        return HttpResponse(response_content, content_type='application/json', status=400)
+    return export_response(TASK_PLAN_EXPORT_SPEC, task_plans, export_format)
 
 
-def upload_task_plan_records(file):
+# 任务计划导入必需列
+TASK_PLAN_REQUIRED_COLUMNS = ['日期', '任务计划', '任务实施人(用户名)', '状态', '完成进度(%)', '期别', '工序', '产线']
+
+
+def missing_task_plan_columns(headers):
+    """返回表头中缺少的必需列"""
+    present = {str(header).strip() for header in headers if header}
+    return [col for col in TASK_PLAN_REQUIRED_COLUMNS if col not in present]
+
+
+def import_task_plan_workbook(file):
     """
-    上传任务计划Excel文件并保存到数据库
+    从任务计划Excel文件导入（openpyxl 只读模式逐行读取，按分块批量写入）
     """
-    from openpyxl import load_workbook
-    
-    wb = load_workbook(filename=file)
-    ws = wb.active
-    
     results = {'success_count': 0, 'error_count': 0, 'errors': []}
-    
-    # 读取Excel数据
-    headers = [cell.value for cell in ws[1]]
-    
-    # 找到各列索引
-    header_indices = {}
-    for idx, header in enumerate(headers):
-        if header:
-            header_indices[header.strip()] = idx
-    
-    # 必需列
-    required_columns = ['日期', '任务计划', '任务实施人(用户名)', '状态', '完成进度(%)', '期别', '工序', '产线']
-    
-    for col in required_columns:
-        if col not in header_indices:
+
+    with open_workbook(file) as workbook:
+        reader = SheetReader(get_sheet(workbook))
+
+        for col in missing_task_plan_columns(reader.headers):
             results['errors'].append(f'缺少必需列: {col}')
             results['error_count'] += 1
             return results
 
-    # 从第2行开始读取数据
-    for row_idx in range(2, ws.max_row + 1):
-        try:
-            # 读取数据
-            date_val = ws.cell(row=row_idx, column=header_indices['日期'] + 1).value
-            task_description = ws.cell(row=row_idx, column=header_indices['任务计划'] + 1).value
-            assigned_users_str = ws.cell(row=row_idx, column=header_indices['任务实施人(用户名)'] + 1).value
-            status = ws.cell(row=row_idx, column=header_indices['状态'] + 1).value
-            progress = ws.cell(row=row_idx, column=header_indices['完成进度(%)'] + 1).value
-            phase_name = ws.cell(row=row_idx, column=header_indices['期别'] + 1).value
-            process_name = ws.cell(row=row_idx, column=header_indices['工序'] + 1).value
-            production_line_name = ws.cell(row=row_idx, column=header_indices['产线'] + 1).value
-
-            # 数据验证
-            if not all([date_val, task_description, assigned_users_str]):
-                results['errors'].append(f'第{row_idx}行数据不完整')
-                results['error_count'] += 1
-                continue
-
-            # 处理日期
-            if isinstance(date_val, str):
-                from datetime import datetime
-                try:
-                    date_obj = datetime.strptime(date_val, '%Y-%m-%d').date()
-                except ValueError:
-                    results['errors'].append(f'第{row_idx}行日期格式错误: {date_val}')
-                    results['error_count'] += 1
-                    continue
-            else:
-                date_obj = date_val
-
-            # 处理进度
-            try:
-                progress_val = float(progress) if progress is not None else 0.0
-            except (ValueError, TypeError):
-                progress_val = 0.0
-
-            # 处理状态
-            if status not in dict(TaskPlan.STATUS_CHOICES):
-                status = 'pending'  # 默认为待处理
-
-            # 获取关联对象
-            phase = None
-            if phase_name:
-                phase, created = PlantPhase.objects.get_or_create(
-                    name=phase_name,
-                    defaults={'code': phase_name[:10]}
-                )
-
-            process = None
-            if process_name:
-                process, created = Process.objects.get_or_create(
-                    name=process_name,
-                    defaults={'code': process_name[:10]}
-                )
-
-            production_line = None
-            if production_line_name:
-                production_line, created = ProductionLine.objects.get_or_create(
-                    name=production_line_name,
-                    defaults={'code': production_line_name[:10]}
-                )
-
-            # 获取用户
-            assigned_users = []
-            if assigned_users_str:
-                user_names = [name.strip() for name in str(assigned_users_str).split(',')]
-                for username in user_names:
-                    try:
-                        user = User.objects.get(username=username)
-                        assigned_users.append(user)
-                    except User.DoesNotExist:
-                        results['errors'].append(f'第{row_idx}行找不到用户: {username}')
-                        results['error_count'] += 1
-                        continue
-
-            if not assigned_users:
-                results['errors'].append(f'第{row_idx}行没有有效的用户')
-                results['error_count'] += 1
-                continue
-
-            # 创建或更新任务计划
-            task_plan = TaskPlan.objects.create(
-                date=date_obj,
-                task_description=task_description,
-                status=status,
-                progress=progress_val,
-                phase=phase,
-                process=process,
-                production_line=production_line
-            )
+        headers = [str(header).strip() for header in reader.headers]
 
-            # 分配用户
-            task_plan.assigned_users.set(assigned_users)
+        # 从第2行开始读取数据
+        rows = enumerate(reader.iter_rows(), start=2)
+        while True:
+            chunk = [(row_idx, dict(zip(headers, values))) for row_idx, values in islice(rows, get_chunk_size())]
+            if not chunk:
+                break
+            chunk_results = import_task_plans(chunk)
+            for key in results:
+                results[key] += chunk_results[key]
 
-            results['success_count'] += 1
+    return results
 
-        except Exception as e:
-            results['errors'].append(f'第{row_idx}行处理错误: {str(e)}')
-            results['error_count'] += 1
 
-    return results
\ No newline at end of file
+def import_task_plan_frame(df):
+    """
+    从 DataFrame 导入任务计划（后台导入任务按分块调用），行号 = 索引 + 2
+    """
+    import pandas as pd
+
+    df = df.rename(columns=lambda header: str(header).strip())
+    rows = (
+        (index + 2, {
+            key: None if not isinstance(value, str) and pd.isna(value)
+            else value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+            for key, value in row.items()
+        })
+        for index, row in zip(df.index, df.to_dict(orient='records'))
+    )
+    return import_task_plans(rows)
+
+
+@api_view(['POST'])
+def upload_task_plan_records(request):
+    """
+    上传任务计划Excel文件并保存到数据库
+    """
+    if 'file' not in request.FILES:
+        return Response({'error': '没有上传文件'}, status=400)
+
+    uploaded_file = request.FILES['file']
+
+    # 检查文件类型
+    if not uploaded_file.name.endswith(('.xlsx', '.xls')):
+        return Response({'error': '只支持Excel文件(.xlsx, .xls)'}, status=400)
+
+    # 大文件提交为后台导入任务，立即返回任务ID
+    if wants_background(request):
+        job = create_import_job('task_plans', uploaded_file, user=request.user)
+        return Response(accepted_payload(job), status=202)
+
+    try:
+        return Response(import_task_plan_workbook(uploaded_file))
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
@@ -0,0 +1,206 @@
+"""
+任务计划 Excel 批量导入
+
+1. 先逐行校验并解析（日期、进度、状态、实施人用户名），不访问数据库
+2. 涉及的用户名、期别、工序、产线各用一次查询解析为 id，不存在的期别/工序/产线批量新建
+3. 任务计划一次 bulk_create 写入，计划人数按解析出的实施人数直接计算
+4. 任务实施人（多对多关联表）一次 bulk_create 写入
+"""
+import logging
+from datetime import date, datetime
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .config_registry import config_registry
+from .maintenance_import import get_batch_size
+from .models import PlantPhase, Process, ProductionLine
+from .models_task_plan import TaskPlan
+
+logger = logging.getLogger(__name__)
+
+
+def parse_task_plan_row(row_number, row, errors):
+    """
+    校验并解析一行，row 为 {列名: 值}，空单元格为 None
+    返回解析结果字典，整行无效时返回 None
+    """
+    date_val = row.get('日期')
+    task_description = row.get('任务计划')
+    assigned_users_str = row.get('任务实施人(用户名)')
+
+    if not all([date_val, task_description, assigned_users_str]):
+        errors.append(f'第{row_number}行数据不完整')
+        return None
+
+    if isinstance(date_val, str):
+        try:
+            date_val = datetime.strptime(date_val, '%Y-%m-%d').date()
+        except ValueError:
+            errors.append(f'第{row_number}行日期格式错误: {date_val}')
+            return None
+    elif isinstance(date_val, datetime):
+        date_val = date_val.date()
+    elif not isinstance(date_val, date):
+        errors.append(f'第{row_number}行日期格式错误: {date_val}')
+        return None
+
+    progress = row.get('完成进度(%)')
+    try:
+        progress = float(progress) if progress is not None else 0.0
+    except (ValueError, TypeError):
+        progress = 0.0
+
+    status = row.get('状态')
+    if status not in dict(TaskPlan.STATUS_CHOICES):
+        status = 'pending'  # 默认为待处理
+
+    # 同一行内重复的用户名只分配一次
+    usernames = list(dict.fromkeys(
+        name.strip() for name in str(assigned_users_str).split(',') if name.strip()
+    ))
+
+    return {
+        'row': row_number,
+        'date': date_val,
+        'task_description': str(task_description),
+        'status': status,
+        'progress': progress,
+        'usernames': usernames,
+        'phase': str(row['期别']).strip() if row.get('期别') else None,
+        'process': str(row['工序']).strip() if row.get('工序') else None,
+        'production_line': str(row['产线']).strip() if row.get('产线') else None,
+    }
+
+
+def resolve_by_name(model, names):
+    """
+    名称 -> id，不存在的名称按原导入规则新建（代码取名称前10个字符）
+    新代码与已有代码冲突的名称不创建，不出现在结果中
+    """
+    if not names:
+        return {}
+    ids = {}
+    for pk, name in model.objects.filter(name__in=names).order_by('id').values_list('id', 'name'):
+        ids.setdefault(name, pk)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        taken = set(model.objects.filter(code__in=[name[:10] for name in missing]).values_list('code', flat=True))
+        new = {}
+        for name in missing:
+            if name[:10] not in taken:
+                taken.add(name[:10])
+                new[name] = model(code=name[:10], name=name)
+        if new:
+            model.objects.bulk_create(new.values())
+            # bulk_create 不触发保存信号，需手动使配置缓存过期
+            config_registry.bump()
+            ids.update(model.objects.filter(name__in=list(new)).values_list('name', 'id'))
+    return ids
+
+
+def resolve_production_lines(keys):
+    """
+    (期别 id, 产线名称) -> id，优先匹配同一期别的产线，其次任一期别的同名产线
+    都不存在且该行有期别时在该期别下新建；产线必须属于某个期别，没有期别时无法新建
+    """
+    if not keys:
+        return {}
+    scoped = {}
+    any_phase = {}
+    names = {name for _, name in keys}
+    for pk, name, phase_id in ProductionLine.objects.filter(name__in=names).order_by('id').values_list('id', 'name', 'phase_id'):
+        scoped.setdefault((phase_id, name), pk)
+        any_phase.setdefault(name, pk)
+
+    missing = [(phase_id, name) for phase_id, name in keys
+               if (phase_id, name) not in scoped and name not in any_phase and phase_id is not None]
+    if missing:
+        taken = set(ProductionLine.objects.filter(
+            code__in=[name[:10] for _, name in missing]
+        ).values_list('phase_id', 'code'))
+        new = []
+        for phase_id, name in missing:
+            if (phase_id, name[:10]) not in taken:
+                taken.add((phase_id, name[:10]))
+                new.append(ProductionLine(code=name[:10], name=name, phase_id=phase_id))
+        if new:
+            ProductionLine.objects.bulk_create(new)
+            config_registry.bump()
+            created = ProductionLine.objects.filter(name__in=[line.name for line in new]).values_list('id', 'name', 'phase_id')
+            for pk, name, phase_id in created:
+                scoped.setdefault((phase_id, name), pk)
+
+    return {
+        (phase_id, name): scoped.get((phase_id, name), any_phase.get(name))
+        for phase_id, name in keys
+    }
+
+
+def import_task_plans(rows):
+    """
+    批量导入任务计划，rows 为 (行号, {列名: 值}) 的可迭代对象
+    返回 {'success_count', 'error_count', 'errors'}
+    """
+    errors = []
+    parsed = [plan for plan in (parse_task_plan_row(number, row, errors) for number, row in rows) if plan]
+
+    with transaction.atomic():
+        user_ids = dict(User.objects.filter(
+            username__in={name for plan in parsed for name in plan['usernames']}
+        ).values_list('username', 'id'))
+        phase_ids = resolve_by_name(PlantPhase, {plan['phase'] for plan in parsed if plan['phase']})
+        process_ids = resolve_by_name(Process, {plan['process'] for plan in parsed if plan['process']})
+        line_ids = resolve_production_lines({
+            (phase_ids.get(plan['phase']), plan['production_line'])
+            for plan in parsed if plan['production_line']
+        })
+
+        task_plans = []
+        assignments = []
+        for plan in parsed:
+            users = []
+            for username in plan['usernames']:
+                if username in user_ids:
+                    users.append(user_ids[username])
+                else:
+                    errors.append(f"第{plan['row']}行找不到用户: {username}")
+            if not users:
+                errors.append(f"第{plan['row']}行没有有效的用户")
+                continue
+
+            phase_id = phase_ids.get(plan['phase'])
+            line_id = line_ids.get((phase_id, plan['production_line']))
+            if plan['phase'] and phase_id is None:
+                errors.append(f"第{plan['row']}行无法创建期别: {plan['phase']}")
+                continue
+            if plan['process'] and plan['process'] not in process_ids:
+                errors.append(f"第{plan['row']}行无法创建工序: {plan['process']}")
+                continue
+            if plan['production_line'] and line_id is None:
+                errors.append(f"第{plan['row']}行产线不存在: {plan['production_line']}")
+                continue
+
+            # bulk_create 不调用 save()，计划人数直接取分配的用户数
+            task_plan = TaskPlan(
+                date=plan['date'],
+                task_description=plan['task_description'],
+                status=plan['status'],
+                progress=plan['progress'],
+                planned_people_count=len(users),
+                phase_id=phase_id,
+                process_id=process_ids.get(plan['process']),
+                production_line_id=line_id,
+            )
+            task_plans.append(task_plan)
+            # 主键为客户端生成的 UUID，写入前即可建立关联
+            assignments.extend(
+                TaskPlan.assigned_users.through(taskplan_id=task_plan.pk, user_id=user_id)
+                for user_id in users
+            )
+
+        TaskPlan.objects.bulk_create(task_plans, batch_size=get_batch_size())
+        TaskPlan.assigned_users.through.objects.bulk_create(assignments, batch_size=get_batch_size())
+
+    logger.info(f"批量导入任务计划 {len(task_plans)} 条，实施人 {len(assignments)} 人次，错误 {len(errors)} 条")
+    return {'success_count': len(task_plans), 'error_count': len(errors), 'errors': errors}
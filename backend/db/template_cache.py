@@ -0,0 +1,94 @@
+"""
+Excel 模板缓存
+
+模板只随配置表（期数、班次、工序、产线）变化，每个模板按配置版本渲染一次后保存在进程内存中。
+配置版本取自进程内配置缓存（config_registry），任何配置写入后递增。
+下载时返回 ETag / Last-Modified，浏览器带条件请求再次下载时返回 304。
+"""
+import threading
+from datetime import datetime
+from io import BytesIO
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .config_registry import config_registry
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 模板内容（表头、示例行、样式）修改时递增，使浏览器缓存的旧模板失效
+TEMPLATE_REVISION = 1
+
+
+def config_version():
+    """返回 (配置版本号, 最后修改时间)"""
+    snapshot = config_registry.snapshot()
+    return snapshot.version, snapshot.last_modified
+
+
+class RenderedTemplate:
+    """
+    ETag 由模板名、模板修订号和配置版本组成
+    xlsx 内含保存时间，同一模板在不同进程渲染的字节不同，因此不按内容计算
+    """
+
+    def __init__(self, name, version, content, last_modified):
+        self.content = content
+        self.etag = quote_etag(f'{name}-{TEMPLATE_REVISION}-{version}')
+        # 没有配置记录时以渲染时间作为最后修改时间
+        self.last_modified = last_modified or datetime.now()
+
+
+class TemplateCache:
+    """
+    已渲染模板的进程内缓存，每个模板只保留当前配置版本的一份
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, build):
+        """build() 返回模板的 xlsx 字节内容，配置版本变化后重新渲染"""
+        version, last_modified = config_version()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        rendered = RenderedTemplate(name, version, build(), last_modified)
+        with self._lock:
+            self._entries[name] = (version, rendered)
+        return rendered
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局缓存实例
+template_cache = TemplateCache()
+
+
+def template_response(request, name, filename, build):
+    """
+    返回缓存的模板文件，条件请求命中时返回 304
+    """
+    rendered = template_cache.get(name, build)
+    last_modified = int(rendered.last_modified.timestamp())
+    response = get_conditional_response(request, etag=rendered.etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(rendered.content, content_type=XLSX_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+    response['ETag'] = rendered.etag
+    response['Last-Modified'] = http_date(last_modified)
+    # 允许浏览器缓存，但每次使用前都需要验证
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def workbook_bytes(workbook):
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
@@ -1,4 +1,12 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
 from django.test import TestCase
+from django.db.models import Q
+from django.utils import timezone
+
+from . import visit_counter
 
 # Create your tests here.
 class EmptyTest(TestCase):
@@ -10,4 +18,1106 @@ class EmptyTest(TestCase):
     def test_empty_test(self):
         """Mockup test"""
        
-        self.assertEqual(True, True)
\ No newline at end of file
+        self.assertEqual(True, True)
+
+class ActivityBufferTest(TestCase):
+    """用户活动缓冲区测试"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .activity_buffer import ActivityBuffer
+        self.user = User.objects.create_user(username='buffer_user', password='pass')
+        # 测试缓冲行为需要开启后台刷新；刷新间隔设得足够长，避免后台线程在测试过程中刷新
+        self.buffer = ActivityBuffer(max_size=5, flush_threshold=3, flush_interval=3600, background=True)
+
+    def tearDown(self):
+        self.buffer.is_running = False
+
+    def make_activity(self):
+        from .models_activity import UserActivity
+        return UserActivity(user_id=self.user.pk, activity_type='other', description='test')
+
+    def test_flush_on_threshold(self):
+        from .models_activity import UserActivity
+        self.buffer.add_activity(self.make_activity())
+        self.buffer.add_activity(self.make_activity())
+        self.assertEqual(UserActivity.objects.count(), 0)
+
+        self.buffer.add_activity(self.make_activity())
+        self.assertEqual(UserActivity.objects.count(), 3)
+        today = timezone.now().date()
+        counts = visit_counter.get_daily_counts(today, today)[today]
+        self.assertEqual(counts['visit_count'], 3)
+        self.assertEqual(counts['unique_visitors'], 1)
+        self.assertEqual(self.buffer.stats()['flushed'], 3)
+
+    def test_ring_buffer_drops_oldest(self):
+        from .models_activity import UserActivity
+        self.buffer.flush_threshold = 100
+        for _ in range(7):
+            self.buffer.add_activity(self.make_activity())
+        self.assertEqual(self.buffer.stats()['dropped'], 2)
+
+        self.buffer.drain()
+        self.assertEqual(UserActivity.objects.count(), 5)
+
+    def test_visit_counts_accumulate(self):
+        for _ in range(4):
+            self.buffer.add_visit('ip:10.0.0.1')
+        self.buffer.flush()
+        self.buffer.add_visit('ip:10.0.0.2')
+        self.buffer.flush()
+        today = timezone.now().date()
+        counts = visit_counter.get_daily_counts(today, today)[today]
+        self.assertEqual(counts['visit_count'], 5)
+        self.assertEqual(counts['unique_visitors'], 2)
+
+    def test_write_through_without_background_thread(self):
+        from .activity_buffer import ActivityBuffer
+        from .models_activity import UserActivity
+        buffer = ActivityBuffer(background=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            buffer.add_activity(self.make_activity())
+            buffer.add_visit('ip:10.0.0.1')
+            self.assertEqual(UserActivity.objects.count(), 0)
+        self.assertIsNone(buffer.thread)
+        self.assertEqual(UserActivity.objects.count(), 1)
+        today = timezone.now().date()
+        self.assertEqual(visit_counter.get_daily_counts(today, today)[today]['visit_count'], 2)
+
+
+class VisitCounterTest(TestCase):
+    """分片访问计数与 HyperLogLog 测试"""
+
+    def test_shards_merged_on_read(self):
+        from .models_activity import WeeklyVisitTrend
+        today = timezone.now().date()
+        WeeklyVisitTrend.objects.create(date=today, visit_count=10)
+        visit_counter.increment(today, 3, shard=0)
+        visit_counter.increment(today, 4, shard=1)
+        visit_counter.increment(today, 5, shard=1)
+        self.assertEqual(visit_counter.get_daily_counts(today, today)[today]['visit_count'], 22)
+
+    def test_sketches_merged_across_shards(self):
+        today = timezone.now().date()
+        first = visit_counter.HyperLogLog()
+        second = visit_counter.HyperLogLog()
+        for i in range(300):
+            first.add(f"user:{i}")
+        for i in range(200, 500):
+            second.add(f"user:{i}")
+        visit_counter.increment(today, 300, first, shard=0)
+        visit_counter.increment(today, 300, second, shard=1)
+        uniques = visit_counter.get_daily_counts(today, today)[today]['unique_visitors']
+        self.assertAlmostEqual(uniques, 500, delta=50)
+
+    def test_hyperloglog_estimate(self):
+        sketch = visit_counter.HyperLogLog()
+        for i in range(20000):
+            sketch.add(i)
+        restored = visit_counter.HyperLogLog.from_bytes(sketch.to_bytes())
+        self.assertAlmostEqual(restored.count(), 20000, delta=20000 * 0.1)
+
+
+class DashboardSummaryTest(TestCase):
+    """仪表板汇总统计测试"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from django.contrib.auth.models import User
+        from .models import PlantPhase, ShiftType, Asset
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        from .models_task_plan import TaskPlan
+
+        cache.clear()
+        phase_1 = PlantPhase.objects.create(code='phase_1', name='一期')
+        phase_2 = PlantPhase.objects.create(code='phase_2', name='二期')
+        shift = ShiftType.objects.create(code='long_day_shift', name='长白班')
+        Asset.objects.create(name='设备A')
+        for phase in (phase_1, phase_1, phase_2):
+            ShiftMaintenanceRecord.objects.create(phase=phase, shift_type=shift)
+        today = timezone.now().date()
+        TaskPlan.objects.create(date=today, status='pending')
+        TaskPlan.objects.create(date=today, status='completed')
+        TaskPlan.objects.create(status='in_progress')
+        self.user = User.objects.create_user(username='summary_user', password='pass')
+
+    def test_summary_counts(self):
+        from .stats_views import compute_dashboard_summary, SUMMARY_FIELDS
+        with self.assertNumQueries(4):
+            summary = compute_dashboard_summary(list(SUMMARY_FIELDS.keys()))
+        self.assertEqual(summary, {
+            'asset_count': 1,
+            'maintenance_record_count': 3,
+            'maintenance_record_count_phase1': 2,
+            'maintenance_record_count_phase2': 1,
+            'maintenance_manual_count': 0,
+            'today_tasks_count': 2,
+            'incomplete_tasks_count': 2,
+            'in_progress_tasks_count': 1,
+        })
+
+    def test_field_selection_and_cache(self):
+        response = self.client.get('/api/db/stats/summary/', {'fields': 'today_tasks_count,asset_count'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['summary'], {'today_tasks_count': 2, 'asset_count': 1})
+        self.assertFalse(data['cached'])
+
+        response = self.client.get('/api/db/stats/summary/', {'fields': 'asset_count,today_tasks_count'})
+        self.assertTrue(response.json()['cached'])
+
+        response = self.client.get('/api/db/stats/summary/', {'fields': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+
+class WeeklyStatsTest(TestCase):
+    """按天分组统计测试"""
+
+    def setUp(self):
+        from .models import PlantPhase, ShiftType
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        from .models_task_plan import TaskPlan
+
+        phase = PlantPhase.objects.create(code='phase_1', name='一期')
+        shift = ShiftType.objects.create(code='long_day_shift', name='长白班')
+        now = timezone.now()
+        for days_ago in (0, 0, 3, 40):
+            ShiftMaintenanceRecord.objects.create(
+                phase=phase, shift_type=shift, created_at=now - timedelta(days=days_ago)
+            )
+        TaskPlan.objects.create(date=now.date(), status='pending')
+        TaskPlan.objects.create(date=now.date(), status='completed')
+
+    def test_daily_series_fills_missing_days(self):
+        from .stats_series import daily_series
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        today = timezone.now().date()
+        with self.assertNumQueries(1):
+            series = daily_series(ShiftMaintenanceRecord.objects.all(), 'created_at', today - timedelta(days=89), 90)
+        self.assertEqual(len(series), 90)
+        self.assertEqual(series[-1], (today, 2))
+        self.assertEqual(series[-4], (today - timedelta(days=3), 1))
+        self.assertEqual(sum(count for _, count in series), 4)
+
+    def test_weekly_activity_stats_days_param(self):
+        from .stats_views import weekly_activity_stats
+        from django.test import RequestFactory
+        request = RequestFactory().get('/api/db/stats/weekly-activity-stats/', {'days': 30})
+        with self.assertNumQueries(3):
+            response = weekly_activity_stats(request)
+        data = json.loads(response.content)
+        self.assertEqual(data['days'], 30)
+        self.assertEqual(len(data['activity_stats']), 30)
+        today_stats = data['activity_stats'][-1]
+        self.assertEqual(today_stats['records_count'], 2)
+        self.assertEqual(today_stats['pending_tasks_count'], 1)
+
+    def test_weekly_visit_trends_is_read_only(self):
+        from .stats_views import weekly_visit_trends
+        from .models_activity import WeeklyVisitTrend
+        from django.test import RequestFactory
+        response = weekly_visit_trends(RequestFactory().get('/api/db/stats/weekly-trends/'))
+        self.assertEqual(len(json.loads(response.content)['trends']), 7)
+        self.assertFalse(WeeklyVisitTrend.objects.exists())
+
+
+class MaintenanceRollupTest(TestCase):
+    """维修记录日汇总测试"""
+
+    def setUp(self):
+        from .models import PlantPhase, ShiftType
+        self.phase = PlantPhase.objects.create(code='phase_1', name='一期')
+        self.shift = ShiftType.objects.create(code='long_day_shift', name='长白班')
+
+    def create_record(self, **kwargs):
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        return ShiftMaintenanceRecord.objects.create(phase=self.phase, shift_type=self.shift, **kwargs)
+
+    def rollup_rows(self):
+        from .models_rollup import ShiftMaintenanceDailyRollup
+        return list(ShiftMaintenanceDailyRollup.objects.order_by('production_line').values_list(
+            'production_line', 'process', 'record_count', 'total_duration'))
+
+    def test_signals_keep_rollup_in_sync(self):
+        now = timezone.now()
+        first = self.create_record(production_line='1-1#', process='成型',
+                                   start_datetime=now, end_datetime=now + timedelta(hours=2))
+        self.create_record(production_line='1-1#', process='成型')
+        self.assertEqual(self.rollup_rows(), [('1-1#', '成型', 2, 2.0)])
+
+        first.production_line = '1-2#'
+        first.save()
+        self.assertEqual(self.rollup_rows(), [('1-1#', '成型', 1, 0.0), ('1-2#', '成型', 1, 2.0)])
+
+        first.delete()
+        self.assertEqual(self.rollup_rows(), [('1-1#', '成型', 1, 0.0)])
+
+    def test_rebuild_matches_incremental(self):
+        from . import maintenance_rollup
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        self.create_record(production_line='1-1#', duration=1.5)
+        self.create_record(production_line='1-1#')
+        self.create_record(process='装配', change_reason='repair')
+        # 绕过信号的批量更新会让汇总表失准，重建后恢复一致
+        ShiftMaintenanceRecord.objects.filter(process='装配').update(production_line='1-3#')
+        expected = [('1-1#', '', 2, 1.5), ('1-3#', '装配', 1, 0.0)]
+
+        self.assertEqual(maintenance_rollup.rebuild(), 2)
+        self.assertEqual(self.rollup_rows(), expected)
+
+
+class RecordExportTest(TestCase):
+    """维修记录流式导出测试"""
+
+    def setUp(self):
+        from .models import PlantPhase, ShiftType
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        phase = PlantPhase.objects.create(code='phase_1', name='一期')
+        shift = ShiftType.objects.create(code='rotating_shift', name='倒班')
+        start = timezone.now().replace(second=0, microsecond=0)
+        for i in range(3):
+            ShiftMaintenanceRecord.objects.create(
+                phase=phase, shift_type=shift, production_line=f'1-{i}#', change_reason='repair',
+                start_datetime=start, end_datetime=start + timedelta(hours=1, minutes=5), remarks=None
+            )
+
+    def test_download_streams_xlsx(self):
+        from io import BytesIO
+        from openpyxl import load_workbook
+
+        response = self.client.post('/api/db/excel/download-records/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        ws = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        rows = list(ws.iter_rows(values_only=True))
+        self.assertEqual(ws.title, '维修记录')
+        self.assertEqual(rows[0][:3], ('期数', '班次类型', '月份'))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][0:2], ('一期', '倒班'))
+        self.assertEqual(rows[1][8], '维修')
+        self.assertEqual(rows[1][13], '1小时5分钟')
+        self.assertEqual({row[6] for row in rows[1:]}, {'1-0#', '1-1#', '1-2#'})
+
+    def test_csv_and_parquet_from_same_spec(self):
+        import pandas as pd
+        from io import BytesIO, StringIO
+
+        response = self.client.post('/api/db/excel/download-records/', {'format': 'csv'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        csv_frame = pd.read_csv(StringIO(text), keep_default_na=False)
+        self.assertEqual(list(csv_frame.columns[:2]), ['期数', '班次类型'])
+        self.assertEqual(list(csv_frame['耗用时长']), ['1小时5分钟'] * 3)
+
+        response = self.client.post('/api/db/excel/download-records/', {'format': 'parquet'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        parquet_frame = pd.read_parquet(BytesIO(b''.join(response.streaming_content)))
+        self.assertTrue(parquet_frame.equals(csv_frame.astype(str)))
+
+        response = self.client.post('/api/db/excel/download-records/', {'format': 'pdf'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskPlanExportTest(TestCase):
+    """任务计划导出测试"""
+
+    def test_assigned_users_loaded_per_batch(self):
+        from io import BytesIO
+        from django.contrib.auth.models import User
+        from openpyxl import load_workbook
+        from .models_task_plan import TaskPlan
+
+        users = [User.objects.create_user(username=f'worker{i}') for i in range(2)]
+        for i in range(3):
+            plan = TaskPlan.objects.create(task_description=f'任务{i}', status='in_progress', progress=50)
+            plan.assigned_users.set(users[:i])
+
+        # 任务计划本身 1 条查询，多对多关联 1 条查询
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/db/task-plan-excel/download-task-plans/', {}, content_type='application/json')
+            content = b''.join(response.streaming_content)
+        rows = list(load_workbook(BytesIO(content)).active.iter_rows(values_only=True))
+
+        self.assertEqual(rows[0][3], '任务实施人')
+        by_task = {row[2]: row for row in rows[1:]}
+        self.assertEqual(by_task['任务2'][3], 'worker0,worker1')
+        self.assertEqual(by_task['任务0'][3], None)
+        self.assertEqual(by_task['任务1'][5:7], ('进行中', '50.0'))
+
+
+class TaskPlanImportTest(TestCase):
+    """任务计划批量导入测试"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import PlantPhase, ProductionLine
+        self.users = [User.objects.create_user(username=f'worker{i}') for i in range(3)]
+        self.phase1 = PlantPhase.objects.create(code='phase_1', name='一期')
+        self.phase2 = PlantPhase.objects.create(code='phase_2', name='二期')
+        self.line1 = ProductionLine.objects.create(code='L1', name='1#', phase=self.phase1)
+        self.line2 = ProductionLine.objects.create(code='L2', name='1#', phase=self.phase2)
+
+    def rows(self, count):
+        from datetime import date
+        rows = [
+            (i + 2, {
+                '日期': date(2024, 1, i + 1), '任务计划': f'任务{i}', '任务实施人(用户名)': 'worker0, worker1,worker0',
+                '状态': 'in_progress', '完成进度(%)': 20, '期别': '二期', '工序': 'N1', '产线': '1#',
+            })
+            for i in range(count)
+        ]
+        rows.append((count + 2, {'日期': '2024-13-01', '任务计划': '错误日期', '任务实施人(用户名)': 'worker2'}))
+        rows.append((count + 3, {'日期': '2024-02-01', '任务计划': '无效用户', '任务实施人(用户名)': 'nobody'}))
+        return rows
+
+    def test_bulk_import_resolves_once(self):
+        from .models import Process
+        from .models_task_plan import TaskPlan
+        from .task_plan_import import import_task_plans
+
+        # 用户、期别、工序（含新建及配置版本递增）、产线各自的查询与写入，不随行数增长
+        with self.assertNumQueries(12):
+            results = import_task_plans(self.rows(20))
+
+        self.assertEqual(results['success_count'], 20)
+        self.assertEqual(results['errors'], [
+            '第22行日期格式错误: 2024-13-01', '第23行找不到用户: nobody', '第23行没有有效的用户',
+        ])
+        plans = TaskPlan.objects.all()
+        self.assertEqual(plans.count(), 20)
+        self.assertEqual({plan.planned_people_count for plan in plans}, {2})
+        plan = plans.get(task_description='任务3')
+        self.assertEqual(plan.production_line, self.line2)
+        self.assertEqual(plan.process, Process.objects.get(name='N1'))
+        self.assertEqual(sorted(plan.assigned_users.values_list('username', flat=True)), ['worker0', 'worker1'])
+
+    def test_upload_view(self):
+        from io import BytesIO
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from openpyxl import Workbook
+        from .task_plan_excel_handler import TASK_PLAN_REQUIRED_COLUMNS
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(TASK_PLAN_REQUIRED_COLUMNS)
+        ws.append(['2024-03-01', '设备保养', 'worker2', 'bad', None, '一期', None, '1#'])
+        buffer = BytesIO()
+        wb.save(buffer)
+        upload = SimpleUploadedFile('plans.xlsx', buffer.getvalue())
+
+        response = self.client.post('/api/db/task-plan-excel/upload-task-plans/', {'file': upload, 'background': 'false'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['success_count'], 1)
+        plan = self.users[2].taskplan_set.get()
+        self.assertEqual((plan.status, plan.planned_people_count, plan.production_line), ('pending', 1, self.line1))
+
+    def test_upload_view_rejects_non_excel(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .models_task_plan import TaskPlan
+
+        upload = SimpleUploadedFile('plans.csv', b'a,b\n1,2\n')
+        response = self.client.post('/api/db/task-plan-excel/upload-task-plans/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TaskPlan.objects.exists())
+
+
+class RecordImportTest(TestCase):
+    """维修记录批量导入测试"""
+
+    def setUp(self):
+        from .models import PlantPhase, ShiftType
+        PlantPhase.objects.create(code='phase_1', name='一期')
+        PlantPhase.objects.create(code='phase_2', name='二期')
+        ShiftType.objects.create(code='long_day_shift', name='长白班')
+        ShiftType.objects.create(code='rotating_shift', name='倒班')
+
+    def upload(self, rows, **data):
+        from io import BytesIO
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['期数', '班次类型', '设备名称', '变更原因', '开始日期及时间', '结束日期及时间'])
+        for row in rows:
+            ws.append(row)
+        buffer = BytesIO()
+        wb.save(buffer)
+        upload = SimpleUploadedFile('records.xlsx', buffer.getvalue())
+        return self.client.post('/api/db/excel/upload-records/', {'file': upload, **data})
+
+    def test_bulk_import_reserves_serials_and_reports_errors(self):
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        from .models_rollup import ShiftMaintenanceDailyRollup
+
+        rows = [
+            ['一期', '长白班', '设备A', '维修', '2024-05-01 08:00', '2024-05-01 10:30'],
+            ['', '', '设备B', None, None, None],
+            ['二期', '倒班', '设备C', 'repair', None, None],
+            ['三期', '倒班', '设备D', None, None, None],
+            ['一期', '白班', '设备E', None, 'not a date', None],
+            ['1期', '长白班', '设备F', None, None, None],
+        ]
+        response = self.upload(rows, phase='phase_2', shift_type='rotating_shift')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], '成功导入 4 条记录')
+        self.assertEqual(len(response.data['errors']), 2)
+        self.assertTrue(response.data['errors'][0].startswith('第5行缺少期数或班次类型信息'))
+        self.assertTrue(response.data['errors'][1].startswith('第6行处理失败'))
+
+        records = {r.equipment_name: r for r in ShiftMaintenanceRecord.objects.all()}
+        self.assertEqual(records['设备A'].serial_number, '1CB-000001')
+        self.assertEqual(records['设备F'].serial_number, '1CB-000002')
+        self.assertEqual(records['设备B'].serial_number, '2DB-000001')
+        self.assertEqual(records['设备C'].serial_number, '2DB-000002')
+        self.assertEqual(records['设备A'].duration, 2.5)
+        self.assertEqual(records['设备A'].change_reason, 'repair')
+        self.assertIsNone(records['设备B'].change_reason)
+        self.assertEqual(
+            sum(ShiftMaintenanceDailyRollup.objects.values_list('record_count', flat=True)), 4
+        )
+
+    def test_bulk_import_skips_manually_entered_serials(self):
+        from .models import PlantPhase, ShiftType
+        from .models_maintenance_new import SerialNumberSequence, ShiftMaintenanceRecord
+
+        SerialNumberSequence.objects.create(prefix='1CB-', last_number=1)
+        # 手工录入的序号在序号表之前
+        ShiftMaintenanceRecord.objects.create(
+            phase=PlantPhase.objects.get(code='phase_1'), shift_type=ShiftType.objects.get(code='long_day_shift'),
+            serial_number='1CB-000003', equipment_name='手工'
+        )
+        response = self.upload([['一期', '长白班', f'设备{i}', None, None, None] for i in range(3)])
+        self.assertEqual(response.data['message'], '成功导入 3 条记录')
+        self.assertEqual(
+            list(ShiftMaintenanceRecord.objects.exclude(equipment_name='手工')
+                 .order_by('serial_number').values_list('serial_number', flat=True)),
+            ['1CB-000002', '1CB-000004', '1CB-000005']
+        )
+
+    def test_bulk_import_reports_overlong_text_per_row(self):
+        from .models_maintenance_new import ShiftMaintenanceRecord
+
+        rows = [
+            ['一期', '长白班', '设备A', None, None, None],
+            ['一期', '长白班', '长' * 201, None, None, None],
+            ['一期', '长白班', '设备C', 'x' * 51, None, None],
+        ]
+        response = self.upload(rows)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], '成功导入 1 条记录')
+        self.assertEqual(response.data['errors'], [
+            '第3行处理失败: 设备名称超过最大长度200（201个字符）',
+            '第4行处理失败: 变更原因超过最大长度50（51个字符）',
+        ])
+        self.assertEqual(list(ShiftMaintenanceRecord.objects.values_list('equipment_name', flat=True)), ['设备A'])
+
+    def test_bulk_import_retries_rejected_batch_row_by_row(self):
+        from unittest import mock
+        from django.db import IntegrityError
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        from .models_rollup import ShiftMaintenanceDailyRollup
+
+        manager = ShiftMaintenanceRecord.objects
+        bulk_create = manager.bulk_create
+
+        def reject_bad_rows(records, **kwargs):
+            # 模拟数据库拒绝某一行（如严格模式下的超长或约束冲突），整批写入失败
+            if any(record.equipment_name == '坏' for record in records):
+                raise IntegrityError('constraint failed')
+            return bulk_create(records, **kwargs)
+
+        rows = [['一期', '长白班', name, None, None, None] for name in ('设备A', '坏', '设备C')]
+        with mock.patch.object(manager, 'bulk_create', side_effect=reject_bad_rows):
+            response = self.upload(rows)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], '成功导入 2 条记录')
+        self.assertEqual(response.data['errors'], ['第3行处理失败: constraint failed'])
+        self.assertEqual(
+            sorted(ShiftMaintenanceRecord.objects.values_list('equipment_name', flat=True)), ['设备A', '设备C']
+        )
+        self.assertEqual(sum(ShiftMaintenanceDailyRollup.objects.values_list('record_count', flat=True)), 2)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        counts = []
+        for size, shift in ((5, '长白班'), (30, '倒班')):
+            rows = [['一期', shift, f'设备{i}', None, None, None] for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.upload(rows)
+            self.assertEqual(response.data['message'], f'成功导入 {size} 条记录')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class SerialNumberSequenceTest(TestCase):
+    """维修记录序号表测试"""
+
+    def setUp(self):
+        from .models import PlantPhase, ShiftType
+        self.phase = PlantPhase.objects.create(code='phase_1', name='一期')
+        self.shift = ShiftType.objects.create(code='long_day_shift', name='长白班')
+
+    def test_sequence_seeds_from_existing_records(self):
+        from .models_maintenance_new import ShiftMaintenanceRecord, SerialNumberSequence
+        ShiftMaintenanceRecord.objects.create(phase=self.phase, shift_type=self.shift, serial_number='1CB-000041')
+
+        record = ShiftMaintenanceRecord.objects.create(phase=self.phase, shift_type=self.shift)
+        self.assertEqual(record.serial_number, '1CB-000042')
+        self.assertEqual(
+            ShiftMaintenanceRecord.reserve_serial_numbers('1CB-', 3),
+            ['1CB-000043', '1CB-000044', '1CB-000045']
+        )
+        # 只更新序号表一行，不再扫描维修记录
+        with self.assertNumQueries(4):
+            self.assertEqual(SerialNumberSequence.reserve('1CB-', 10), 46)
+        self.assertEqual(SerialNumberSequence.objects.get(prefix='1CB-').last_number, 55)
+
+    def test_reseed_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .models_maintenance_new import ShiftMaintenanceRecord, SerialNumberSequence
+        SerialNumberSequence.objects.create(prefix='1CB-', last_number=3)
+        ShiftMaintenanceRecord.objects.create(phase=self.phase, shift_type=self.shift, serial_number='1CB-000120')
+
+        call_command('reseed_serial_sequences', stdout=StringIO())
+        self.assertEqual(SerialNumberSequence.objects.get(prefix='1CB-').last_number, 120)
+
+
+class ImportJobTest(TestCase):
+    """后台导入任务测试"""
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from .models import PlantPhase, ShiftType
+        PlantPhase.objects.create(code='phase_1', name='一期')
+        ShiftType.objects.create(code='long_day_shift', name='长白班')
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def workbook(self, headers, rows):
+        from io import BytesIO
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(headers)
+        for row in rows:
+            ws.append(row)
+        buffer = BytesIO()
+        wb.save(buffer)
+        return SimpleUploadedFile('import.xlsx', buffer.getvalue())
+
+    def run_worker(self):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('run_import_worker', '--once', '--processes', '0', '--chunk-size', '2', stdout=StringIO())
+
+    def test_upload_returns_job_and_worker_imports_in_chunks(self):
+        from .models_import_job import ImportJob
+        from .models_maintenance_new import ShiftMaintenanceRecord
+
+        rows = [['一期', '长白班', f'设备{i}', None] for i in range(4)]
+        rows.append(['一期', '长白班', '设备X', 'not a date'])
+        upload = self.workbook(['期数', '班次类型', '设备名称', '开始日期及时间'], rows)
+        response = self.client.post('/api/db/excel/upload-records/', {'file': upload, 'background': 'true'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(ShiftMaintenanceRecord.objects.count(), 0)
+
+        job = ImportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, ImportJob.STATUS_PENDING)
+
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual((job.total_rows, job.processed_rows, job.imported_count, job.error_count), (5, 5, 4, 1))
+        self.assertTrue(job.errors[0].startswith('第6行处理失败'))
+        self.assertEqual(job.progress, 100.0)
+        self.assertEqual(
+            sorted(ShiftMaintenanceRecord.objects.values_list('serial_number', flat=True)),
+            [f'1CB-00000{i}' for i in range(1, 5)]
+        )
+
+    def test_status_endpoint_and_validation_failure(self):
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+        from .import_jobs import create_import_job
+        from .models_import_job import ImportJob
+
+        owner = User.objects.create_user(username='owner', password='pw')
+        other = User.objects.create_user(username='other', password='pw')
+        job = create_import_job('task_plans', self.workbook(['日期', '任务计划'], [['2024-01-01', '保养']]), user=owner)
+
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(job.message, '缺少必需列: 任务实施人(用户名)')
+
+        token, _ = Token.objects.get_or_create(user=owner)
+        response = self.client.get(f'/api/db/import-jobs/{job.uuid}/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'failed')
+
+        token, _ = Token.objects.get_or_create(user=other)
+        response = self.client.get(f'/api/db/import-jobs/{job.uuid}/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_asset_chunks_import_one_at_a_time_in_file_order(self):
+        from .import_jobs import ImportWorker, create_import_job
+        from .models import Asset
+        from .models_import_job import ImportJob
+
+        class SerialPool:
+            """在当前进程中执行，资产分块不允许并行提交"""
+
+            def apply(self, func, args):
+                return func(*args)
+
+            def apply_async(self, func, args):
+                raise AssertionError('资产分块不应并行导入')
+
+        headers = ['设备名称', '设备编号', '期别', '工序', '产线', '设备类型', '位置', '成本', '当前价值', '状态']
+        rows = [
+            ['设备A', 'NEW001', '一期', None, None, 'Equipment', None, 1, 1, 'Active'],
+            ['设备B', 'NEW002', '一期', None, None, 'Equipment', None, 1, 1, 'Active'],
+            ['设备A改', 'NEW001', '一期', None, None, 'Equipment', None, 2, 2, 'Active'],
+        ]
+        job = create_import_job('assets', self.workbook(headers, rows))
+
+        worker = ImportWorker(processes=2, chunk_size=2)
+        worker.pool = SerialPool()
+        worker.run_next()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual((job.processed_rows, job.imported_count, job.error_count), (3, 3, 0))
+        # 第二个分块更新第一个分块新增的设备，不会重复新增
+        self.assertEqual(Asset.objects.filter(ref='NEW001').count(), 1)
+        self.assertEqual(Asset.objects.get(ref='NEW001').name, '设备A改')
+
+
+class ImportJobConsumerTest(TestCase):
+    """导入任务进度 WebSocket 测试"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+        from .models import UserProfile
+        from .models_import_job import ImportJob
+        user = User.objects.create_user(username='watcher', password='pw')
+        UserProfile.objects.create(user=user, type='Operator')
+        self.token, _ = Token.objects.get_or_create(user=user)
+        self.job = ImportJob.objects.create(kind='assets', file='import_jobs/assets.xlsx', created_by=user)
+
+    async def test_connect_and_receive_progress(self):
+        # channels.testing.WebsocketCommunicator 依赖未安装的 daphne，直接使用其底层的 ApplicationCommunicator
+        from asgiref.testing import ApplicationCommunicator
+        from channels.db import database_sync_to_async
+        from backend.asgi import application
+        from .import_jobs import publish_progress
+        from .models_import_job import ImportJob
+
+        communicator = ApplicationCommunicator(application, {
+            'type': 'websocket',
+            'path': f'/ws/import-jobs/{self.job.uuid}/',
+            'query_string': f'token={self.token.key}'.encode(),
+            'headers': [(b'host', b'testserver'), (b'origin', b'http://testserver')],
+            'subprotocols': [],
+        })
+
+        async def receive_json():
+            message = await communicator.receive_output(5)
+            self.assertEqual(message['type'], 'websocket.send', message)
+            return json.loads(message['text'])
+
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual((await communicator.receive_output(5))['type'], 'websocket.accept')
+        self.assertEqual((await receive_json())['status'], ImportJob.STATUS_PENDING)
+
+        await database_sync_to_async(ImportJob.add_progress)(self.job.pk, 4, 3, ['第5行处理失败'])
+        await database_sync_to_async(publish_progress)(self.job.pk)
+        progress = await receive_json()
+        self.assertEqual((progress['processed_rows'], progress['imported_count']), (4, 3))
+
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(5)
+
+
+class AssetImportTest(TestCase):
+    """资产批量新增/更新测试"""
+
+    def setUp(self):
+        from decimal import Decimal
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+        from .models import Asset, PlantPhase, Process, ProductionLine
+        self.phase1 = PlantPhase.objects.create(code='phase_1', name='一期')
+        self.phase2 = PlantPhase.objects.create(code='phase_2', name='二期')
+        self.process = Process.objects.create(code='PL', name='PL')
+        self.line1 = ProductionLine.objects.create(code='L1', name='1#', phase=self.phase1)
+        self.line2 = ProductionLine.objects.create(code='L2', name='1#', phase=self.phase2)
+        self.kept = Asset.objects.create(
+            ref='EQP001', name='设备1', phase=self.phase1, process=self.process, production_line=self.line1,
+            asset_type='Equipment', location='车间A', cost=Decimal('100.00'), current_value=Decimal('90.00'), status='Active'
+        )
+        self.changed = Asset.objects.create(ref='EQP002', name='设备2', phase=self.phase1, cost=Decimal('5.00'))
+        user = User.objects.create_user(username='assets', password='pw')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def upload(self, rows):
+        from io import BytesIO
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['设备名称', '设备编号', '期别', '工序', '产线', '设备类型', '位置', '成本', '当前价值', '状态'])
+        for row in rows:
+            ws.append(row)
+        buffer = BytesIO()
+        wb.save(buffer)
+        upload = SimpleUploadedFile('assets.xlsx', buffer.getvalue())
+        return self.client.post('/api/db/asset-excel/upload-assets/', {'file': upload}, **self.auth)
+
+    def test_upsert_reports_diffs_and_skips_unchanged(self):
+        from .models import Asset
+        kept_updated_at = self.kept.last_updated_at
+
+        response = self.upload([
+            ['设备1', 'EQP001', '一期', 'PL', '1#', 'Equipment', '车间A', 100, 90, 'Active'],
+            ['设备2改', 'EQP002', '一期', None, None, 'Equipment', None, 5, 0, 'Active'],
+            ['设备3', 'EQP003', '2期', 'PL', '1#', 'IT', '车间B', 10, 8, 'Active'],
+            ['设备4', 'EQP004', '三期', None, None, 'Equipment', None, 0, 0, 'Active'],
+            ['设备5', None, '一期', None, None, 'Equipment', None, 0, 0, 'Active'],
+        ])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['unchanged']), (1, 1, 1))
+        self.assertEqual(response.data['errors'], ['第5行期别不存在: 三期', '第6行缺少设备编号'])
+        changes = {change['ref']: change for change in response.data['changes']}
+        self.assertEqual(changes['EQP003']['action'], 'created')
+        self.assertEqual(changes['EQP002']['changes']['设备名称'], ['设备2', '设备2改'])
+        self.assertNotIn('EQP001', changes)
+
+        self.assertEqual(Asset.objects.get(pk=self.kept.pk).last_updated_at, kept_updated_at)
+        self.assertEqual(Asset.objects.get(pk=self.changed.pk).name, '设备2改')
+        created = Asset.objects.get(ref='EQP003')
+        # 同名产线按所在期数匹配
+        self.assertEqual((created.phase_id, created.production_line_id), (self.phase2.id, self.line2.id))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        counts = []
+        for prefix, size in (('A', 5), ('B', 40)):
+            rows = [[f'设备{i}', f'{prefix}{i}', '一期', 'PL', '1#', 'Equipment', None, 1, 1, 'Active'] for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.upload(rows)
+            self.assertEqual(response.data['created'], size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ExcelReaderTest(TestCase):
+    """流式 Excel 读取测试"""
+
+    def workbook(self):
+        from datetime import datetime
+        from io import BytesIO
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['名称', None, '名称', '数量', '日期'])
+        for i in range(7):
+            ws.append([f'设备{i}', 'x', 'y', i if i != 3 else None, datetime(2024, 1, i + 1)])
+        ws.append([None] * 5)
+        ws.append(['设备7', None, None, 7, None])
+        ws.append([None] * 5)
+        ws.append([None] * 5)
+        wb.create_sheet('第二页').append(['a'])
+        buffer = BytesIO()
+        wb.save(buffer)
+        return buffer
+
+    def test_chunks_match_read_excel(self):
+        import pandas as pd
+        from .excel_reader import iter_excel_chunks
+
+        buffer = self.workbook()
+        chunks = list(iter_excel_chunks(buffer, chunk_size=4))
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 1])
+        expected = pd.read_excel(buffer)
+        self.assertEqual(list(chunks[0].columns), list(expected.columns))
+
+        def rows(frame):
+            return list(frame.astype(object).where(frame.notna(), None).itertuples(name=None))
+
+        self.assertEqual([row for chunk in chunks for row in rows(chunk)], rows(expected))
+
+    def test_preview_reads_only_requested_rows(self):
+        from .excel_reader import preview_sheet, sheet_names
+
+        buffer = self.workbook()
+        self.assertEqual(sheet_names(buffer), ['Sheet', '第二页'])
+        preview = preview_sheet(buffer, rows=2)
+        self.assertEqual(preview['columns'], ['名称', 'Unnamed: 1', '名称.1', '数量', '日期'])
+        self.assertEqual([row['名称'] for row in preview['data']], ['设备0', '设备1'])
+        self.assertEqual(preview['shape'][1], 5)
+        self.assertEqual(preview_sheet(buffer, '第二页')['data'], [])
+
+
+class TemplateCacheTest(TestCase):
+    """Excel 模板缓存与条件请求测试"""
+
+    url = '/api/db/asset-excel/download-template/'
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from rest_framework.authtoken.models import Token
+        from .template_cache import template_cache
+        cache.clear()
+        template_cache.clear()
+        user = User.objects.create_user(username='templates', password='pw')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def test_conditional_request_returns_304(self):
+        response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'PK'))
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_config_change_rerenders(self):
+        from unittest import mock
+        from . import asset_excel_views
+        from .models import PlantPhase
+
+        with mock.patch.object(asset_excel_views, 'build_asset_template', wraps=asset_excel_views.build_asset_template) as build:
+            first = self.client.get(self.url, **self.auth)
+            self.client.get(self.url, **self.auth)
+            self.assertEqual(build.call_count, 1)
+
+            PlantPhase.objects.create(code='phase_3', name='三期')
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'], **self.auth)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], first['ETag'])
+            self.assertEqual(build.call_count, 2)
+
+
+class QueryPlanTest(TestCase):
+    """
+    常用筛选的执行计划测试：每个查询都必须走索引，避免重构后退化为全表扫描
+    SQLite 检查 EXPLAIN QUERY PLAN 中没有对该表的 SCAN；PostgreSQL 关闭顺序扫描后检查没有 Seq Scan
+    """
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import PlantPhase, ShiftType
+        from .models_activity import UserActivity
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        from .models_task_plan import TaskPlan
+        self.phase = PlantPhase.objects.create(code='phase_1', name='一期')
+        self.shift = ShiftType.objects.create(code='rotating_shift', name='倒班')
+        user = User.objects.create_user(username='planner')
+        now = timezone.now()
+        for i in range(20):
+            ShiftMaintenanceRecord.objects.create(
+                phase=self.phase, shift_type=self.shift, production_line=f'{i % 3}#', process='PL',
+                start_datetime=now - timedelta(days=i), end_datetime=now - timedelta(days=i, hours=-1)
+            )
+            TaskPlan.objects.create(date=now.date() - timedelta(days=i % 5), status='pending')
+            UserActivity.objects.create(user=user, activity_type='login', timestamp=now - timedelta(hours=i))
+
+    def assertUsesIndex(self, queryset):
+        from django.db import connection
+        table = queryset.model._meta.db_table
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                self.assertNotIn(f'Seq Scan on {table}', plan, plan)
+                return
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+        full_scans = [line for line in plan.splitlines() if f'SCAN {table}' in line and 'INDEX' not in line]
+        self.assertEqual(full_scans, [], plan)
+        self.assertIn('INDEX', plan)
+
+    def test_maintenance_record_filters(self):
+        from .excel_views import filter_records_by_month
+        from .models_maintenance_new import ShiftMaintenanceRecord
+
+        records = ShiftMaintenanceRecord.objects.all()
+        now = timezone.now()
+        self.assertUsesIndex(records.filter(phase=self.phase, shift_type=self.shift).order_by('-created_at'))
+        self.assertUsesIndex(records.filter(phase=self.phase).order_by('-created_at'))
+        self.assertUsesIndex(records.filter(created_at__gte=now - timedelta(days=7), created_at__lt=now))
+        self.assertUsesIndex(filter_records_by_month(records, now.year, now.month))
+        self.assertUsesIndex(filter_records_by_month(records.filter(phase=self.phase, shift_type=self.shift), now.year, now.month))
+        self.assertUsesIndex(records.filter(production_line='1#').order_by('-created_at'))
+        self.assertUsesIndex(records.filter(process='PL').order_by('-created_at'))
+
+    def test_task_plan_and_activity_filters(self):
+        from django.db.models import Count
+        from .models_activity import UserActivity
+        from .models_task_plan import TaskPlan
+
+        today = timezone.now().date()
+        self.assertUsesIndex(TaskPlan.objects.filter(date=today))
+        self.assertUsesIndex(TaskPlan.objects.filter(date=today).values('status').annotate(count=Count('uuid')))
+        self.assertUsesIndex(TaskPlan.objects.filter(date__lt=today, status='pending'))
+        self.assertUsesIndex(TaskPlan.objects.filter(status__in=['pending', 'in_progress']))
+
+        since = timezone.now() - timedelta(minutes=15)
+        self.assertUsesIndex(UserActivity.objects.filter(timestamp__gte=since).values('user').distinct())
+        self.assertUsesIndex(UserActivity.objects.filter(timestamp__gte=since, timestamp__lt=timezone.now()))
+
+    def test_month_filter_matches_year_month_lookup(self):
+        from .excel_views import filter_records_by_month
+        from .models_maintenance_new import ShiftMaintenanceRecord
+
+        now = timezone.now()
+        records = ShiftMaintenanceRecord.objects.all()
+        expected = records.filter(
+            Q(start_datetime__year=now.year, start_datetime__month=now.month) |
+            Q(end_datetime__year=now.year, end_datetime__month=now.month)
+        )
+        self.assertEqual(set(filter_records_by_month(records, now.year, now.month)), set(expected))
+        with self.assertRaises(ValueError):
+            filter_records_by_month(records, now.year, 13)
+
+
+class SearchIndexTest(TestCase):
+    """二元组搜索索引测试"""
+
+    url = '/api/db/shift-maintenance-records/'
+
+    def setUp(self):
+        from .models import PlantPhase, ShiftType
+        from .models_maintenance_new import ShiftMaintenanceRecord
+        phase = PlantPhase.objects.create(code='phase_1', name='一期')
+        shift = ShiftType.objects.create(code='rotating_shift', name='倒班')
+        self.records = {
+            name: ShiftMaintenanceRecord.objects.create(
+                phase=phase, shift_type=shift, equipment_name=name, equipment_number=number,
+                before_change=before, after_change='已处理'
+            )
+            for name, number, before in [
+                ('卷绕机', 'EQ-001', '主轴轴承异响'),
+                ('分切机', 'EQ-002', '卷绕机联动时主轴温度过高'),
+                ('真空泵', 'EQ-003', '漏油'),
+            ]
+        }
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['equipment_name'] for row in response.data]
+
+    def test_matches_icontains_and_ranks_by_field_weight(self):
+        from .models_search import SearchTerm
+
+        self.assertTrue(SearchTerm.objects.filter(kind='shift_maintenance_record', term='卷绕').exists())
+        # 设备名称命中的权重高于变更前描述
+        self.assertEqual(self.search('卷绕机'), ['卷绕机', '分切机'])
+        self.assertEqual(self.search('主轴 温度'), ['分切机'])
+        self.assertEqual(self.search('eq-003'), ['真空泵'])
+        self.assertEqual(self.search('不存在'), [])
+        # 单个字符无法使用索引，退回 icontains
+        self.assertEqual(sorted(self.search('油')), ['真空泵'])
+        self.assertEqual(self.search('卷绕机', ordering='created_at'), ['卷绕机', '分切机'])
+
+    def test_index_follows_save_delete_and_rebuild(self):
+        from django.core.management import call_command
+        from .models_search import SearchTerm
+
+        record = self.records['真空泵']
+        record.before_change = '叶轮磨损'
+        record.save()
+        self.assertEqual(self.search('漏油'), [])
+        self.assertEqual(self.search('叶轮'), ['真空泵'])
+
+        record.delete()
+        self.assertFalse(SearchTerm.objects.filter(object_id=record.pk).exists())
+
+        SearchTerm.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        # 得分相同时按默认排序（创建时间倒序）
+        self.assertEqual(self.search('主轴'), ['分切机', '卷绕机'])
+
+
+class ConfigRegistryTest(TestCase):
+    """配置表进程内缓存测试"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+        from .config_registry import config_registry
+        from .models import PlantPhase, ProductionLine
+        self.registry = config_registry
+        self.phase = PlantPhase.objects.create(code='phase_1', name='一期')
+        self.line = ProductionLine.objects.create(code='1#', name='1#线', phase=self.phase)
+        user = User.objects.create_user(username='configs', password='pw')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def test_lookups_without_queries(self):
+        from .models import PlantPhase, ProductionLine, ShiftType
+        self.registry.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.registry.get_by_code(PlantPhase, 'phase_1').pk, self.phase.pk)
+            self.assertIsNone(self.registry.get_by_code(ShiftType, 'missing'))
+            self.assertEqual(self.registry.name(ProductionLine, self.line.pk), '1#线')
+            self.assertEqual(self.registry.get_by_id(ProductionLine, self.line.pk).phase_id, self.phase.pk)
+
+    def test_write_bumps_version(self):
+        from .models import ConfigVersion, PlantPhase
+        version = self.registry.version
+        PlantPhase.objects.create(code='phase_2', name='二期')
+        self.assertEqual(ConfigVersion.objects.get(pk=1).version, version + 1)
+        self.assertEqual(self.registry.version, version + 1)
+        self.assertEqual(self.registry.get_by_code(PlantPhase, 'phase_2').name, '二期')
+
+        self.phase.delete()
+        self.assertIsNone(self.registry.get_by_code(PlantPhase, 'phase_1'))
+
+    def test_other_process_change_seen_after_check_interval(self):
+        from django.test import override_settings
+        from .models import ConfigVersion, PlantPhase
+        self.registry.snapshot()
+        # 模拟其他进程的写入：只改数据库，不使本进程快照失效
+        PlantPhase.objects.filter(pk=self.phase.pk).update(name='第一期')
+        ConfigVersion.objects.filter(pk=1).update(version=self.registry.version + 1)
+        self.assertEqual(self.registry.name(PlantPhase, self.phase.pk), '一期')
+        with override_settings(CONFIG_REGISTRY_CHECK_INTERVAL=0):
+            self.assertEqual(self.registry.name(PlantPhase, self.phase.pk), '第一期')
+
+    def test_config_endpoint_etag(self):
+        response = self.client.get('/api/db/production-lines/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'id': self.line.pk, 'name': '1#线', 'code': '1#', 'phase': self.phase.pk}])
+
+        response = self.client.get('/api/db/production-lines/', HTTP_IF_NONE_MATCH=response['ETag'], **self.auth)
+        self.assertEqual(response.status_code, 304)
+
+        data = self.client.get('/api/maintenance/config/get-config-data/', **self.auth).json()
+        self.assertEqual(data['productionLines'][0]['phase_code'], 'phase_1')
+        self.assertEqual([phase['code'] for phase in data['phases']], ['phase_1'])
@@ -9,6 +9,7 @@ from . import excel_views
 from . import asset_excel_views
 from . import task_plan_excel_handler
 from . import views_advanced_management
+from . import import_job_views
 
 router = DefaultRouter()
 
@@ -53,6 +54,9 @@ urlpatterns = [
     path('task-plan-excel/download-template/', task_plan_excel_handler.download_task_plan_template, name='download-task-plan-template'),
     path('task-plan-excel/download-task-plans/', task_plan_excel_handler.download_filtered_task_plans, name='download-task-plans'),
     path('task-plan-excel/upload-task-plans/', task_plan_excel_handler.upload_task_plan_records, name='upload-task-plans'),
+    # 后台导入任务API
+    path('import-jobs/', import_job_views.list_import_jobs, name='list-import-jobs'),
+    path('import-jobs/<uuid:job_id>/', import_job_views.get_import_job, name='get-import-job'),
     # 高级管理API
     path('advanced-management/configurations/', views_advanced_management.get_all_configurations, name='get-all-configurations'),
     path('advanced-management/phases/', views_advanced_management.add_phase, name='add-phase'),
@@ -65,6 +69,7 @@ urlpatterns = [
     path('advanced-management/production-lines/<int:line_id>/', views_advanced_management.update_production_line, name='update-production-line'),
     path('advanced-management/production-lines/<int:line_id>/delete/', views_advanced_management.delete_production_line, name='delete-production-line'),
     # 统计API
+    path('stats/summary/', stats_views.dashboard_summary, name='stats-summary'),
     path('stats/active-users/', stats_views.active_users_count, name='stats-active-users'),
     path('stats/today-visits/', stats_views.today_visits_count, name='stats-today-visits'),
     path('stats/recent-activities/', stats_views.recent_activities, name='stats-recent-activities'),
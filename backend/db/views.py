@@ -4,8 +4,10 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Asset, Organization, UserProfile, MaintenancePlan, PlantPhase, Process, ProductionLine
+from .models import Asset, Organization, UserProfile, MaintenancePlan
 from .models_maintenance import MaintenanceRecord, MaintenanceManual, MaintenanceCase, MaintenanceStep
+from .search_index import BigramSearchFilter
+from .config_registry import config_response
 from rest_framework.viewsets import ModelViewSet
 from .serializers import (
     MaintenanceRecordSerializer, 
@@ -164,7 +166,8 @@ class MaintenanceStepViewSet(ModelViewSet):
 class MaintenanceCaseViewSet(viewsets.ModelViewSet):
     queryset = MaintenanceCase.objects.all()
     serializer_class = MaintenanceCaseSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # 搜索使用二元组索引，放在排序之后以便按得分排序
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, BigramSearchFilter]
     filterset_fields = ['process', 'equipment_name']
     search_fields = ['equipment_name', 'fault_reason', 'fault_phenomenon', 'fault_handling_method']
     ordering_fields = ['created_at', 'updated_at']
@@ -234,8 +237,7 @@ def get_phases(request):
     """
     获取所有期别列表，返回 id 和 name
     """
-    phases = PlantPhase.objects.all().values('id', 'name', 'code')
-    return Response(list(phases))
+    return config_response(request, 'phases')
 
 
 @api_view(['GET'])
@@ -244,8 +246,7 @@ def get_processes(request):
     """
     获取所有工序列表，返回 id 和 name
     """
-    processes = Process.objects.all().values('id', 'name', 'code')
-    return Response(list(processes))
+    return config_response(request, 'processes')
 
 
 @api_view(['GET'])
@@ -254,5 +255,4 @@ def get_production_lines(request):
     """
     获取所有产线列表，返回 id、name、code 和关联的期别信息
     """
-    production_lines = ProductionLine.objects.select_related('phase').all().values('id', 'name', 'code', 'phase')
-    return Response(list(production_lines))
\ No newline at end of file
+    return config_response(request, 'production_lines')
\ No newline at end of file
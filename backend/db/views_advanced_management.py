@@ -11,23 +11,15 @@ from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 
 from .models import PlantPhase, Process, ProductionLine
+from .config_registry import config_response
 
 
 @require_http_methods(["GET"])
 def get_all_configurations(request):
     """获取所有配置信息（期数、工序、产线）"""
     try:
-        phases = list(PlantPhase.objects.values('id', 'code', 'name'))
-        processes = list(Process.objects.values('id', 'code', 'name'))
-        production_lines = list(ProductionLine.objects.select_related('phase').values(
-            'id', 'code', 'name', 'phase_id', 'phase__name'
-        ))
-        
-        return JsonResponse({
-            'phases': phases,
-            'processes': processes,
-            'production_lines': production_lines
-        })
+        # 取自进程内配置缓存，带 ETag
+        return config_response(request, 'all_configurations')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -7,12 +7,16 @@ from django.db.models import Count
 from django.http import JsonResponse
 from db.models_maintenance_new import ShiftMaintenanceRecord
 from db.serializers_new import ShiftMaintenanceRecordSerializer
+from db.models import PlantPhase, ShiftType
+from db.search_index import BigramSearchFilter
+from db.config_registry import config_registry
 
 
 class ShiftMaintenanceRecordViewSet(viewsets.ModelViewSet):
     queryset = ShiftMaintenanceRecord.objects.all()
     serializer_class = ShiftMaintenanceRecordSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # 搜索使用二元组索引，放在排序之后以便按得分排序
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, BigramSearchFilter]
     filterset_fields = ['production_line', 'process', 'change_reason']
     search_fields = ['equipment_name', 'equipment_number', 'before_change', 'after_change']
     ordering_fields = ['created_at', 'start_datetime', 'end_datetime', 'duration']
@@ -23,26 +27,15 @@ class ShiftMaintenanceRecordViewSet(viewsets.ModelViewSet):
         phase_code = self.request.query_params.get('phase', None)
         shift_type_code = self.request.query_params.get('shift_type', None)
 
+        # 代码 -> 对象从进程内配置缓存查找，不访问数据库
         if phase_code:
-            from db.models import PlantPhase
-            try:
-                # 首先检查期数代码是否存在
-                phase_obj = PlantPhase.objects.get(code=phase_code)
-                queryset = queryset.filter(phase=phase_obj)
-            except PlantPhase.DoesNotExist:
-                # 如果期数不存在，则返回空查询集
-                from django.db.models import Q
-                queryset = queryset.filter(Q(pk__in=[]))  # 返回空查询集
+            phase_obj = config_registry.get_by_code(PlantPhase, phase_code)
+            # 期数不存在时返回空查询集
+            queryset = queryset.filter(phase=phase_obj) if phase_obj else queryset.none()
         if shift_type_code:
-            from db.models import ShiftType
-            try:
-                # 首先检查班次类型代码是否存在
-                shift_obj = ShiftType.objects.get(code=shift_type_code)
-                queryset = queryset.filter(shift_type=shift_obj)
-            except ShiftType.DoesNotExist:
-                # 如果班次类型不存在，则返回空查询集
-                from django.db.models import Q
-                queryset = queryset.filter(Q(pk__in=[]))  # 返回空查询集
+            shift_obj = config_registry.get_by_code(ShiftType, shift_type_code)
+            # 班次类型不存在时返回空查询集
+            queryset = queryset.filter(shift_type=shift_obj) if shift_obj else queryset.none()
 
         return queryset
 
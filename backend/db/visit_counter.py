@@ -0,0 +1,148 @@
+import os
+import math
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog 基数估算草图
+    默认精度 p=10，即 1024 个寄存器（1KB），标准误差约 3.25%
+    """
+
+    def __init__(self, precision=10, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """从数据库中保存的字节恢复草图"""
+        data = bytes(data or b'')
+        if not data:
+            return cls()
+        return cls(precision=int(math.log2(len(data))), registers=data)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        """加入一个访客标识"""
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        # 剩余位中第一个1出现的位置
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """按寄存器取最大值合并另一个草图"""
+        if other.size != self.size:
+            raise ValueError("HyperLogLog 精度不一致，无法合并")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def is_empty(self):
+        return not any(self.registers)
+
+    def count(self):
+        """估算独立元素个数"""
+        m = self.size
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        elif m == 64:
+            alpha = 0.709
+        elif m == 32:
+            alpha = 0.697
+        else:
+            alpha = 0.673
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # 小基数时使用线性计数修正
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+def current_shard():
+    """当前工作进程对应的分片编号"""
+    shards = getattr(settings, 'VISIT_COUNTER_SHARDS', 8)
+    return os.getpid() % shards
+
+
+def increment(day, count=1, sketch=None, shard=None):
+    """
+    原子地累加某天的访问次数，并合并访客草图
+
+    使用 F() 表达式在数据库端累加，分片行不存在时插入，插入冲突则退回累加
+    """
+    from .models_activity import VisitCounterShard
+
+    shard = current_shard() if shard is None else shard
+    with transaction.atomic():
+        updated = VisitCounterShard.objects.filter(date=day, shard=shard).update(
+            visit_count=F('visit_count') + count
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    VisitCounterShard.objects.create(
+                        date=day,
+                        shard=shard,
+                        visit_count=count,
+                        sketch=sketch.to_bytes() if sketch else None
+                    )
+                return
+            except IntegrityError:
+                # 其他进程刚刚创建了同一分片行
+                VisitCounterShard.objects.filter(date=day, shard=shard).update(
+                    visit_count=F('visit_count') + count
+                )
+
+        if sketch and not sketch.is_empty():
+            row = VisitCounterShard.objects.select_for_update().only('sketch').get(date=day, shard=shard)
+            merged = HyperLogLog.from_bytes(row.sketch).merge(sketch)
+            VisitCounterShard.objects.filter(pk=row.pk).update(sketch=merged.to_bytes())
+
+
+def get_daily_counts(start_date, end_date):
+    """
+    读取日期区间内每天的访问次数和独立访客数
+
+    访问次数 = WeeklyVisitTrend 中的历史基数 + 所有分片之和
+    独立访客数 = 合并各分片草图后的估算值（没有草图时使用历史基数）
+    返回 {date: {'visit_count': int, 'unique_visitors': int}}
+    """
+    from .models_activity import WeeklyVisitTrend, VisitCounterShard
+
+    counts = {}
+    for row in WeeklyVisitTrend.objects.filter(date__range=(start_date, end_date)).values(
+            'date', 'visit_count', 'unique_visitors'):
+        counts[row['date']] = {
+            'visit_count': row['visit_count'],
+            'unique_visitors': row['unique_visitors'],
+        }
+
+    sketches = {}
+    for day, visit_count, sketch in VisitCounterShard.objects.filter(
+            date__range=(start_date, end_date)).values_list('date', 'visit_count', 'sketch'):
+        entry = counts.setdefault(day, {'visit_count': 0, 'unique_visitors': 0})
+        entry['visit_count'] += visit_count
+        if sketch:
+            if day in sketches:
+                sketches[day].merge(HyperLogLog.from_bytes(sketch))
+            else:
+                sketches[day] = HyperLogLog.from_bytes(sketch)
+
+    for day, merged in sketches.items():
+        counts[day]['unique_visitors'] = merged.count()
+
+    return counts
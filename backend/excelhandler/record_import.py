@@ -0,0 +1,243 @@
+"""
+交接班记录表（维修记录）按列导入
+
+1. 按表头匹配列（忽略换行和空格），表头不可识别时沿用原来的固定列位置
+2. 空值填充、日期时间解析、变更原因归类都按列用 pandas 向量运算完成
+3. 已存在的记录号和设备编号各用一次查询预取为集合/字典
+4. 设备、维修记录、维修历史分别用一次 bulk_create 写入
+"""
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import MaintenanceRecord, Equipment, MaintenanceHistory
+
+logger = logging.getLogger(__name__)
+
+# 表头（去掉换行和空格后） -> 字段
+COLUMN_MAPPING = {
+    '序号': 'record_number',
+    '月份': 'month',
+    '产线': 'production_line',
+    '工序': 'process',
+    '设备或工装名称': 'equipment_name',
+    '设备编号': 'equipment_code',
+    '设备零部件/部位': 'equipment_part',
+    '变更原因': 'change_reason',
+    '变更前(现状）': 'status_before',
+    '变更后（变了什么）': 'status_after',
+    '开始日期及时间': 'start_datetime',
+    '结束日期及时间': 'end_datetime',
+    '耗用时长': 'duration',
+    '零件耗材': 'parts_consumables',
+    '实施人': 'implementer',
+    '确认人': 'confirm_person',
+    '验收人': 'acceptor',
+    '效果评价': 'effect_evaluation',
+    '评价人': 'evaluator',
+    '备注': 'remarks',
+}
+
+# 表头中没有“序号”列时使用的列位置（原逐行导入的固定位置）
+LEGACY_POSITIONS = {
+    'record_number': 1,
+    'month': 2,
+    'production_line': 2,
+    'process': 3,
+    'equipment_name': 4,
+    'equipment_code': 5,
+    'equipment_part': 6,
+    'change_reason': 7,
+    'status_before': 8,
+    'status_after': 9,
+    'start_datetime': 10,
+    'end_datetime': 11,
+    'parts_consumables': 14,
+    'implementer': 15,
+    'confirm_person': 16,
+    'acceptor': 17,
+    'effect_evaluation': 18,
+    'evaluator': 19,
+    'remarks': 20,
+}
+
+# 文本字段的空值默认值，None 表示保持为空
+TEXT_DEFAULTS = {
+    'month': '未知月份',
+    'production_line': '未知产线',
+    'process': '未知工序',
+    'equipment_name': '未知设备',
+    'equipment_part': '未知部件',
+    'status_before': '未知状态',
+    'status_after': '未知状态',
+    'parts_consumables': None,
+    'implementer': '未知实施人',
+    'confirm_person': None,
+    'acceptor': None,
+    'effect_evaluation': None,
+    'evaluator': None,
+    'remarks': None,
+}
+
+# 变更原因按关键字归类，依次匹配，都不匹配为“其他”
+CHANGE_REASON_RULES = [
+    ('故障', '故障维修'),
+    ('保养', '定期保养'),
+    ('改造', '设备改造'),
+    ('更换', '零件更换'),
+]
+
+# 表格标题行（序号列中出现时整行跳过）
+TITLE_ROWS = {'生产一分部倒班交接班记录表', '生产一分部长白班交接班记录表'}
+
+
+def normalize_header(header):
+    return re.sub(r'\s+', '', str(header))
+
+
+def map_columns(df):
+    """
+    返回 字段 -> 列（Series）
+    表头中能找到“序号”列时按表头匹配，否则按原固定列位置读取；都没有的字段为全空列
+    """
+    by_header = {}
+    for position, header in enumerate(df.columns):
+        field = COLUMN_MAPPING.get(normalize_header(header))
+        if field and field not in by_header:
+            by_header[field] = df.iloc[:, position]
+    if 'record_number' not in by_header:
+        by_header = {
+            field: df.iloc[:, position]
+            for field, position in LEGACY_POSITIONS.items() if position < len(df.columns)
+        }
+    empty = pd.Series(np.nan, index=df.index, dtype=object)
+    return {field: by_header.get(field, empty) for field in set(COLUMN_MAPPING.values())}
+
+
+def text(series, default):
+    """转为文本列，空值填充默认值"""
+    filled = series.astype(object).where(series.notna(), None)
+    result = filled.map(lambda value: value if value is None or isinstance(value, str) else str(value))
+    if default is not None:
+        result = result.where(result.notna(), default)
+    return result
+
+
+def classify_change_reason(series):
+    reason = series.where(series.notna(), '').astype(str)
+    return pd.Series(
+        np.select([reason.str.contains(keyword, regex=False) for keyword, _ in CHANGE_REASON_RULES],
+                  [label for _, label in CHANGE_REASON_RULES], default='其他'),
+        index=series.index
+    )
+
+
+def parse_datetime(series):
+    """字符串中的 'T' 视为日期和时间的分隔符，无法解析时为 NaT"""
+    values = series.map(lambda value: value.replace('T', ' ') if isinstance(value, str) else value)
+    return pd.to_datetime(values, errors='coerce')
+
+
+def saved_ids(objs, key_field, queryset):
+    """
+    取得刚批量写入的对象 id：数据库支持时 bulk_create 已回填主键，否则按键字段查询一次
+    返回 键 -> id
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return {getattr(obj, key_field): obj.pk for obj in objs}
+    keys = [getattr(obj, key_field) for obj in objs]
+    return dict(queryset.filter(**{f'{key_field}__in': keys}).values_list(key_field, 'id'))
+
+
+def import_maintenance_records_from_dataframe(df, excel_record, user):
+    """
+    从DataFrame导入维修记录，返回导入数量
+    序号为空的行、标题行和已存在的序号跳过；文件内重复的序号只导入第一行
+    """
+    columns = map_columns(df)
+
+    numbers = columns['record_number']
+    keep = numbers.notna() & ~numbers.astype(str).isin(list(TITLE_ROWS))
+    record_numbers = text(numbers, None)[keep]
+    record_numbers = record_numbers[~record_numbers.duplicated()]
+    if record_numbers.empty:
+        return 0
+
+    # 已存在的序号一次查询
+    existing_numbers = set(MaintenanceRecord.objects.filter(
+        record_number__in=list(record_numbers)
+    ).values_list('record_number', flat=True))
+    record_numbers = record_numbers[~record_numbers.isin(existing_numbers)]
+    if record_numbers.empty:
+        return 0
+    rows = record_numbers.index
+
+    values = {field: text(columns[field][rows], default) for field, default in TEXT_DEFAULTS.items()}
+    index_text = pd.Series(rows, index=rows).astype(str)
+    codes = text(columns['equipment_code'][rows], None)
+    codes = codes.where(codes.notna(), 'EQ' + index_text)
+    part_details = text(columns['equipment_part'][rows], None)
+    change_reasons = classify_change_reason(columns['change_reason'][rows])
+
+    # 开始时间缺失或无法解析时取当前时间，结束时间缺失时取开始时间
+    now = timezone.now()
+    start = parse_datetime(columns['start_datetime'][rows]).fillna(pd.Timestamp(now))
+    end = parse_datetime(columns['end_datetime'][rows])
+    end = end.where(end.notna(), start)
+    durations = (end - start).fillna(pd.Timedelta(0))
+
+    with transaction.atomic():
+        # 设备：已存在的编号一次查询，新编号按第一次出现的行创建
+        equipment_ids = dict(Equipment.objects.filter(
+            code__in=list(codes.unique())
+        ).values_list('code', 'id'))
+        new_codes = codes[~codes.isin(list(equipment_ids)) & ~codes.duplicated()]
+        new_equipment = [
+            Equipment(
+                code=code,
+                name=values['equipment_name'][index],
+                production_line=values['production_line'][index],
+                process=values['process'][index],
+                part_details=part_details[index],
+            )
+            for index, code in new_codes.items()
+        ]
+        Equipment.objects.bulk_create(new_equipment)
+        equipment_ids.update(saved_ids(new_equipment, 'code', Equipment.objects.all()))
+
+        records = [
+            MaintenanceRecord(
+                record_number=record_numbers[index],
+                equipment_code=codes[index],
+                change_reason=change_reasons[index],
+                start_datetime=start[index].to_pydatetime(),
+                end_datetime=end[index].to_pydatetime(),
+                duration=durations[index].to_pytimedelta(),
+                shift_type='其他',
+                created_by=user,
+                imported_from_excel=True,
+                excel_upload=excel_record,
+                **{field: series[index] for field, series in values.items()}
+            )
+            for index in rows
+        ]
+        MaintenanceRecord.objects.bulk_create(records)
+        record_ids = saved_ids(
+            records, 'record_number',
+            MaintenanceRecord.objects.filter(excel_upload=excel_record, imported_from_excel=True)
+        )
+
+        MaintenanceHistory.objects.bulk_create([
+            MaintenanceHistory(
+                equipment_id=equipment_ids[record.equipment_code],
+                maintenance_record_id=record_ids[record.record_number],
+            )
+            for record in records
+        ])
+
+    logger.info(f"导入维修记录 {len(records)} 条，新建设备 {len(new_equipment)} 台")
+    return len(records)
@@ -1,3 +1,114 @@
+from datetime import timedelta
+
+import pandas as pd
 from django.test import TestCase
 
-# Create your tests here.
+from .models import ExcelUpload, MaintenanceRecord, Equipment, MaintenanceHistory
+from .record_import import import_maintenance_records_from_dataframe
+
+
+class RecordImportTest(TestCase):
+    """交接班记录表按列导入测试"""
+
+    def setUp(self):
+        self.upload = ExcelUpload.objects.create(file='excel_files/test.xlsx', filename='test.xlsx')
+
+    def frame(self, rows):
+        headers = ['班次', '序号', '月份', '产线', '工序', '设备或工装\n名称', '设备编号', '设备零\n部件\n/部位',
+                   '变更\n原因', '开始日期\n及时间', '结束日期\n及时间', '实施人']
+        return pd.DataFrame(rows, columns=headers)
+
+    def test_header_mapping_and_bulk_insert(self):
+        Equipment.objects.create(code='EQ-1', name='已有设备', production_line='1#', process='PL')
+        MaintenanceRecord.objects.create(
+            record_number='1', month='5月', production_line='1#', process='PL', equipment_name='旧',
+            equipment_code='EQ-1', equipment_part='', change_reason='其他', status_before='', status_after='',
+            start_datetime='2024-05-01 08:00', end_datetime='2024-05-01 08:00', duration=timedelta(0),
+            implementer='张三', shift_type='其他'
+        )
+        df = self.frame([
+            [None, '生产一分部倒班交接班记录表', None, None, None, None, None, None, None, None, None, None],
+            ['白班', '1', '5月', '1#', 'PL', '设备A', 'EQ-1', '轴承', '设备故障', None, None, '张三'],
+            ['白班', '2', '5月', '1#', 'PL', '设备B', 'EQ-2', None, '季度保养', '2024-05-02T08:00', '2024-05-02 09:30', None],
+            ['白班', '3', '5月', '2#', 'N1', '设备C', 'EQ-2', None, '更换皮带', '2024-05-03 08:00', None, '李四'],
+            ['白班', '3', '5月', '2#', 'N1', '设备D', 'EQ-3', None, None, None, None, None],
+            ['白班', None, None, None, None, None, None, None, None, None, None, None],
+        ])
+
+        with self.assertNumQueries(7):
+            imported = import_maintenance_records_from_dataframe(df, self.upload, None)
+
+        self.assertEqual(imported, 2)
+        records = {r.record_number: r for r in MaintenanceRecord.objects.filter(excel_upload=self.upload)}
+        self.assertEqual(set(records), {'2', '3'})
+        self.assertEqual(records['2'].change_reason, '定期保养')
+        self.assertEqual(records['2'].month, '5月')
+        self.assertEqual(records['2'].duration, timedelta(hours=1, minutes=30))
+        self.assertEqual(records['2'].implementer, '未知实施人')
+        self.assertEqual(records['3'].change_reason, '零件更换')
+        self.assertEqual(records['3'].end_datetime, records['3'].start_datetime)
+
+        # 同一编号只创建一台设备，名称取第一次出现的行
+        self.assertEqual(Equipment.objects.get(code='EQ-2').name, '设备B')
+        self.assertEqual(
+            MaintenanceHistory.objects.filter(equipment__code='EQ-2').count(), 2
+        )
+
+
+class UploadExcelTest(TestCase):
+    """上传接口测试"""
+
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        from rest_framework.authtoken.models import Token
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        # 上传内容一律写入临时文件（TemporaryUploadedFile），与超过 FILE_UPLOAD_MAX_MEMORY_SIZE 的大文件一致
+        settings_override = override_settings(MEDIA_ROOT=media.name, FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        user = User.objects.create_user(username='uploader', password='pw')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def workbook(self):
+        from io import BytesIO
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['班次', '序号', '月份', '产线', '工序', '设备或工装\n名称', '设备编号', '实施人'])
+        for i in range(3):
+            ws.append(['白班', str(i + 1), '5月', '1#', 'PL', f'设备{i}', f'EQ-{i}', '张三'])
+        buffer = BytesIO()
+        wb.save(buffer)
+        return SimpleUploadedFile('records.xlsx', buffer.getvalue())
+
+    def test_upload_from_temporary_file(self):
+        response = self.client.post('/api/excel/upload/', {'file': self.workbook()}, **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['imported_count'], 3)
+        self.assertEqual(response.json()['total_rows'], 3)
+        upload = ExcelUpload.objects.get(pk=response.json()['record_id'])
+        self.assertEqual(MaintenanceRecord.objects.filter(excel_upload=upload).count(), 3)
+
+    def test_background_job_uses_saved_file(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from db.models_import_job import ImportJob
+
+        response = self.client.post('/api/excel/upload/', {'file': self.workbook(), 'background': 'true'}, **self.auth)
+        self.assertEqual(response.status_code, 202, response.content)
+        upload = ExcelUpload.objects.get(pk=response.json()['record_id'])
+        job = ImportJob.objects.get(pk=response.json()['job_id'])
+        # 任务引用上传记录已保存的文件，不再保存第二份
+        self.assertEqual(job.file.name, upload.file.name)
+        self.assertEqual(job.filename, 'records.xlsx')
+
+        call_command('run_import_worker', '--once', '--processes', '0', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual(MaintenanceRecord.objects.filter(excel_upload=upload).count(), 3)
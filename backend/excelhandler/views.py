@@ -8,6 +8,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import JSONParser
 from .models import ExcelUpload, MaintenanceRecord, Equipment, MaintenanceHistory
+from .record_import import import_maintenance_records_from_dataframe
+from db.excel_reader import iter_excel_chunks, preview_sheet, sheet_names
+from db.template_cache import template_response, workbook_bytes
+from db.import_jobs import wants_background, create_import_job, accepted_payload
 from django.core.files.base import ContentFile
 import os
 from django.contrib.auth.models import User
@@ -30,15 +34,6 @@ def upload_excel(request):
         return JsonResponse({'error': '只支持上传Excel文件(.xlsx, .xls)'}, status=400)
     
     try:
-        # 读取Excel文件
-        df = pd.read_excel(uploaded_file, sheet_name=0)  # 读取第一个工作表
-        
-        # 转换为字典列表
-        data = df.to_dict(orient='records')
-        
-        # 获取列名
-        columns = df.columns.tolist()
-        
         # 创建ExcelUpload记录
         excel_record = ExcelUpload.objects.create(
             file=uploaded_file,
@@ -46,13 +41,36 @@ def upload_excel(request):
             uploaded_by=request.user.username
         )
         
-        # 尝试导入维修记录数据
-        imported_count = import_maintenance_records_from_dataframe(df, excel_record, request.user)
+        # 大文件提交为后台导入任务，立即返回任务ID
+        if wants_background(request):
+            # 上传文件已随记录保存（大文件的临时文件已被移走），任务直接引用已保存的文件
+            job = create_import_job('excel_upload', excel_record.file, {
+                'excel_record_id': excel_record.id,
+                'user_id': request.user.id,
+            }, request.user, filename=uploaded_file.name)
+            return JsonResponse({
+                **accepted_payload(job),
+                'record_id': excel_record.id,
+                'filename': uploaded_file.name,
+            }, status=202)
+        
+        # 保存记录时大文件的临时文件已移入媒体存储，之后只能从已保存的文件读取
+        # 只预览第一个工作表的前若干行，导入时按块流式读取
+        with excel_record.file.open('rb') as source:
+            preview = preview_sheet(source)
+            data = preview['data']
+            columns = preview['columns']
+            
+            # 尝试导入维修记录数据
+            imported_count = 0
+            for df in iter_excel_chunks(source):
+                imported_count += import_maintenance_records_from_dataframe(df, excel_record, request.user)
         
         return JsonResponse({
             'message': f'文件上传成功，已导入 {imported_count} 条维修记录',
             'columns': columns,
             'data': data,
+            'total_rows': preview['shape'][0],
             'record_id': excel_record.id,
             'filename': uploaded_file.name,
             'imported_count': imported_count
@@ -62,207 +80,50 @@ def upload_excel(request):
         return JsonResponse({'error': f'处理Excel文件时出错: {str(e)}'}, status=500)
 
 
-def import_maintenance_records_from_dataframe(df, excel_record, user):
+def build_excel_template():
     """
-    从DataFrame导入维修记录
+    渲染交接班维修记录模板，返回 xlsx 字节内容
     """
-    imported_count = 0
+    import openpyxl
+    from openpyxl.styles import Font, Alignment
     
-    # 确定列映射（根据Excel文件分析结果）
-    column_mapping = {
-        '序号': 'record_number',
-        '月份': 'month',
-        '产线': 'production_line',
-        '工序': 'process',
-        '设备或工装\n名称': 'equipment_name',
-        '设备编号': 'equipment_code',
-        '设备零\n部件\n/部位': 'equipment_part',
-        '变更\n原因': 'change_reason',
-        '变更前(现状）': 'status_before',
-        '变更后（变了什么）': 'status_after',
-        '开始日期\n及时间': 'start_datetime',
-        '结束日期\n及时间': 'end_datetime',
-        '耗用\n时长': 'duration',
-        '零件耗材': 'parts_consumables',
-        '实施人': 'implementer',
-        '确认人': 'confirm_person',
-        '验收人': 'acceptor',
-        '效果评价': 'effect_evaluation',
-        '评价人': 'evaluator',
-        '备注': 'remarks',
-        'Unnamed: 1': 'shift_type',  # 根据分析结果，班次信息可能在其他列
-    }
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "维修记录模板"
     
-    for index, row in df.iterrows():
-        try:
-            # 跳过空行
-            if pd.isna(row.iloc[1]) and pd.isna(row.iloc[2]):  # 如果序号和月份都是空的，跳过
-                continue
-            
-            # 检查是否包含有效数据
-            if pd.isna(row.iloc[1]) or str(row.iloc[1]) == '生产一分部倒班交接班记录表' or str(row.iloc[1]) == '生产一分部长白班交接班记录表':
-                continue
-                
-            # 检查是否有序号
-            record_number = str(row.iloc[1]) if not pd.isna(row.iloc[1]) else f"R{index}"
-            
-            # 检查是否已存在相同记录号
-            if MaintenanceRecord.objects.filter(record_number=record_number).exists():
-                continue
-            
-            # 创建或获取设备
-            equipment_name = str(row.iloc[4]) if not pd.isna(row.iloc[4]) else "未知设备"
-            equipment_code = str(row.iloc[5]) if not pd.isna(row.iloc[5]) else f"EQ{index}"
-            
-            equipment, created = Equipment.objects.get_or_create(
-                code=equipment_code,
-                defaults={
-                    'name': equipment_name,
-                    'production_line': str(row.iloc[2]) if not pd.isna(row.iloc[2]) else "未知产线",
-                    'process': str(row.iloc[3]) if not pd.isna(row.iloc[3]) else "未知工序",
-                    'part_details': str(row.iloc[6]) if not pd.isna(row.iloc[6]) else None
-                }
-            )
-            
-            # 处理时间字段
-            start_time = row.iloc[10] if not pd.isna(row.iloc[10]) else None
-            end_time = row.iloc[11] if not pd.isna(row.iloc[11]) else None
-            
-            # 尝试解析时间
-            if start_time:
-                if isinstance(start_time, str):
-                    try:
-                        start_time = datetime.fromisoformat(start_time.replace('T', ' '))
-                    except:
-                        start_time = timezone.now()
-                elif pd.isna(start_time):
-                    start_time = timezone.now()
-            else:
-                start_time = timezone.now()
-                
-            if end_time:
-                if isinstance(end_time, str):
-                    try:
-                        end_time = datetime.fromisoformat(end_time.replace('T', ' '))
-                    except:
-                        end_time = start_time
-                elif pd.isna(end_time):
-                    end_time = start_time
-            else:
-                end_time = start_time
-            
-            # 处理变更原因
-            change_reason = str(row.iloc[7]) if not pd.isna(row.iloc[7]) else "其他"
-            # 简化变更原因以匹配预定义选项
-            if "故障" in change_reason:
-                change_reason = "故障维修"
-            elif "保养" in change_reason:
-                change_reason = "定期保养"
-            elif "改造" in change_reason:
-                change_reason = "设备改造"
-            elif "更换" in change_reason:
-                change_reason = "零件更换"
-            else:
-                change_reason = "其他"
-            
-            # 确定班次类型
-            shift_type = "其他"  # 默认值
-            # 这里可以根据具体业务逻辑来确定班次
-            
-            # 创建维修记录
-            maintenance_record = MaintenanceRecord.objects.create(
-                record_number=record_number,
-                month=str(row.iloc[2]) if not pd.isna(row.iloc[2]) else "未知月份",
-                production_line=str(row.iloc[2]) if not pd.isna(row.iloc[2]) else "未知产线",
-                process=str(row.iloc[3]) if not pd.isna(row.iloc[3]) else "未知工序",
-                equipment_name=equipment_name,
-                equipment_code=equipment_code,
-                equipment_part=str(row.iloc[6]) if not pd.isna(row.iloc[6]) else "未知部件",
-                change_reason=change_reason,
-                status_before=str(row.iloc[8]) if not pd.isna(row.iloc[8]) else "未知状态",
-                status_after=str(row.iloc[9]) if not pd.isna(row.iloc[9]) else "未知状态",
-                start_datetime=start_time,
-                end_datetime=end_time,
-                duration=None,  # 需要根据实际数据计算
-                parts_consumables=str(row.iloc[14]) if not pd.isna(row.iloc[14]) else None,
-                implementer=str(row.iloc[15]) if not pd.isna(row.iloc[15]) else "未知实施人",
-                confirm_person=str(row.iloc[16]) if not pd.isna(row.iloc[16]) else None,
-                acceptor=str(row.iloc[17]) if not pd.isna(row.iloc[17]) else None,
-                effect_evaluation=str(row.iloc[18]) if not pd.isna(row.iloc[18]) else None,
-                evaluator=str(row.iloc[19]) if not pd.isna(row.iloc[19]) else None,
-                remarks=str(row.iloc[20]) if not pd.isna(row.iloc[20]) else None,
-                shift_type=shift_type,
-                created_by=user,
-                imported_from_excel=True,
-                excel_upload=excel_record
-            )
-            
-            # 创建维修历史记录
-            MaintenanceHistory.objects.create(
-                equipment=equipment,
-                maintenance_record=maintenance_record
-            )
-            
-            imported_count += 1
-            
-        except Exception as e:
-            print(f"导入第 {index} 行时出错: {str(e)}")
-            continue
+    # 添加表头
+    headers = ["序号", "月份", "产线", "工序", "设备或工装\n名称", "设备编号", "设备零\n部件\n/部位", 
+              "变更\n原因", "变更前(现状）", "变更后（变了什么）", "开始日期\n及时间", "结束日期\n及时间", 
+              "耗用\n时长", "列1", "零件耗材", "实施人", "确认人", "验收人", "效果评价", "评价人", "备注"]
+    for col_num, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col_num, value=header)
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal="center")
     
-    return imported_count
+    # 调整列宽
+    for col in ws.columns:
+        max_length = 0
+        column = col[0].column_letter
+        for cell in col:
+            try:
+                if len(str(cell.value)) > max_length:
+                    max_length = len(str(cell.value))
+            except:
+                pass
+        adjusted_width = min(max_length + 2, 50)
+        ws.column_dimensions[column].width = adjusted_width
+    
+    return workbook_bytes(wb)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_excel_template(request):
     """
-    下载Excel模板
+    下载Excel模板（按配置版本缓存，支持 ETag/Last-Modified 条件请求）
     """
     try:
-        # 创建一个简单的Excel模板
-        import openpyxl
-        from openpyxl.styles import Font, Alignment
-        from django.http import HttpResponse
-        import io
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "维修记录模板"
-        
-        # 添加表头
-        headers = ["序号", "月份", "产线", "工序", "设备或工装\n名称", "设备编号", "设备零\n部件\n/部位", 
-                  "变更\n原因", "变更前(现状）", "变更后（变了什么）", "开始日期\n及时间", "结束日期\n及时间", 
-                  "耗用\n时长", "列1", "零件耗材", "实施人", "确认人", "验收人", "效果评价", "评价人", "备注"]
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center")
-        
-        # 调整列宽
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column].width = adjusted_width
-        
-        # 将工作簿保存到内存
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename=维修记录模板.xlsx'
-        return response
-        
+        return template_response(request, 'shift_handover', '维修记录模板.xlsx', build_excel_template)
     except Exception as e:
         return JsonResponse({'error': f'生成Excel模板时出错: {str(e)}'}, status=500)
 
@@ -333,20 +194,14 @@ def export_data_to_excel(request):
         return JsonResponse({'error': f'导出Excel文件时出错: {str(e)}'}, status=500)
 
 
-def read_excel_file(file_path):
+def read_excel_file(file_path, sheet_name=None, rows=None):
     """
     读取Excel文件的辅助函数
+    只读模式打开，每个工作表只读取前 rows 行预览；指定 sheet_name 时只读取该工作表
     """
     try:
-        df = pd.read_excel(file_path, sheet_name=None)  # 读取所有工作表
-        result = {}
-        for sheet_name, sheet_df in df.items():
-            result[sheet_name] = {
-                'columns': sheet_df.columns.tolist(),
-                'data': sheet_df.to_dict(orient='records'),
-                'shape': sheet_df.shape
-            }
-        return result
+        names = [sheet_name] if sheet_name else sheet_names(file_path)
+        return {name: preview_sheet(file_path, name, rows) for name in names}
     except Exception as e:
         raise Exception(f"读取Excel文件失败: {str(e)}")
 
@@ -361,8 +216,13 @@ def read_uploaded_excel(request, record_id):
         excel_record = ExcelUpload.objects.get(id=record_id)
         file_path = excel_record.file.path
         
-        # 使用pandas读取Excel文件
-        excel_data = read_excel_file(file_path)
+        # 预览工作表，可用 sheet 指定工作表、rows 指定行数
+        rows = request.GET.get('rows')
+        excel_data = read_excel_file(
+            file_path,
+            sheet_name=request.GET.get('sheet') or None,
+            rows=int(rows) if rows and rows.isdigit() else None
+        )
         
         return JsonResponse({
             'filename': excel_record.filename,
@@ -6,4 +6,6 @@ class MaintenanceConfig(AppConfig):
     name = 'maintenance'
 
     def ready(self):
-        import maintenance.signals
\ No newline at end of file
+        import maintenance.signals
+        # 维修记录变化时使维修统计缓存失效
+        import maintenance.statistics
@@ -7,6 +7,7 @@ from django.core.exceptions import ValidationError
 from django.db import transaction
 import json
 from db.models import PlantPhase, ProductionLine, Process, ShiftType
+from db.config_registry import config_response
 from django.contrib.auth import authenticate
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
@@ -25,53 +26,8 @@ def get_config_data(request):
     try:
         logger.info(f"收到获取配置数据请求，用户: {request.user}")
         
-        # 获取所有启用的期数
-        phases = PlantPhase.objects.filter(is_active=True).values('code', 'name', 'description')
-        logger.info(f"查询到期数: {list(phases)}")
-        
-        # 获取所有启用的产线，使用关联查询而不是循环查询
-        production_lines = ProductionLine.objects.filter(
-            is_active=True
-        ).select_related('phase').values(
-            'id', 'code', 'name', 'phase__code', 'description'
-        )
-        
-        # 转换产线数据格式
-        formatted_lines = []
-        for line in production_lines:
-            formatted_line = {
-                'id': line['id'],  # 添加ID字段
-                'code': line['code'],
-                'name': line['name'],
-                'phase_code': line['phase__code'],
-                'description': line['description']
-            }
-            formatted_lines.append(formatted_line)
-        
-        logger.info(f"查询到产线: {formatted_lines}")
-        
-        # 获取所有启用的工序
-        processes = Process.objects.filter(is_active=True).values('id', 'code', 'name', 'description')
-        logger.info(f"查询到工序: {list(processes)}")
-        
-        # 获取所有启用的班次类型
-        shift_types = ShiftType.objects.filter(is_active=True).values('id', 'code', 'name', 'description')
-        logger.info(f"查询到班次类型: {list(shift_types)}")
-        
-        # 获取所有启用的期数
-        phases_with_id = PlantPhase.objects.filter(is_active=True).values('id', 'code', 'name', 'description')
-        logger.info(f"查询到期数: {list(phases_with_id)}")
-        
-        response_data = {
-            'phases': list(phases_with_id),
-            'productionLines': formatted_lines,  # 驼峰命名，与前端期望一致
-            'processes': list(processes),
-            'shiftTypes': list(shift_types)      # 驸峰命名，与前端期望一致
-        }
-        
-        logger.info(f"返回数据: {response_data}")
-        
-        return Response(response_data)
+        # 期数、产线、工序、班次类型取自进程内配置缓存，内容预先序列化，带 ETag
+        return config_response(request, 'config_data')
     except Exception as e:
         logger.error(f"获取配置数据时出错: {str(e)}", exc_info=True)
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
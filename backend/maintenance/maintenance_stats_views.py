@@ -1,13 +1,81 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count, Q
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
-from datetime import timedelta, datetime
-from db.models_maintenance_new import ShiftMaintenanceRecord as MaintenanceRecord
+from datetime import timedelta, datetime, time
+from db.models_rollup import ShiftMaintenanceDailyRollup
 from db.models import PlantPhase, Process, ProductionLine
+from db.config_registry import config_registry
 import calendar
 
+# 时间周期对应的天数
+PERIOD_DAYS = {
+    'month': 30,
+    'quarter': 90,
+    'year': 365,
+}
+
+
+def get_rollup_queryset(request):
+    """
+    根据请求参数构建维修日汇总查询集
+    参数:
+    - phase_id: 期别代码 (可选)
+    - process_id: 工段ID (可选)
+    - production_line_id: 产线ID (可选)
+    - period: 时间周期 ('month', 'quarter', 'year') 默认为'month'
+    返回 (queryset, filters_applied)
+    汇总表中空的产线/工序保存为 ''，与原始记录中的 None 归为同一组（显示为“未知产线”/“未知工段”）
+    """
+    phase_id = request.GET.get('phase_id')
+    process_id = request.GET.get('process_id')
+    production_line_id = request.GET.get('production_line_id')
+    period = request.GET.get('period', 'month')
+    
+    # 转换ID参数为整数，如果转换失败则设为None
+    try:
+        process_id = int(process_id) if process_id else None
+    except (ValueError, TypeError):
+        process_id = None
+        
+    try:
+        production_line_id = int(production_line_id) if production_line_id else None
+    except (ValueError, TypeError):
+        production_line_id = None
+    
+    # 构建查询条件
+    query_filter = Q()
+    
+    if phase_id:
+        query_filter &= Q(phase__code=phase_id)
+    if process_id is not None:
+        # 汇总表的process字段保存工序名称，但前端传递的是ID，需要先获取名称
+        process_name = config_registry.name(Process, process_id)
+        if process_name is not None:
+            query_filter &= Q(process=process_name)
+        # 如果找不到对应的Process，就不添加这个过滤条件（相当于不过滤）
+    if production_line_id is not None:
+        # 汇总表的production_line字段保存产线名称，但前端传递的是ID，需要先获取名称
+        line_name = config_registry.name(ProductionLine, production_line_id)
+        if line_name is not None:
+            query_filter &= Q(production_line=line_name)
+    
+    # 根据时间周期确定日期范围（按天汇总，包含起始日全天）
+    end_date = timezone.now().date()
+    start_date = end_date - timedelta(days=PERIOD_DAYS.get(period, 30))
+    query_filter &= Q(date__range=[start_date, end_date])
+    
+    filters_applied = {
+        'phase_id': phase_id,
+        'process_id': process_id,
+        'production_line_id': production_line_id,
+        'period': period
+    }
+    return ShiftMaintenanceDailyRollup.objects.filter(query_filter), filters_applied
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_maintenance_rate_stats(request):
@@ -20,85 +88,24 @@ def get_maintenance_rate_stats(request):
     - period: 时间周期 ('month', 'quarter', 'year') 默认为'month'
     """
     try:
-        # 获取查询参数
-        phase_id = request.GET.get('phase_id')
-        process_id = request.GET.get('process_id')
-        production_line_id = request.GET.get('production_line_id')
-        period = request.GET.get('period', 'month')
-        
-        # 转换ID参数为整数，如果转换失败则设为None
-        try:
-            process_id = int(process_id) if process_id else None
-        except (ValueError, TypeError):
-            process_id = None
-            
-        try:
-            production_line_id = int(production_line_id) if production_line_id else None
-        except (ValueError, TypeError):
-            production_line_id = None
-        
-        # 导入模型类
-        from db.models import Process, ProductionLine
-        
-        # 构建查询条件
-        query_filter = Q()
-        
-        if phase_id:
-            query_filter &= Q(phase__code=phase_id)  # ShiftMaintenanceRecord通过外键关联PlantPhase，使用__code查询
-        if process_id is not None:
-            # ShiftMaintenanceRecord的process字段是字符串字段，但前端传递的是ID，需要先获取名称
-            try:
-                process_obj = Process.objects.get(id=process_id)
-                query_filter &= Q(process=process_obj.name)
-            except Process.DoesNotExist:
-                # 如果找不到对应的Process，就不添加这个过滤条件（相当于不过滤）
-                pass
-        if production_line_id is not None:
-            # ShiftMaintenanceRecord的production_line字段是字符串字段，但前端传递的是ID，需要先获取名称
-            try:
-                production_line_obj = ProductionLine.objects.get(id=production_line_id)
-                query_filter &= Q(production_line=production_line_obj.name)
-            except ProductionLine.DoesNotExist:
-                # 如果找不到对应的ProductionLine，就不添加这个过滤条件（相当于不过滤）
-                pass
-        
-        # 根据时间周期确定日期范围
-        end_date = timezone.now()
-        
-        if period == 'month':
-            start_date = end_date - timedelta(days=30)
-        elif period == 'quarter':
-            start_date = end_date - timedelta(days=90)
-        elif period == 'year':
-            start_date = end_date - timedelta(days=365)
-        else:
-            start_date = end_date - timedelta(days=30)  # 默认为月
-        
-        query_filter &= Q(created_at__range=[start_date, end_date])
-        
-        # 获取维修案例数据
-        maintenance_cases = MaintenanceRecord.objects.filter(query_filter)
+        # 从维修日汇总读取，图表只需扫描汇总行而非原始维修记录
+        rollups, filters_applied = get_rollup_queryset(request)
         
         # 统计维修记录数量
-        total_maintenance_count = maintenance_cases.count()
-        
-        from django.db.models import DateField
-        from django.db.models.functions import Cast, TruncDate
+        total_maintenance_count = rollups.aggregate(total=Sum('record_count'))['total'] or 0
         
         # 按日期分组统计（用于折线图）
-        daily_stats = maintenance_cases.annotate(
-            date=TruncDate('created_at')
-        ).values('date').annotate(
-            count=Count('pk')
+        daily_stats = rollups.values('date').annotate(
+            count=Sum('record_count')
         ).order_by('date')
         
-        # 获取相关的资产信息（用于分析不同工段和产线的维修率）
-        asset_stats = maintenance_cases.values(
-            'process',  # ShiftMaintenanceRecord直接有process字段
-            'production_line',  # ShiftMaintenanceRecord直接有production_line字段
-            'phase__name'  # ShiftMaintenanceRecord通过外键关联phase，使用__name获取名称
+        # 获取不同工段和产线的维修数量
+        asset_stats = rollups.values(
+            'process',
+            'production_line',
+            'phase__name'
         ).annotate(
-            count=Count('pk')
+            count=Sum('record_count')
         ).order_by('-count')
         
         # 准备图表数据
@@ -127,9 +134,9 @@ def get_maintenance_rate_stats(request):
             })
         
         # 获取可用的筛选选项
-        available_phases = PlantPhase.objects.filter(is_active=True).values('id', 'name', 'code')
-        available_processes = Process.objects.filter(is_active=True).values('id', 'name', 'code')
-        available_production_lines = ProductionLine.objects.filter(is_active=True).values('id', 'name', 'code')
+        available_phases = config_registry.values(PlantPhase, 'id', 'name', 'code', active_only=True)
+        available_processes = config_registry.values(Process, 'id', 'name', 'code', active_only=True)
+        available_production_lines = config_registry.values(ProductionLine, 'id', 'name', 'code', active_only=True)
         
         response_data = {
             'total_maintenance_count': total_maintenance_count,
@@ -140,12 +147,7 @@ def get_maintenance_rate_stats(request):
                 'processes': list(available_processes),
                 'production_lines': list(available_production_lines)
             },
-            'filters_applied': {
-                'phase_id': phase_id,
-                'process_id': process_id,
-                'production_line_id': production_line_id,
-                'period': period
-            }
+            'filters_applied': filters_applied
         }
         
         return Response(response_data)
@@ -166,77 +168,21 @@ def get_maintenance_by_line_process(request):
     - period: 时间周期 ('month', 'quarter', 'year') 默认为'month'
     """
     try:
-        # 获取查询参数
-        phase_id = request.GET.get('phase_id')
-        process_id = request.GET.get('process_id')
-        production_line_id = request.GET.get('production_line_id')
-        period = request.GET.get('period', 'month')  # 默认为月
-        
-        # 转换ID参数为整数，如果转换失败则设为None
-        try:
-            process_id = int(process_id) if process_id else None
-        except (ValueError, TypeError):
-            process_id = None
-            
-        try:
-            production_line_id = int(production_line_id) if production_line_id else None
-        except (ValueError, TypeError):
-            production_line_id = None
-        
-        # 导入模型类
-        from db.models import Process, ProductionLine
-        
-        # 构建查询条件
-        query_filter = Q()
-        
-        if phase_id:
-            query_filter &= Q(phase__code=phase_id)  # ShiftMaintenanceRecord通过外键关联PlantPhase，使用__code查询
-        if process_id is not None:
-            # ShiftMaintenanceRecord的process字段是字符串字段，但前端传递的是ID，需要先获取名称
-            try:
-                process_obj = Process.objects.get(id=process_id)
-                query_filter &= Q(process=process_obj.name)
-            except Process.DoesNotExist:
-                # 如果找不到对应的Process，就不添加这个过滤条件（相当于不过滤）
-                pass
-        if production_line_id is not None:
-            # ShiftMaintenanceRecord的production_line字段是字符串字段，但前端传递的是ID，需要先获取名称
-            try:
-                production_line_obj = ProductionLine.objects.get(id=production_line_id)
-                query_filter &= Q(production_line=production_line_obj.name)
-            except ProductionLine.DoesNotExist:
-                # 如果找不到对应的ProductionLine，就不添加这个过滤条件（相当于不过滤）
-                pass
-        
-        # 根据时间周期确定日期范围
-        end_date = timezone.now()
-        
-        if period == 'month':
-            start_date = end_date - timedelta(days=30)
-        elif period == 'quarter':
-            start_date = end_date - timedelta(days=90)
-        elif period == 'year':
-            start_date = end_date - timedelta(days=365)
-        else:
-            start_date = end_date - timedelta(days=30)  # 默认为月
-        
-        query_filter &= Q(created_at__range=[start_date, end_date])
-        
-        # 获取维修记录数据
-        maintenance_cases = MaintenanceRecord.objects.filter(query_filter)
+        # 从维修日汇总读取
+        rollups, filters_applied = get_rollup_queryset(request)
         
         # 按产线分组统计维修数量
-        production_line_stats = maintenance_cases.values(
+        production_line_stats = rollups.values(
             'production_line'
         ).annotate(
-            count=Count('pk')
+            count=Sum('record_count')
         ).order_by('-count')
         
         # 按工序(工段)分组统计维修数量
-        process_stats = maintenance_cases.values(
+        process_stats = rollups.values(
             'process'
         ).annotate(
-            count=Count('pk')
+            count=Sum('record_count')
         ).order_by('-count')
         
         # 准备产线数据
@@ -258,12 +204,7 @@ def get_maintenance_by_line_process(request):
         response_data = {
             'production_line_stats': production_line_data,
             'process_stats': process_data,
-            'filters_applied': {
-                'phase_id': phase_id,
-                'process_id': process_id,
-                'production_line_id': production_line_id,
-                'period': period
-            }
+            'filters_applied': filters_applied
         }
         
         return Response(response_data)
@@ -277,101 +218,39 @@ def get_maintenance_by_line_process(request):
 def get_maintenance_trends(request):
     """
     获取维修趋势数据，用于显示更详细的趋势分析
+    period 为 'month' 时按天统计，其他值（包括未知值）在对应时间范围内按月统计，
+    按月统计的时间段格式与按创建时间截断到月份时一致（'YYYY-MM-01 00:00:00'）
     """
     try:
-        phase_id = request.GET.get('phase_id')
-        process_id = request.GET.get('process_id')
-        production_line_id = request.GET.get('production_line_id')
         period = request.GET.get('period', 'month')
         
-        # 转换ID参数为整数，如果转换失败则设为None
-        try:
-            process_id = int(process_id) if process_id else None
-        except (ValueError, TypeError):
-            process_id = None
-            
-        try:
-            production_line_id = int(production_line_id) if production_line_id else None
-        except (ValueError, TypeError):
-            production_line_id = None
-        
-        # 导入模型类
-        from db.models import Process, ProductionLine
-        
-        # 构建查询条件
-        query_filter = Q()
-        
-        if phase_id:
-            query_filter &= Q(phase__code=phase_id)  # ShiftMaintenanceRecord通过外键关联PlantPhase，使用__code查询
-        if process_id is not None:
-            # ShiftMaintenanceRecord的process字段是字符串字段，但前端传递的是ID，需要先获取名称
-            try:
-                process_obj = Process.objects.get(id=process_id)
-                query_filter &= Q(process=process_obj.name)
-            except Process.DoesNotExist:
-                # 如果找不到对应的Process，就不添加这个过滤条件（相当于不过滤）
-                pass
-        if production_line_id is not None:
-            # ShiftMaintenanceRecord的production_line字段是字符串字段，但前端传递的是ID，需要先获取名称
-            try:
-                production_line_obj = ProductionLine.objects.get(id=production_line_id)
-                query_filter &= Q(production_line=production_line_obj.name)
-            except ProductionLine.DoesNotExist:
-                # 如果找不到对应的ProductionLine，就不添加这个过滤条件（相当于不过滤）
-                pass
+        # 从维修日汇总读取
+        rollups, filters_applied = get_rollup_queryset(request)
         
-        # 根据时间周期确定日期范围
-        end_date = timezone.now()
-        
-        if period == 'month':
-            start_date = end_date - timedelta(days=30)
-            # 按天统计
-            date_format = '%Y-%m-%d'
-        elif period == 'quarter':
-            start_date = end_date - timedelta(days=90)
-            # 按周统计
-            date_format = 'W%U'
-        elif period == 'year':
-            start_date = end_date - timedelta(days=365)
-            # 按月统计
-            date_format = '%Y-%m'
-        else:
-            start_date = end_date - timedelta(days=30)
-            date_format = '%Y-%m-%d'
-        
-        query_filter &= Q(created_at__range=[start_date, end_date])
-        
-        # 获取数据并按时间段分组
-        maintenance_cases = MaintenanceRecord.objects.filter(query_filter)
-        
-        from django.db.models.functions import TruncDate, TruncMonth
-        import calendar
-        
-        if period == 'month':
-            trend_data = maintenance_cases.annotate(
-                time_period=TruncDate('created_at')
-            ).values('time_period').annotate(
-                count=Count('pk')
-            ).order_by('time_period')
-        elif period == 'quarter':
-            # 按季度统计 - 这里我们按月聚合，然后在前端处理季度显示
-            trend_data = maintenance_cases.annotate(
-                time_period=TruncMonth('created_at')
+        monthly = period != 'month'
+        if monthly:
+            # 季度和年度按月聚合，季度显示在前端处理
+            trend_data = rollups.annotate(
+                time_period=TruncMonth('date')
             ).values('time_period').annotate(
-                count=Count('pk')
+                count=Sum('record_count')
             ).order_by('time_period')
-        else:  # year
-            trend_data = maintenance_cases.annotate(
-                time_period=TruncMonth('created_at')
-            ).values('time_period').annotate(
-                count=Count('pk')
+        else:
+            # 按天统计
+            trend_data = rollups.values(
+                time_period=F('date')
+            ).annotate(
+                count=Sum('record_count')
             ).order_by('time_period')
         
         # 转换数据格式
         chart_data = []
         for item in trend_data:
+            time_period = item['time_period']
+            if monthly:
+                time_period = datetime.combine(time_period, time.min)
             chart_data.append({
-                'period': str(item['time_period']),
+                'period': str(time_period),
                 'count': item['count']
             })
         
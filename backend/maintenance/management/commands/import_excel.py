@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 import os
 from ...utils import import_maintenance_records_from_excel
+from db.import_jobs import create_import_job_from_path
 
 
 class Command(BaseCommand):
@@ -13,6 +14,8 @@ class Command(BaseCommand):
                           help='班次类型: long_day_shift 或 rotating_shift')
         parser.add_argument('--plant-phase', type=str, choices=['phase_1', 'phase_2'], 
                           help='工厂分期: phase_1 或 phase_2')
+        parser.add_argument('--background', action='store_true',
+                          help='提交为后台导入任务，由 run_import_worker 处理')
 
     def handle(self, *args, **options):
         file_path = options['file']
@@ -69,6 +72,16 @@ class Command(BaseCommand):
         self.stdout.write(f'班次类型: {shift_type}')
         self.stdout.write(f'工厂分期: {plant_phase}')
 
+        if options['background']:
+            job = create_import_job_from_path('maintenance_excel', file_path, {
+                'shift_type': shift_type,
+                'plant_phase': plant_phase,
+            })
+            self.stdout.write(
+                self.style.SUCCESS(f'已提交后台导入任务: {job.uuid}')
+            )
+            return
+
         result = import_maintenance_records_from_excel(file_path, shift_type, plant_phase)
 
         if result['success']:
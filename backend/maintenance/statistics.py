@@ -0,0 +1,109 @@
+"""
+维修统计服务
+
+1. 总数、一期/二期数量、按月份、按产线的分布由一次分组聚合 (期数, 月份, 产线) 得到
+2. 不同设备数量由一次聚合得到（与原 values().distinct().count() 一致，空设备名计为一种）
+3. 结果按统计范围和版本号缓存，维修记录保存/删除或批量导入的事务提交后递增版本号
+版本号保存在数据库（StatisticsVersion）中，每次读取统计时查询一次：
+缓存为各进程独立的本地内存缓存时，任一进程的写入也会使所有进程的统计缓存失效
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from db.models import StatisticsVersion
+from db.models_maintenance_new import ShiftMaintenanceRecord as MaintenanceRecord
+
+logger = logging.getLogger(__name__)
+
+# 全部记录的统计范围
+ALL_SCOPE = (None, None)
+
+
+def get_cache_timeout():
+    return getattr(settings, 'MAINTENANCE_STATS_CACHE_TIMEOUT', 300)
+
+
+def statistics_version():
+    """数据库中的统计版本号，版本行不存在时为 1"""
+    version = StatisticsVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return version or 1
+
+
+def bump_statistics_version():
+    updated = StatisticsVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+    if not updated:
+        StatisticsVersion.objects.get_or_create(pk=1, defaults={'version': 2})
+
+
+def invalidate_statistics():
+    """
+    维修记录变化后调用，所有统计范围的缓存同时失效
+    版本号在事务提交后才递增：提交前其他请求只能读到旧数据，若此时递增，旧数据会被缓存到新版本下
+    """
+    transaction.on_commit(bump_statistics_version)
+
+
+def compute_statistics(phase_code=None, shift_type_code=None):
+    """
+    按统计范围（期数代码、班次代码，None 表示不限）计算维修统计
+    """
+    records = MaintenanceRecord.objects.all()
+    if phase_code:
+        records = records.filter(phase__code=phase_code)
+    if shift_type_code:
+        records = records.filter(shift_type__code=shift_type_code)
+
+    groups = records.order_by().values('phase__code', 'month', 'production_line').annotate(count=Count('pk'))
+
+    total_records = 0
+    phase_counts = {}
+    monthly_stats = {}
+    production_line_stats = {}
+    for group in groups:
+        count = group['count']
+        total_records += count
+        phase_counts[group['phase__code']] = phase_counts.get(group['phase__code'], 0) + count
+        month_key = f"{group['month']}月"
+        monthly_stats[month_key] = monthly_stats.get(month_key, 0) + count
+        line = group['production_line']
+        production_line_stats[line] = production_line_stats.get(line, 0) + count
+
+    equipment = records.aggregate(
+        named=Count('equipment_name', distinct=True),
+        unnamed=Count('pk', filter=Q(equipment_name__isnull=True)),
+    )
+
+    return {
+        'total_records': total_records,
+        'phase_1_count': phase_counts.get('phase_1', 0),
+        'phase_2_count': phase_counts.get('phase_2', 0),
+        'unique_equipment_count': equipment['named'] + (1 if equipment['unnamed'] else 0),
+        'monthly_stats': monthly_stats,
+        'production_line_stats': production_line_stats,
+    }
+
+
+def get_statistics(scope=ALL_SCOPE):
+    """返回统计范围 (期数代码, 班次代码) 的统计结果，优先读取缓存"""
+    cache_key = f"maintenance_statistics:{statistics_version()}:{scope[0] or '*'}:{scope[1] or '*'}"
+    statistics = cache.get(cache_key)
+    if statistics is None:
+        statistics = compute_statistics(*scope)
+        cache.set(cache_key, statistics, get_cache_timeout())
+    return statistics
+
+
+@receiver(post_save, sender=MaintenanceRecord)
+@receiver(post_delete, sender=MaintenanceRecord)
+def invalidate_statistics_on_change(sender, **kwargs):
+    try:
+        invalidate_statistics()
+    except Exception as e:
+        logger.warning(f"无法刷新维修统计缓存: {str(e)}")
@@ -1,3 +1,184 @@
 from django.test import TestCase
 
 # Create your tests here.
+
+
+class MaintenanceStatisticsTest(TestCase):
+    """维修统计聚合与缓存测试"""
+
+    url = '/api/maintenance/statistics/'
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from rest_framework.authtoken.models import Token
+        from db.models import PlantPhase, ShiftType
+        from db.models_maintenance_new import ShiftMaintenanceRecord
+        cache.clear()
+        phase_1 = PlantPhase.objects.create(code='phase_1', name='一期')
+        phase_2 = PlantPhase.objects.create(code='phase_2', name='二期')
+        self.long_day = ShiftType.objects.create(code='long_day_shift', name='长白班')
+        rotating = ShiftType.objects.create(code='rotating_shift', name='倒班')
+        for phase, shift, month, line, equipment in [
+            (phase_1, self.long_day, '1', '1#', '卷绕机'),
+            (phase_1, self.long_day, '1', '2#', '卷绕机'),
+            (phase_1, rotating, '2', '1#', None),
+            (phase_2, rotating, '3', None, '分切机'),
+        ]:
+            ShiftMaintenanceRecord.objects.create(
+                phase=phase, shift_type=shift, month=month, production_line=line, equipment_name=equipment
+            )
+        self.user = User.objects.create_user(username='stats', password='pw')
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def test_aggregated_statistics(self):
+        response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_records'], 4)
+        self.assertEqual((data['phase_1_count'], data['phase_2_count']), (3, 1))
+        # 与原 values('equipment_name').distinct().count() 一致，空设备名计为一种
+        self.assertEqual(data['unique_equipment_count'], 3)
+        self.assertEqual(data['monthly_stats'], {'1月': 2, '2月': 1, '3月': 1})
+        self.assertEqual(data['production_line_stats'], {'1#': 2, '2#': 1, 'null': 1})
+
+        # 用户范围只统计该用户的期数和班次
+        profile = self.user.userprofileextension
+        profile.plant_phase, profile.shift_type = 'phase_1', 'long_day_shift'
+        profile.save()
+        data = self.client.get(self.url, {'scope': 'user'}, **self.auth).json()
+        self.assertEqual((data['total_records'], data['unique_equipment_count']), (2, 1))
+
+    def test_cached_until_records_change(self):
+        from db.models import PlantPhase
+        from maintenance.statistics import statistics_version
+        from db.models_maintenance_new import ShiftMaintenanceRecord
+
+        self.client.get(self.url, **self.auth)
+        with self.assertNumQueries(2):  # 认证查询和版本号查询
+            response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.json()['total_records'], 4)
+
+        phase_2 = PlantPhase.objects.get(code='phase_2')
+        version = statistics_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            ShiftMaintenanceRecord.objects.create(phase=phase_2, shift_type=self.long_day, month='4')
+            # 提交前版本号不变，其他请求不会把未提交前的结果缓存到新版本下
+            self.assertEqual(statistics_version(), version)
+        data = self.client.get(self.url, **self.auth).json()
+        self.assertEqual((data['total_records'], data['phase_2_count']), (5, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ShiftMaintenanceRecord.objects.filter(month='4').delete()
+        self.assertEqual(self.client.get(self.url, **self.auth).json()['total_records'], 4)
+
+    def test_write_from_another_process_invalidates(self):
+        from django.db.models import F
+        from db.models import PlantPhase, StatisticsVersion
+        from db.models_maintenance_new import ShiftMaintenanceRecord
+
+        self.assertEqual(self.client.get(self.url, **self.auth).json()['total_records'], 4)
+
+        # 模拟另一个进程：写入记录并递增数据库版本号，本进程的缓存中没有任何失效标记
+        ShiftMaintenanceRecord.objects.bulk_create([ShiftMaintenanceRecord(
+            phase=PlantPhase.objects.get(code='phase_2'), shift_type=self.long_day, month='4'
+        )])
+        StatisticsVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        self.assertEqual(self.client.get(self.url, **self.auth).json()['total_records'], 5)
+
+
+class MaintenanceStatsViewsTest(TestCase):
+    """维修统计图表接口（读取维修日汇总）与原始记录聚合结果一致"""
+
+    def setUp(self):
+        from datetime import datetime, time, timedelta
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+        from db import maintenance_rollup
+        from db.models import PlantPhase, Process, ShiftType
+        from db.models_maintenance_new import ShiftMaintenanceRecord
+
+        phase_1 = PlantPhase.objects.create(code='phase_1', name='一期')
+        phase_2 = PlantPhase.objects.create(code='phase_2', name='二期')
+        shift = ShiftType.objects.create(code='long_day_shift', name='长白班')
+        self.process = Process.objects.create(code='N1', name='成型')
+        today = datetime.combine(datetime.now().date(), time(12))
+        for days_ago, phase, line, process in [
+            (1, phase_1, '1#', '成型'), (1, phase_1, '1#', '成型'), (3, phase_2, None, '成型'),
+            (10, phase_1, '2#', None), (45, phase_1, '1#', '装配'), (45, phase_2, None, None),
+            (200, phase_1, '2#', '成型'), (400, phase_1, '1#', '成型'),
+        ]:
+            record = ShiftMaintenanceRecord.objects.create(
+                phase=phase, shift_type=shift, production_line=line, process=process
+            )
+            ShiftMaintenanceRecord.objects.filter(pk=record.pk).update(created_at=today - timedelta(days=days_ago))
+        # 绕过信号修改了创建时间，重建汇总
+        maintenance_rollup.rebuild()
+
+        user = User.objects.create_user(username='charts', password='pw')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def get(self, name, **params):
+        response = self.client.get(f'/api/maintenance/{name}/', params, **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def raw_records(self, days, **filters):
+        from datetime import timedelta
+        from django.utils import timezone
+        from db.models_maintenance_new import ShiftMaintenanceRecord
+        end = timezone.now()
+        return ShiftMaintenanceRecord.objects.filter(created_at__range=[end - timedelta(days=days), end], **filters)
+
+    @staticmethod
+    def grouped(records, *fields):
+        from django.db.models import Count
+        return records.values(*fields).annotate(count=Count('pk'))
+
+    def test_rate_stats_match_raw_records(self):
+        from django.db.models.functions import TruncDate
+
+        for period, days in (('month', 30), ('quarter', 90), ('year', 365)):
+            data = self.get('maintenance-rate-stats', period=period)
+            records = self.raw_records(days)
+            self.assertEqual(data['total_maintenance_count'], records.count())
+            self.assertEqual(data['line_chart_data'], [
+                {'date': row['date'].strftime('%Y-%m-%d'), 'count': row['count']}
+                for row in self.grouped(records.annotate(date=TruncDate('created_at')), 'date').order_by('date')
+            ])
+            self.assertCountEqual(data['bar_chart_data'], [
+                {'process': row['process'] or '未知工段', 'production_line': row['production_line'] or '未知产线',
+                 'phase': row['phase__name'], 'count': row['count']}
+                for row in self.grouped(records, 'process', 'production_line', 'phase__name')
+            ])
+
+        data = self.get('maintenance-rate-stats', period='year', phase_id='phase_1', process_id=self.process.id)
+        self.assertEqual(data['total_maintenance_count'], self.raw_records(365, phase__code='phase_1', process='成型').count())
+
+    def test_line_process_stats_match_raw_records(self):
+        data = self.get('maintenance-by-line-process', period='quarter')
+        records = self.raw_records(90)
+        self.assertCountEqual(data['production_line_stats'], [
+            {'name': row['production_line'] or '未知产线', 'count': row['count']}
+            for row in self.grouped(records, 'production_line')
+        ])
+        self.assertCountEqual(data['process_stats'], [
+            {'name': row['process'] or '未知工段', 'count': row['count']}
+            for row in self.grouped(records, 'process')
+        ])
+
+    def test_trends_match_raw_records(self):
+        from django.db.models.functions import TruncDate, TruncMonth
+
+        # 未知的 period 与原实现一致：最近30天按月统计
+        for period, days, trunc in (
+            ('month', 30, TruncDate), ('quarter', 90, TruncMonth), ('year', 365, TruncMonth), ('week', 30, TruncMonth),
+        ):
+            data = self.get('maintenance-trends', period=period)
+            records = self.raw_records(days).annotate(time_period=trunc('created_at'))
+            self.assertEqual(data, {'period': period, 'trend_data': [
+                {'period': str(row['time_period']), 'count': row['count']}
+                for row in self.grouped(records, 'time_period').order_by('time_period')
+            ]})
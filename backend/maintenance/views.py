@@ -8,6 +8,7 @@ from datetime import datetime
 import logging
 
 from .models import UserProfileExtension
+from . import statistics
 # 使用绝对导入代替相对导入
 from db.models_maintenance_new import ShiftMaintenanceRecord as MaintenanceRecord
 # 注释掉未定义的EquipmentMaintenanceLibrary导入，以解决启动问题
@@ -261,56 +262,14 @@ def get_user_permissions(request):
 def get_maintenance_statistics(request):
     """
     获取维修统计信息
+    默认返回全部数据的统计（包括一期和二期的独立统计）；
+    ?scope=user 且用户设置了工厂分期和班次时只统计该用户范围内的记录
+    结果按统计范围缓存，维修记录变化后失效
     """
-    user = request.user
-    user_profile = getattr(user, 'userprofileextension', None)
-    
-    # 不管用户权限如何，都需要返回全部数据的统计（包括一期和二期的独立统计）
-    all_records = MaintenanceRecord.objects.all()
-    
-    # 分别计算一期和二期的记录数
-    phase_1_records = MaintenanceRecord.objects.filter(phase__code='phase_1')
-    phase_2_records = MaintenanceRecord.objects.filter(phase__code='phase_2')
-    
-    total_records = all_records.count()
-    phase_1_count = phase_1_records.count()
-    phase_2_count = phase_2_records.count()
-    
-    # 如果用户有特定权限，则只获取该用户的记录
-    if user_profile:
-        user_specific_records = MaintenanceRecord.objects.filter(
-            shift_type__code=user_profile.shift_type,
-            phase__code=user_profile.plant_phase
-        )
-        # 如果用户有特定权限，我们仍然返回全局统计，但在某些情况下也可以考虑返回用户特定的统计
-        # 但现在按照需求，返回整体统计
-    else:
-        user_specific_records = all_records
-    
-    # 计算其他统计数据
-    records_by_equipment = all_records.values('equipment_name').distinct().count()
-    
-    # 按月统计
-    monthly_stats = {}
-    for record in all_records:
-        month_key = f"{getattr(record, 'month', '未知')}月"
-        if month_key not in monthly_stats:
-            monthly_stats[month_key] = 0
-        monthly_stats[month_key] += 1
-    
-    # 按产线统计
-    production_line_stats = {}
-    for record in all_records:
-        line = getattr(record, 'production_line', '未知产线')
-        if line not in production_line_stats:
-            production_line_stats[line] = 0
-        production_line_stats[line] += 1
-    
-    return Response({
-        'total_records': total_records,
-        'phase_1_count': phase_1_count,
-        'phase_2_count': phase_2_count,
-        'unique_equipment_count': records_by_equipment,
-        'monthly_stats': monthly_stats,
-        'production_line_stats': production_line_stats
-    })
\ No newline at end of file
+    scope = statistics.ALL_SCOPE
+    if request.GET.get('scope') == 'user':
+        user_profile = getattr(request.user, 'userprofileextension', None)
+        if user_profile:
+            scope = (user_profile.plant_phase, user_profile.shift_type)
+
+    return Response(statistics.get_statistics(scope))
\ No newline at end of file
@@ -1,30 +1,126 @@
-from django.contrib.auth.models import AnonymousUser
+import copy
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
-from db.models import UserProfile
+from db.models import UserProfile, Organization
 from apiv1.serializers import UserProfileSerializer
-@database_sync_to_async
-def get_user(token_key):
+
+
+class TokenProfileCache:
+    """
+    token -> 序列化后的用户资料 的有界 TTL 缓存（LRU 淘汰）
+    断线重连时避免每次握手都查询 Token/UserProfile 并重新序列化
+    token 删除、用户资料或用户保存时显式失效
+    """
+
+    def __init__(self, max_size=None, timeout=None):
+        self._max_size = max_size
+        self._timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return self._max_size or getattr(settings, 'WS_TOKEN_CACHE_SIZE', 1000)
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else getattr(settings, 'WS_TOKEN_CACHE_TIMEOUT', 300)
+
+    def get(self, token_key):
+        with self._lock:
+            entry = self._entries.get(token_key)
+            if entry is None:
+                return None
+            expires_at, user_id, profile = entry
+            if expires_at < time.monotonic():
+                del self._entries[token_key]
+                return None
+            self._entries.move_to_end(token_key)
+            return copy.deepcopy(profile)
+
+    def set(self, token_key, user_id, profile):
+        with self._lock:
+            self._entries[token_key] = (time.monotonic() + self.timeout, user_id, profile)
+            self._entries.move_to_end(token_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_token(self, token_key):
+        with self._lock:
+            self._entries.pop(token_key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token_key in [k for k, entry in self._entries.items() if entry[1] == user_id]:
+                del self._entries[token_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局缓存实例
+token_profile_cache = TokenProfileCache()
+
+
+def load_user(token_key):
+    cached = token_profile_cache.get(token_key)
+    if cached is not None:
+        return cached
     try:
-        token = Token.objects.get(key=token_key)
-        profile = UserProfile.objects.get(user=token.user)
-        user_profile = UserProfileSerializer(profile)
-        return user_profile.data
-    except Token.DoesNotExist:
+        token = Token.objects.select_related('user').get(key=token_key)
+        profile = UserProfile.objects.select_related('organization', 'user').get(user=token.user)
+    except (Token.DoesNotExist, UserProfile.DoesNotExist):
         return None
+    user_profile = UserProfileSerializer(profile)
+    data = user_profile.data
+    token_profile_cache.set(token_key, token.user_id, data)
+    return copy.deepcopy(data)
+
+
+@database_sync_to_async
+def get_user(token_key):
+    return load_user(token_key)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_profile_cache.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=User)
+def invalidate_user_profile(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    token_profile_cache.invalidate_user(user_id)
+
+
+@receiver(post_save, sender=Organization)
+def invalidate_organization(sender, instance, **kwargs):
+    # 组织信息嵌套在序列化结果中，组织很少修改，直接清空
+    token_profile_cache.clear()
+
 
 class TokenAuthMiddleware(BaseMiddleware):
     def __init__(self, inner):
         super().__init__(inner)
 
     async def __call__(self, scope, receive, send):
-        try:
-            token_key = (dict((x.split('=') for x in scope['query_string'].decode().split("&")))).get('token', None)
-            machine = (dict((x.split('=') for x in scope['query_string'].decode().split("&")))).get('machine', None)
-        except ValueError:
-            token_key = None
-            machine = None
+        # 查询字符串只解析一次，并做 URL 解码
+        params = dict(parse_qsl(scope.get('query_string', b'').decode()))
+        token_key = params.get('token') or None
+        machine = params.get('machine')
         scope['user'] = None if token_key is None else await get_user(token_key)
         scope['machine'] = None if token_key is None else machine
-        return await super().__call__(scope, receive, send)
\ No newline at end of file
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,52 @@
+"""
+设备数据异步 WebSocket 消费者基类
+
+不依赖具体的事件模型：子类通过 build_payload 提供推送内容（state.consumers 中的设备/报表/OEE 消费者）
+"""
+from abc import ABC, abstractmethod
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .broadcast import snapshot_broadcaster
+
+
+class AsyncMachineDataConsumer(AsyncWebsocketConsumer, ABC):
+    """
+    异步消费者基类：连接数受事件循环限制而不是线程池
+    每条推送的数据库查询和序列化通过 database_sync_to_async 一次性在线程池中完成
+    子类设置 group_prefix 并实现 build_payload
+    """
+    group_prefix = None
+
+    @abstractmethod
+    def build_payload(self, initial):
+        """返回推送的 JSON 文本，initial 表示是否为连接时的首次推送（在线程池中调用）"""
+
+    async def connect(self):
+        if self.scope['user'] == None:
+            await self.close(code = 1011)
+            return
+        self.room_group_name = self.group_prefix + self.scope['user']['organization']['uuid'] + '_' + self.scope['machine']
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await self.accept()
+        await self.send(text_data=await database_sync_to_async(self.build_payload)(True))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+
+    async def receive(self, text_data):
+        # 推送数据只与设备有关：由发起方计算一次，群组成员直接转发同一份 JSON 文本
+        await snapshot_broadcaster.publish(
+            self.channel_layer,
+            self.room_group_name,
+            lambda: self.build_payload(False)
+        )
+
+    async def snapshot_message(self, event):
+        await self.send(text_data=event['text'])
+
+    async def push(self, event):
+        # 兼容旧的 data_message/report_message/oee_message 群组消息：各成员自行计算
+        await self.send(text_data=await database_sync_to_async(self.build_payload)(False))
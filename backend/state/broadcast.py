@@ -0,0 +1,85 @@
+"""
+设备群组消息的一次计算广播
+
+群组收到更新时，只由发起方计算一次推送数据并序列化为 JSON 文本，
+再把同一份文本群发给所有成员，成员直接转发，不再各自查询和计算。
+同一群组的更新间隔小于 WS_SNAPSHOT_MIN_INTERVAL 时合并为一次（在间隔结束时发送最新快照）。
+"""
+import asyncio
+import logging
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 成员消费者处理快照消息的 handler 名称
+SNAPSHOT_MESSAGE_TYPE = 'snapshot_message'
+
+
+class SnapshotBroadcaster:
+    """按群组合并更新并群发预序列化的快照（每个进程一个实例）"""
+
+    def __init__(self, min_interval=None):
+        self._min_interval = min_interval
+        self._last_sent = {}
+        self._pending = {}
+        self._pruned_at = float('-inf')
+        self.built_count = 0
+
+    @property
+    def min_interval(self):
+        if self._min_interval is not None:
+            return self._min_interval
+        return getattr(settings, 'WS_SNAPSHOT_MIN_INTERVAL', 1.0)
+
+    async def publish(self, channel_layer, group, build_payload):
+        """
+        为群组发布一次更新
+        build_payload 为同步函数，返回 JSON 文本，在线程池中执行
+        返回 False 表示本次更新已合并到待发送的快照中
+        """
+        wait = self._last_sent.get(group, float('-inf')) + self.min_interval - time.monotonic()
+        if wait <= 0:
+            await self._send(channel_layer, group, build_payload)
+            return True
+
+        if group not in self._pending:
+            self._pending[group] = asyncio.ensure_future(
+                self._send_later(channel_layer, group, build_payload, wait)
+            )
+        return False
+
+    async def _send_later(self, channel_layer, group, build_payload, delay):
+        try:
+            await asyncio.sleep(delay)
+            await self._send(channel_layer, group, build_payload)
+        except Exception as e:
+            logger.warning(f"无法发送群组快照 {group}: {str(e)}")
+        finally:
+            self._pending.pop(group, None)
+
+    def _prune(self, now):
+        """
+        删除已超过最小间隔的群组发送时间（与没有记录等价），避免长期运行的进程中字典无限增长
+        每个间隔最多清理一次
+        """
+        if now - self._pruned_at < self.min_interval:
+            return
+        self._pruned_at = now
+        expired = now - self.min_interval
+        for group in [group for group, sent_at in self._last_sent.items() if sent_at <= expired]:
+            del self._last_sent[group]
+
+    async def _send(self, channel_layer, group, build_payload):
+        now = time.monotonic()
+        self._prune(now)
+        self._last_sent[group] = now
+        text = await database_sync_to_async(build_payload)()
+        self.built_count += 1
+        await channel_layer.group_send(group, {"type": SNAPSHOT_MESSAGE_TYPE, "text": text})
+
+
+# 全局广播器实例
+snapshot_broadcaster = SnapshotBroadcaster()
@@ -9,6 +9,8 @@ import logging
 from uuid import UUID
 import django.utils.timezone as timezone
 from .util import calculate_oee
+from . import oee_engine
+from .async_consumer import AsyncMachineDataConsumer
 
 
 class UUIDEncoder(json.JSONEncoder):
@@ -18,23 +20,67 @@ class UUIDEncoder(json.JSONEncoder):
             return obj.hex
         return json.JSONEncoder.default(self, obj)
     
+# OEE 计算只需要的事件字段
+OEE_EVENT_FIELDS = ('state', 'created_at', 'quantity', 'scrap', 'product__ideal_cycle')
+
 def get_oee_grap_data(scope):
+    """
+    最近24小时的逐小时 OEE
+    整个时间段只查询一次（只取计算所需字段），在内存中分桶；已结束小时的结果按设备缓存
+    """
+    organization = scope['user']['organization']['uuid']
+    machine = scope['machine']
 
-    list_oees = []
-    try:
-        for i in range(24):
-            t_2 = timezone.now() - timezone.timedelta(hours= 23 - i)
-            t_1 = timezone.now() - timezone.timedelta(hours= 24 - i)
-            all_events=Event.objects.filter(machine__organization__uuid=scope['user']['organization']['uuid'],\
-                                    machine__uuid = scope['machine'], created_at__gte=t_1,\
+    def fetch_events(t_1, t_2):
+        return Event.objects.filter(machine__organization__uuid=organization,\
+                                    machine__uuid=machine, created_at__gte=t_1,\
                                     created_at__lte=t_2).\
-            select_related('machine__organization','machine','cell','fault','product','machine__created_by').order_by('created_at')
-            oee_last_24h = calculate_oee(all_events,t_1,t_2,t_2)
-            list_oees.append(oee_last_24h)
-        return list_oees
-    except :
+            order_by('created_at').values(*OEE_EVENT_FIELDS)
+
+    try:
+        return oee_engine.cached_hourly_series(f"oee_hour:{organization}:{machine}", fetch_events)
+    except Exception as e:
+        logging.warning(f"无法计算OEE曲线数据: {str(e)}")
         return []
 
+def get_last_events(scope, count):
+    return Event.objects.filter(machine__uuid=scope['machine'],\
+                                machine__organization__uuid=scope['user']['organization']['uuid'],\
+                                is_filled=False).\
+        select_related('machine__organization','machine','cell','fault','product','machine__created_by')\
+        .order_by('-created_at')[:count][::-1]
+
+def get_window_oee(scope, hours):
+    t_2 = timezone.now()
+    t_1 = t_2 - timezone.timedelta(hours=hours)
+    all_events=Event.objects.filter(machine__organization__uuid=scope['user']['organization']['uuid'],\
+                                machine__uuid = scope['machine'], created_at__gte=t_1,\
+                                created_at__lte=t_2).\
+        order_by('created_at').values(*OEE_EVENT_FIELDS)
+    return oee_engine.calculate_oee(all_events,t_1,t_2,t_2)
+
+# 以下函数完成一条推送消息的全部数据库查询和 JSON 序列化，返回可直接发送的文本
+# 异步消费者通过 database_sync_to_async 在线程池中整体调用，不阻塞事件循环
+
+def machine_payload(scope):
+    ser = EventSerializerRead(get_last_events(scope, 15),many=True)
+    return json.dumps({"data": ser.data,"oee":get_oee_grap_data(scope)},cls=UUIDEncoder)
+
+def report_payload(scope):
+    list_oees = get_oee_grap_data(scope)
+    last_events=Event.objects.filter(machine__organization__uuid=scope['user']['organization']['uuid'],\
+                                     machine__uuid = scope['machine']).\
+        select_related('machine__organization','machine','cell','fault','product','machine__created_by').order_by('-created_at').first()
+    ser = EventSerializerRead(last_events)
+    return json.dumps({"data": ser.data,"oee":list_oees},cls=UUIDEncoder)
+
+def oee_payload(scope, hours):
+    list_oees = get_oee_grap_data(scope)
+    oee = get_window_oee(scope, hours)
+    ser = EventSerializerRead(get_last_events(scope, 1),many=True)
+    return json.dumps({"data": oee,"oee":list_oees,"list":ser.data},cls=UUIDEncoder)
+
+
 class MachineConsumer(WebsocketConsumer):
     def connect(self):
         if self.scope['user'] == None:
@@ -46,17 +92,9 @@ class MachineConsumer(WebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
-        
+
         self.accept()
-        list_oees = get_oee_grap_data(self.scope)
-
-        events = Event.objects.filter(machine__uuid=self.scope['machine'],\
-                                      is_filled=False,\
-                                      machine__organization__uuid=self.scope['user']['organization']['uuid']).\
-                                        select_related('machine__organization','machine','cell','fault','product','machine__created_by')\
-                                        .order_by('-created_at')[:15][::-1]
-        ser = EventSerializerRead(events,many=True)
-        self.send(text_data=json.dumps({"data": ser.data,"oee":list_oees},cls=UUIDEncoder))
+        self.send(text_data=machine_payload(self.scope))
     def get_data(self):
         return MachineEvent.objects.all()
 
@@ -73,16 +111,9 @@ class MachineConsumer(WebsocketConsumer):
                 "message":message
             }
         )
-        
+
     def data_message(self,event):
-        events = Event.objects.filter(machine__uuid=self.scope['machine'],\
-                                      machine__organization__uuid=self.scope['user']['organization']['uuid'],\
-                                        is_filled=False)\
-                                        .order_by('-created_at')[:15][::-1]
-        ser = EventSerializerRead(events,many=True)
-        list_oees = get_oee_grap_data(self.scope)
-       
-        self.send(text_data=json.dumps({"data": ser.data,"oee":list_oees},cls=UUIDEncoder))
+        self.send(text_data=machine_payload(self.scope))
 
 class OeeConsumer(WebsocketConsumer):
     def connect(self):
@@ -134,7 +165,7 @@ class OeeConsumer(WebsocketConsumer):
         
         self.send(text_data=json.dumps({"data": oee_last_24h},cls=UUIDEncoder))
 
-class ReportConsumer(WebsocketConsumer):    
+class ReportConsumer(WebsocketConsumer):
     def connect(self):
         if self.scope['user'] == None:
             self.close(code = 1011)
@@ -145,15 +176,9 @@ class ReportConsumer(WebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
-        
+
         self.accept()
-        list_oees = get_oee_grap_data(self.scope)
-        
-        last_events=Event.objects.filter(machine__organization__uuid=self.scope['user']['organization']['uuid'],\
-                                         machine__uuid = self.scope['machine']).\
-            select_related('machine__organization','machine','cell','fault','product','machine__created_by').order_by('-created_at').first()
-        ser = EventSerializerRead(last_events) 
-        self.send(text_data=json.dumps({"data": ser.data,"oee":list_oees },cls=UUIDEncoder))
+        self.send(text_data=report_payload(self.scope))
     def get_data(self):
         return MachineEvent.objects.all()
 
@@ -170,14 +195,9 @@ class ReportConsumer(WebsocketConsumer):
                 "message":message
             }
         )
-        
+
     def report_message(self,event):
-        list_oees = get_oee_grap_data(self.scope)
-        last_events=Event.objects.filter(machine__organization__uuid=self.scope['user']['organization']['uuid'],\
-                                         machine__uuid = self.scope['machine']).\
-            select_related('machine__organization','machine','cell','fault','product','machine__created_by').order_by('-created_at').first()
-        ser = EventSerializerRead(last_events) 
-        self.send(text_data=json.dumps({"data": ser.data,"oee":list_oees},cls=UUIDEncoder))
+        self.send(text_data=report_payload(self.scope))
 
 class OeeConsumer2(WebsocketConsumer):
     def connect(self):
@@ -190,23 +210,9 @@ class OeeConsumer2(WebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
-        
-        self.accept()
-        list_oees = get_oee_grap_data(self.scope)
-        t_2 = timezone.now()
-        t_1 = timezone.now() - timezone.timedelta(hours=24)
-        all_events=Event.objects.filter(machine__organization__uuid=self.scope['user']['organization']['uuid'],\
-                                    machine__uuid = self.scope['machine'], created_at__gte=t_1,\
-                                    created_at__lte=t_2).\
-            select_related('machine__organization','machine','cell','fault','product','machine__created_by').order_by('created_at')
-        oee_last_24h = calculate_oee(all_events,t_1,t_2,t_2)
-        events = Event.objects.filter(machine__uuid=self.scope['machine'],\
-                                      machine__organization__uuid=self.scope['user']['organization']['uuid'],\
-                                        is_filled=False)\
-                                        .order_by('-created_at')[:1]
-        ser = EventSerializerRead(events,many=True)
 
-        self.send(text_data=json.dumps({"data": oee_last_24h,"oee":list_oees,"list":ser.data},cls=UUIDEncoder))
+        self.accept()
+        self.send(text_data=oee_payload(self.scope, 24))
     def get_data(self):
         return MachineEvent.objects.all()
 
@@ -223,19 +229,37 @@ class OeeConsumer2(WebsocketConsumer):
                 "message":message
             }
         )
-        
+
     def oee_message(self,event):
-        list_oees = get_oee_grap_data(self.scope)
-        t_2 = timezone.now()
-        t_1 = timezone.now() - timezone.timedelta(hours=1)
-        all_events=Event.objects.filter(machine__organization__uuid=self.scope['user']['organization']['uuid'],\
-                                    machine__uuid = self.scope['machine'], created_at__gte=t_1,\
-                                    created_at__lte=t_2).\
-            select_related('machine__organization','machine','cell','fault','product','machine__created_by').order_by('created_at')
-        oee_last_24h = calculate_oee(all_events,t_1,t_2,t_2)
-        events = Event.objects.filter(machine__uuid=self.scope['machine'],\
-                                      machine__organization__uuid=self.scope['user']['organization']['uuid'],\
-                                        is_filled=False)\
-                                        .order_by('-created_at')[:1]
-        ser = EventSerializerRead(events,many=True)
-        self.send(text_data=json.dumps({"data": oee_last_24h,"oee":list_oees,"list":ser.data},cls=UUIDEncoder))
+        self.send(text_data=oee_payload(self.scope, 1))
+
+
+class AsyncMachineConsumer(AsyncMachineDataConsumer):
+    group_prefix = 'data_'
+
+    def build_payload(self, initial):
+        return machine_payload(self.scope)
+
+    async def data_message(self, event):
+        await self.push(event)
+
+
+class AsyncReportConsumer(AsyncMachineDataConsumer):
+    group_prefix = 'report_'
+
+    def build_payload(self, initial):
+        return report_payload(self.scope)
+
+    async def report_message(self, event):
+        await self.push(event)
+
+
+class AsyncOeeConsumer(AsyncMachineDataConsumer):
+    group_prefix = 'oee_'
+
+    def build_payload(self, initial):
+        # 连接时发送24小时 OEE，之后的推送发送最近1小时 OEE（与 OeeConsumer2 一致）
+        return oee_payload(self.scope, 24 if initial else 1)
+
+    async def oee_message(self, event):
+        await self.push(event)
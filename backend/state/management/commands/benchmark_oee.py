@@ -0,0 +1,78 @@
+import random
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from state import oee_engine
+from state.util import calculate_oee
+
+
+class Command(BaseCommand):
+    help = '在模拟事件流上对比原 calculate_oee 与向量化 OEE 引擎的最近24小时逐小时计算耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=20000, help='每种状态对的事件数 (默认: 20000)')
+        parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最快一次 (默认: 3)')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子')
+
+    def build_events(self, count, end, seed):
+        rng = random.Random(seed)
+        start = end - timedelta(hours=24)
+        span = 24 * 3600 * 1000
+        product = SimpleNamespace(ideal_cycle=1)
+        events = []
+        for _, start_state, end_state in oee_engine.DURATION_PAIRS:
+            offsets = sorted(rng.sample(range(span), count * 2))
+            for i, offset in enumerate(offsets):
+                events.append(SimpleNamespace(
+                    state=start_state if i % 2 == 0 else end_state,
+                    created_at=start + timedelta(milliseconds=offset),
+                    product=None, quantity=0, scrap=0,
+                ))
+        for offset in rng.sample(range(span), count):
+            events.append(SimpleNamespace(
+                state='report', created_at=start + timedelta(milliseconds=offset),
+                product=product, quantity=rng.randrange(1, 20), scrap=rng.randrange(0, 2),
+            ))
+        events.sort(key=lambda e: e.created_at)
+        return events
+
+    def best_of(self, repeat, func):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        end = timezone.now().replace(microsecond=0)
+        windows = oee_engine.hourly_windows(end)
+        events = self.build_events(options['events'], end, options['seed'])
+        self.stdout.write(f'模拟事件数: {len(events)}，窗口数: {len(windows)}')
+
+        def legacy():
+            return [
+                calculate_oee([e for e in events if t_1 <= e.created_at <= t_2], t_1, t_2, t_2)
+                for t_1, t_2 in windows
+            ]
+
+        def vectorized():
+            return oee_engine.calculate_oee_series(events, windows)
+
+        legacy_time, legacy_result = self.best_of(options['repeat'], legacy)
+        engine_time, engine_result = self.best_of(options['repeat'], vectorized)
+        arrays = oee_engine.EventArrays.from_events(events)
+        compute_time, _ = self.best_of(options['repeat'], lambda: oee_engine.calculate_oee_series(arrays, windows))
+
+        self.stdout.write(f'原实现: {legacy_time * 1000:.1f} ms')
+        self.stdout.write(f'向量化引擎: {engine_time * 1000:.1f} ms (含数组载入)，仅计算 {compute_time * 1000:.1f} ms')
+        self.stdout.write(f'加速比: {legacy_time / engine_time:.1f}x')
+        if legacy_result == engine_result:
+            self.stdout.write(self.style.SUCCESS('结果完全一致'))
+        else:
+            self.stdout.write(self.style.ERROR('结果不一致'))
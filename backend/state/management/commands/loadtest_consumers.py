@@ -0,0 +1,104 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from db.models import Asset
+
+
+class Client:
+    """
+    直接发送 ASGI 消息的 WebSocket 客户端
+    channels.testing.WebsocketCommunicator 依赖未安装的 daphne，这里使用其底层的 ApplicationCommunicator
+    """
+
+    def __init__(self, application, scope, timeout):
+        self.communicator = ApplicationCommunicator(application, scope)
+        self.timeout = timeout
+
+    async def connect(self):
+        await self.communicator.send_input({'type': 'websocket.connect'})
+        return (await self.communicator.receive_output(self.timeout))['type'] == 'websocket.accept'
+
+    async def receive(self):
+        return (await self.communicator.receive_output(self.timeout))['text']
+
+    async def send(self, text):
+        await self.communicator.send_input({'type': 'websocket.receive', 'text': text})
+
+    async def disconnect(self):
+        await self.communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.communicator.wait(self.timeout)
+
+
+class Command(BaseCommand):
+    help = '使用内存通道层对设备 WebSocket 消费者做本地压测，统计连接延迟和群发耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help='并发客户端数 (默认: 200)')
+        parser.add_argument('--machine', type=str, default=None, help='设备UUID (默认: 第一台设备)')
+        parser.add_argument('--path', type=str, default='ws/machine-data/', help='WebSocket 路径 (默认: ws/machine-data/)')
+        parser.add_argument('--timeout', type=float, default=30, help='单次接收超时秒数 (默认: 30)')
+
+    def handle(self, *args, **options):
+        machine = Asset.objects.select_related('organization')
+        if options['machine']:
+            machine = machine.filter(uuid=options['machine'])
+        machine = machine.first()
+        if machine is None:
+            self.stdout.write(self.style.ERROR('没有可用的设备'))
+            return
+
+        with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+            asyncio.run(self.run(machine, options))
+
+    async def run(self, machine, options):
+        # 延迟导入：路由在通道层配置覆盖之后加载
+        from state.routing import websocket_urlpatterns
+        application = URLRouter(websocket_urlpatterns)
+        organization = str(machine.organization.uuid)
+        scope_user = {'organization': {'uuid': organization}}
+        path = options['path'].strip('/') + '/'
+        timeout = options['timeout']
+
+        async def open_client():
+            client = Client(application, {
+                'type': 'websocket', 'path': '/' + path, 'query_string': b'', 'headers': [], 'subprotocols': [],
+                'user': scope_user, 'machine': str(machine.uuid),
+            }, timeout)
+            started = time.perf_counter()
+            if not await client.connect():
+                return client, None
+            await client.receive()
+            return client, time.perf_counter() - started
+
+        self.stdout.write(f"打开 {options['clients']} 个客户端: {path} 设备 {machine.uuid}")
+        started = time.perf_counter()
+        opened = await asyncio.gather(*[open_client() for _ in range(options['clients'])])
+        connect_total = time.perf_counter() - started
+        clients = [client for client, latency in opened if latency is not None]
+        latencies = sorted(latency for _, latency in opened if latency is not None)
+        if not latencies:
+            self.stdout.write(self.style.ERROR('没有客户端连接成功'))
+            return
+
+        self.stdout.write(f'连接成功: {len(clients)}/{len(opened)}，总耗时 {connect_total * 1000:.0f} ms')
+        self.stdout.write(
+            f'连接延迟(含首条数据): 中位数 {statistics.median(latencies) * 1000:.1f} ms，'
+            f'P95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms，'
+            f'最大 {latencies[-1] * 1000:.1f} ms'
+        )
+
+        # 向群组发一条消息，统计全部客户端收到推送的耗时
+        started = time.perf_counter()
+        await clients[0].send('{"message": "loadtest"}')
+        await asyncio.gather(*[client.receive() for client in clients])
+        self.stdout.write(f'群发到 {len(clients)} 个客户端耗时: {(time.perf_counter() - started) * 1000:.0f} ms')
+
+        await asyncio.gather(*[client.disconnect() for client in clients])
+        await get_channel_layer().flush()
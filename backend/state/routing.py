@@ -3,7 +3,7 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
-    re_path(r"ws/machine-data/", consumers.MachineConsumer.as_asgi()),
-    re_path(r"ws/machine-oee/", consumers.OeeConsumer2.as_asgi()),
-    re_path(r"ws/machine-report/", consumers.ReportConsumer.as_asgi()),
-]
\ No newline at end of file
+    re_path(r"ws/machine-data/", consumers.AsyncMachineConsumer.as_asgi()),
+    re_path(r"ws/machine-oee/", consumers.AsyncOeeConsumer.as_asgi()),
+    re_path(r"ws/machine-report/", consumers.AsyncReportConsumer.as_asgi()),
+]
@@ -1,13 +1,279 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
-class EmptyTest(TestCase):
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from db.models import Organization, UserProfile
+from rest_framework.authtoken.models import Token
+
+from . import oee_engine
+from .AuthMiddleware import TokenAuthMiddleware, load_user, token_profile_cache
+from .async_consumer import AsyncMachineDataConsumer
+from .broadcast import SnapshotBroadcaster, SNAPSHOT_MESSAGE_TYPE
+from .util import calculate_oee
+
+
+def make_events(seed, start, hours=24, per_pair=20):
+    """生成按时间排序的模拟事件流（包括不成对、以恢复事件开头等情况）"""
+    rng = random.Random(seed)
+    span = hours * 3600
+    product = SimpleNamespace(ideal_cycle=rng.choice([0.5, 1, 2.5]))
+    events = []
+    for _, start_state, end_state in oee_engine.DURATION_PAIRS:
+        times = sorted(rng.sample(range(span), per_pair * 2))
+        first = rng.random() < 0.3
+        for i, offset in enumerate(times):
+            if rng.random() < 0.05:
+                continue
+            state = end_state if (i % 2 == 0) == first else start_state
+            events.append(SimpleNamespace(
+                state=state,
+                created_at=start + timedelta(seconds=offset, microseconds=rng.randrange(1000000)),
+                product=None, quantity=0, scrap=0,
+            ))
+    for offset in rng.sample(range(span), per_pair):
+        quantity = rng.randrange(1, 50)
+        events.append(SimpleNamespace(
+            state='report',
+            created_at=start + timedelta(seconds=offset),
+            product=product if rng.random() < 0.9 else None,
+            quantity=quantity, scrap=rng.randrange(0, quantity),
+        ))
+    events.sort(key=lambda e: e.created_at)
+    return events
+
+
+class OEEEngineTest(TestCase):
+    """向量化 OEE 引擎与原 calculate_oee 的一致性"""
+
+    def setUp(self):
+        self.start = datetime(2024, 5, 1, 8, 0, 0)
+        self.end = self.start + timedelta(hours=24)
+
+    def test_matches_calculate_oee(self):
+        for seed in range(30):
+            events = make_events(seed, self.start)
+            now = self.end - timedelta(hours=seed % 3)
+            self.assertEqual(
+                oee_engine.calculate_oee(events, self.start, self.end, now),
+                calculate_oee(events, self.start, self.end, now),
+                msg=f"seed={seed}"
+            )
+
+    def test_empty_events(self):
+        self.assertEqual(
+            oee_engine.calculate_oee([], self.start, self.end, self.end),
+            calculate_oee([], self.start, self.end, self.end)
+        )
+
+    def test_unbalanced_sequence_returns_false(self):
+        events = [
+            SimpleNamespace(state='run', created_at=self.start + timedelta(hours=h), product=None)
+            for h in (1, 2, 3)
+        ]
+        result = oee_engine.calculate_oee(events, self.start, self.end, self.end)
+        self.assertIs(result['machine_run_duration'], False)
+        self.assertEqual(result, calculate_oee(events, self.start, self.end, self.end))
+
+    def test_hourly_series_matches_per_window(self):
+        events = make_events(7, self.start, per_pair=60)
+        windows = oee_engine.hourly_windows(self.end)
+        arrays = oee_engine.EventArrays.from_events(events)
+        series = oee_engine.calculate_oee_series(arrays, windows)
+
+        self.assertEqual(len(series), 24)
+        for (t_1, t_2), result in zip(windows, series):
+            in_window = [e for e in events if t_1 <= e.created_at <= t_2]
+            self.assertEqual(result, calculate_oee(in_window, t_1, t_2, t_2))
+
+
+class CachedHourlySeriesTest(TestCase):
+    """逐小时 OEE 曲线：单次取数 + 已结束小时缓存"""
 
-    '''Mockup test'''
     def setUp(self):
-        pass
+        cache.clear()
+        self.now = datetime(2024, 5, 2, 8, 40, 0)
+        self.events = make_events(3, self.now - timedelta(hours=24), per_pair=60)
+        self.fetches = []
+
+    def fetch_events(self, t_1, t_2):
+        self.fetches.append((t_1, t_2))
+        return [e for e in self.events if t_1 <= e.created_at <= t_2]
+
+    def test_series_matches_calculate_oee(self):
+        series = oee_engine.cached_hourly_series('test', self.fetch_events, now=self.now)
+        windows = oee_engine.aligned_hourly_windows(self.now)
+
+        self.assertEqual(len(series), 24)
+        self.assertEqual(windows[-1], (datetime(2024, 5, 2, 8), self.now))
+        self.assertEqual(self.fetches, [(windows[0][0], self.now)])
+        for (t_1, t_2), result in zip(windows, series):
+            in_window = [e for e in self.events if t_1 <= e.created_at <= t_2]
+            self.assertEqual(result, calculate_oee(in_window, t_1, t_2, t_2))
+
+    def test_closed_hours_are_cached(self):
+        first = oee_engine.cached_hourly_series('test', self.fetch_events, now=self.now)
+        later = self.now + timedelta(minutes=10)
+        second = oee_engine.cached_hourly_series('test', self.fetch_events, now=later)
+
+        # 第二次只查询当前小时
+        self.assertEqual(self.fetches[-1], (datetime(2024, 5, 2, 8), later))
+        self.assertEqual(second[:-1], first[:-1])
+
+
+class SnapshotBroadcasterTest(TestCase):
+    """群组快照只计算一次，并合并过快的更新"""
+
+    def test_payload_built_once_and_coalesced(self):
+        async def scenario():
+            layer = InMemoryChannelLayer()
+            members = [await layer.new_channel() for _ in range(5)]
+            for channel in members:
+                await layer.group_add('data_org_machine', channel)
+
+            broadcaster = SnapshotBroadcaster(min_interval=0.05)
+            builds = []
+
+            def build():
+                builds.append(1)
+                return f'{{"seq": {len(builds)}}}'
+
+            sent = [await broadcaster.publish(layer, 'data_org_machine', build) for _ in range(5)]
+            received = [await layer.receive(channel) for channel in members]
+            await asyncio.sleep(0.1)
+            trailing = [await layer.receive(channel) for channel in members]
+            return sent, builds, received, trailing
+
+        sent, builds, received, trailing = asyncio.run(scenario())
+
+        self.assertEqual(sent, [True, False, False, False, False])
+        self.assertEqual(len(builds), 2)
+        self.assertEqual({m['type'] for m in received}, {SNAPSHOT_MESSAGE_TYPE})
+        self.assertEqual({m['text'] for m in received}, {'{"seq": 1}'})
+        self.assertEqual({m['text'] for m in trailing}, {'{"seq": 2}'})
+
+    def test_expired_groups_pruned(self):
+        async def scenario():
+            layer = InMemoryChannelLayer()
+            broadcaster = SnapshotBroadcaster(min_interval=0.05)
+            for i in range(20):
+                await broadcaster.publish(layer, f'data_org_{i}', lambda: '{}')
+            await asyncio.sleep(0.06)
+            await broadcaster.publish(layer, 'data_org_new', lambda: '{}')
+            return broadcaster
+
+        broadcaster = asyncio.run(scenario())
+        self.assertEqual(list(broadcaster._last_sent), ['data_org_new'])
+
+
+class StubMachineConsumer(AsyncMachineDataConsumer):
+    """推送内容固定的设备消费者，不依赖事件模型"""
+    group_prefix = 'stub_'
+
+    def build_payload(self, initial):
+        return json.dumps({'initial': initial})
+
+    async def data_message(self, event):
+        await self.push(event)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class AsyncMachineDataConsumerTest(TestCase):
+    """异步设备消费者基类：连接、群组、快照转发与旧消息兼容"""
+
+    group = 'stub_org_machine'
+
+    def communicator(self, user):
+        # channels.testing.WebsocketCommunicator 依赖未安装的 daphne，直接使用其底层的 ApplicationCommunicator
+        from asgiref.testing import ApplicationCommunicator
+        return ApplicationCommunicator(StubMachineConsumer.as_asgi(), {
+            'type': 'websocket', 'path': '/ws/stub/', 'query_string': b'', 'headers': [], 'subprotocols': [],
+            'user': user, 'machine': 'machine',
+        })
+
+    def test_build_payload_is_abstract(self):
+        with self.assertRaises(TypeError):
+            AsyncMachineDataConsumer()
+
+    async def test_anonymous_connection_closed(self):
+        communicator = self.communicator(None)
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await communicator.receive_output(5), {'type': 'websocket.close', 'code': 1011})
+        await communicator.wait(5)
+
+    async def test_group_messages_forwarded(self):
+        from channels.layers import get_channel_layer
+        layer = get_channel_layer()
+        communicator = self.communicator({'organization': {'uuid': 'org'}})
+
+        async def receive_text():
+            message = await communicator.receive_output(5)
+            self.assertEqual(message['type'], 'websocket.send', message)
+            return message['text']
+
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual((await communicator.receive_output(5))['type'], 'websocket.accept')
+        self.assertEqual(await receive_text(), '{"initial": true}')
+        self.assertEqual(len(layer.groups[self.group]), 1)
+
+        # 预序列化的快照原样转发
+        await layer.group_send(self.group, {'type': SNAPSHOT_MESSAGE_TYPE, 'text': '{"snapshot": 1}'})
+        self.assertEqual(await receive_text(), '{"snapshot": 1}')
+
+        # 旧的 data_message 群组消息由成员自行计算
+        await layer.group_send(self.group, {'type': 'data_message', 'message': 'update'})
+        self.assertEqual(await receive_text(), '{"initial": false}')
+
+        # 客户端消息触发一次群组快照
+        await communicator.send_input({'type': 'websocket.receive', 'text': '{"message": "update"}'})
+        self.assertEqual(await receive_text(), '{"initial": false}')
+
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(5)
+        self.assertNotIn(self.group, layer.groups)
+
+
+class TokenAuthMiddlewareTest(TestCase):
+    """WebSocket 握手的 token -> 用户资料缓存"""
+
+    def setUp(self):
+        token_profile_cache.clear()
+        organization = Organization.objects.create(name='org', subdomain='org')
+        self.user = User.objects.create_user(username='ws_user', password='pass')
+        self.profile = UserProfile.objects.create(user=self.user, organization=organization)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+
+    def test_profile_is_cached(self):
+        first = load_user(self.token.key)
+        self.assertEqual(first['username'], 'ws_user')
+        with self.assertNumQueries(0):
+            self.assertEqual(load_user(self.token.key), first)
+
+    def test_invalidated_on_profile_save_and_token_delete(self):
+        load_user(self.token.key)
+        self.user.first_name = 'Changed'
+        self.user.save()
+        self.assertEqual(load_user(self.token.key)['first_name'], 'Changed')
+
+        self.token.delete()
+        self.assertIsNone(load_user(self.token.key))
+
+    def test_query_string_is_url_decoded(self):
+        captured = {}
+
+        async def inner(scope, receive, send):
+            captured.update(scope)
+
+        middleware = TokenAuthMiddleware(inner)
+        query = f'token={self.token.key}&machine=a%2Db'.encode()
+        async_to_sync(middleware)({'type': 'websocket', 'query_string': query}, None, None)
 
-    def test_empty_test(self):
-        """Mockup test"""
-       
-        self.assertEqual(True, True)
+        self.assertEqual(captured['machine'], 'a-b')
+        self.assertEqual(captured['user']['username'], 'ws_user')
@@ -1,4 +1,3 @@
-from .serializers import EventSerializer
 import logging
 logger = logging.getLogger(__name__)
 def time_calculator(events,resume_events,time_1,time_2, current_time):
@@ -225,6 +224,8 @@ def calculate_oee(all_events,t_1,t_2,now):
     return res
 
 def calculate_faults(events,faults,cells):
+    # 延迟导入：序列化器依赖的事件模型不在本模块的 OEE 计算路径上
+    from .serializers import EventSerializer
     total_faults = len(events)
     out_of = [e for e in events if e.state=='out of order']
     res = {
@@ -0,0 +1,77 @@
+"""
+用户列表的权限范围与字段投影
+
+1. visible_users 按请求用户的权限在数据库中过滤：管理员（或没有资料的用户）可见全部用户，
+   其他用户只能看到期别和班次都与自己相同的用户
+2. user_rows 只查询需要的列（values() 投影，LEFT JOIN 用户资料），没有资料的用户使用默认值
+"""
+from django.contrib.auth.models import User
+
+# 返回字段 -> 查询列
+USER_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'plant_phase': 'userprofile__plant_phase',
+    'shift_type': 'userprofile__shift_type',
+    'type': 'userprofile__type',
+    # 权限字段
+    'can_add_assets': 'userprofile__can_add_assets',
+    'can_edit_assets': 'userprofile__can_edit_assets',
+    'can_delete_assets': 'userprofile__can_delete_assets',
+    'can_add_maintenance_records': 'userprofile__can_add_maintenance_records',
+    'can_edit_maintenance_records': 'userprofile__can_edit_maintenance_records',
+    'can_delete_maintenance_records': 'userprofile__can_delete_maintenance_records',
+    'can_add_manuals': 'userprofile__can_add_manuals',
+    'can_edit_manuals': 'userprofile__can_edit_manuals',
+    'can_delete_manuals': 'userprofile__can_delete_manuals',
+    'can_add_cases': 'userprofile__can_add_cases',
+    'can_edit_cases': 'userprofile__can_edit_cases',
+    'can_delete_cases': 'userprofile__can_delete_cases',
+}
+
+# 没有用户资料时各字段的默认值
+PROFILE_DEFAULTS = {
+    'plant_phase': '',
+    'shift_type': '',
+    'type': 'Operator',
+    **{field: False for field in USER_FIELDS if field.startswith('can_')},
+}
+
+
+def visible_users(user, queryset=None):
+    """
+    返回 user 可以看到的用户查询集
+    严格隔离：非管理员只能看到期别和班次都完全一致的用户，自己没有期别或班次时看不到任何用户，
+    没有资料的用户不显示给非管理员
+    """
+    if queryset is None:
+        queryset = User.objects.all()
+    profile = getattr(user, 'userprofile', None)
+    if profile is None or profile.type == 'Admin':
+        return queryset
+    if not profile.plant_phase or not profile.shift_type:
+        return queryset.none()
+    return queryset.filter(
+        userprofile__plant_phase=profile.plant_phase,
+        userprofile__shift_type=profile.shift_type,
+    )
+
+
+def user_rows(queryset, fields=None):
+    """
+    按 fields（默认全部字段）投影用户列表，返回字典列表
+    """
+    fields = list(fields or USER_FIELDS)
+    columns = [USER_FIELDS[field] for field in fields]
+    profile_fields = [field for field in fields if field in PROFILE_DEFAULTS]
+    if profile_fields:
+        # 用于区分“没有资料”和“资料中的字段为空”
+        columns.append('userprofile__uuid')
+
+    rows = []
+    for values in queryset.values_list(*columns):
+        row = dict(zip(fields, values))
+        if profile_fields and values[-1] is None:
+            row.update((field, PROFILE_DEFAULTS[field]) for field in profile_fields)
+        rows.append(row)
+    return rows
@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+from db.models import UserProfile
+
+
+class ListUsersTest(TestCase):
+    """用户列表权限隔离、字段投影与分页测试"""
+
+    url = '/api/user-management/list-users/'
+
+    def create_user(self, username, **profile):
+        user = User.objects.create_user(username=username, password='pw')
+        if profile:
+            UserProfile.objects.create(user=user, **profile)
+        Token.objects.get_or_create(user=user)
+        return user
+
+    def get(self, user, **params):
+        return self.client.get(self.url, params, HTTP_AUTHORIZATION=f'Token {user.auth_token.key}')
+
+    def setUp(self):
+        self.admin = self.create_user('管理员', type='Admin')
+        self.operator = self.create_user('操作员', type='Operator', plant_phase='phase_1', shift_type='rotating_shift')
+        self.create_user('同班', type='Operator', plant_phase='phase_1', shift_type='rotating_shift', can_delete_cases=True)
+        self.create_user('其他班次', type='Operator', plant_phase='phase_1', shift_type='long_day_shift')
+        self.create_user('其他期别', type='Operator', plant_phase='phase_2', shift_type='rotating_shift')
+        self.create_user('无资料')
+
+    def test_operator_sees_same_phase_and_shift_only(self):
+        response = self.get(self.operator)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['username'] for user in response.json()], ['操作员', '同班'])
+        self.assertTrue(response.json()[1]['can_delete_cases'])
+
+    def test_operator_without_shift_sees_nobody(self):
+        user = self.create_user('未分班', type='Operator', plant_phase='phase_1')
+        self.assertEqual(self.get(user).json(), [])
+
+    def test_admin_sees_all_with_profile_defaults(self):
+        # 认证、当前用户资料、用户列表各一次查询，不随用户数增长
+        with self.assertNumQueries(3):
+            users = self.get(self.admin).json()
+        self.assertEqual(len(users), 6)
+        self.assertEqual(len(users[0]), 17)
+        self.assertEqual(users[-1], {
+            'id': users[-1]['id'], 'username': '无资料', 'plant_phase': '', 'shift_type': '', 'type': 'Operator',
+            **{field: False for field in users[-1] if field.startswith('can_')},
+        })
+
+    def test_fields_and_pagination(self):
+        response = self.get(self.admin, fields='username', page=2, page_size=4)
+        self.assertEqual(response.json(), {
+            'count': 6, 'page': 2, 'page_size': 4, 'total_pages': 2,
+            'results': [{'username': '其他期别'}, {'username': '无资料'}],
+        })
+        self.assertEqual(self.get(self.admin, fields='username,password').status_code, 400)
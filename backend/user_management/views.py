@@ -4,9 +4,15 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.core.paginator import Paginator
 from db.models import UserProfile
+from .scopes import USER_FIELDS, user_rows, visible_users
 import re
 
+# list_users 每页最多返回的用户数
+MAX_PAGE_SIZE = 500
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])  # 只有认证用户才能添加新用户
@@ -364,91 +370,42 @@ def get_user_permissions(request):
 def list_users(request):
     """
     列出用户的基本信息（根据权限过滤）
-    按照严格的期别和班次进行隔离
+    按照严格的期别和班次进行隔离，过滤在数据库中完成
+    支持 ?fields=id,username 只返回需要的字段；
+    带 page 或 page_size 参数时分页返回 {'count', 'page', 'page_size', 'total_pages', 'results'}，
+    否则返回全部用户的列表
     """
     try:
-        # 获取当前用户的权限信息
-        current_user_profile = getattr(request.user, 'userprofile', None)
-        
-        # 构建查询条件
-        users_query = User.objects.prefetch_related('userprofile').all()
-        
-        # 如果不是管理员，根据权限严格过滤用户
-        if current_user_profile and current_user_profile.type != 'Admin':
-            # 获取当前用户的期别和班次
-            current_phase = current_user_profile.plant_phase
-            current_shift = current_user_profile.shift_type
-            
-            # 严格过滤：只显示具有相同期别和班次的用户
-            filtered_users = []
-            for user in users_query:
-                try:
-                    user_profile = user.userprofile
-                    
-                    # 严格匹配：期别和班次都必须完全一致
-                    if (current_phase and user_profile.plant_phase and 
-                        current_phase == user_profile.plant_phase and
-                        current_shift and user_profile.shift_type and 
-                        current_shift == user_profile.shift_type):
-                        filtered_users.append(user)
-                        
-                except UserProfile.DoesNotExist:
-                    # 如果用户没有资料，不显示给普通用户
-                    continue
-            
-            all_users = filtered_users
+        requested = request.query_params.get('fields')
+        if requested:
+            fields = list(dict.fromkeys(f.strip() for f in requested.split(',') if f.strip()))
+            unknown = [f for f in fields if f not in USER_FIELDS]
+            if unknown:
+                return Response({
+                    'error': f"未知字段: {', '.join(unknown)}",
+                    'available_fields': list(USER_FIELDS.keys())
+                }, status=status.HTTP_400_BAD_REQUEST)
         else:
-            # 管理员可以看到所有用户
-            all_users = users_query
-        
-        users_data = []
-        for user in all_users:
-            try:
-                profile = user.userprofile
-                user_data = {
-                    'id': user.id,
-                    'username': user.username,
-                    'plant_phase': profile.plant_phase,
-                    'shift_type': profile.shift_type,
-                    'type': profile.type,
-                    # 权限字段
-                    'can_add_assets': profile.can_add_assets,
-                    'can_edit_assets': profile.can_edit_assets,
-                    'can_delete_assets': profile.can_delete_assets,
-                    'can_add_maintenance_records': profile.can_add_maintenance_records,
-                    'can_edit_maintenance_records': profile.can_edit_maintenance_records,
-                    'can_delete_maintenance_records': profile.can_delete_maintenance_records,
-                    'can_add_manuals': profile.can_add_manuals,
-                    'can_edit_manuals': profile.can_edit_manuals,
-                    'can_delete_manuals': profile.can_delete_manuals,
-                    'can_add_cases': profile.can_add_cases,
-                    'can_edit_cases': profile.can_edit_cases,
-                    'can_delete_cases': profile.can_delete_cases
-                }
-            except UserProfile.DoesNotExist:
-                # 如果用户没有资料，使用默认值
-                user_data = {
-                    'id': user.id,
-                    'username': user.username,
-                    'plant_phase': '',
-                    'shift_type': '',
-                    'type': 'Operator',  # 默认类型
-                    # 默认权限
-                    'can_add_assets': False,
-                    'can_edit_assets': False,
-                    'can_delete_assets': False,
-                    'can_add_maintenance_records': False,
-                    'can_edit_maintenance_records': False,
-                    'can_delete_maintenance_records': False,
-                    'can_add_manuals': False,
-                    'can_edit_manuals': False,
-                    'can_delete_manuals': False,
-                    'can_add_cases': False,
-                    'can_edit_cases': False,
-                    'can_delete_cases': False
-                }
-            users_data.append(user_data)
-        return Response(users_data)
+            fields = list(USER_FIELDS.keys())
+
+        users_query = visible_users(request.user).order_by('id')
+
+        if 'page' not in request.query_params and 'page_size' not in request.query_params:
+            return Response(user_rows(users_query, fields))
+
+        try:
+            page_size = int(request.query_params.get('page_size', getattr(settings, 'USER_LIST_PAGE_SIZE', 50)))
+        except ValueError:
+            return Response({'error': 'page_size 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+        page = Paginator(users_query, page_size).get_page(request.query_params.get('page'))
+        return Response({
+            'count': page.paginator.count,
+            'page': page.number,
+            'page_size': page_size,
+            'total_pages': page.paginator.num_pages,
+            'results': user_rows(page.object_list, fields)
+        })
     except Exception as e:
         return Response({'error': f'获取用户列表失败: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -701,7 +701,8 @@ const PhaseShiftMaintenanceRecords = () => {
   // 获取所有用户作为实施人选项
   const fetchUsers = useCallback(async () => {
     try {
-      const response = await axios.get(`${url}/api/user-management/list-users/`, {
+      // 只需要用户名
+      const response = await axios.get(`${url}/api/user-management/list-users/?fields=username`, {
         headers: {
           Authorization: `Token ${token}`,
         },